@@ -27,7 +27,10 @@ from config.database import Base
 from src.models import (
     Zona, Parcela, Subparcela,
     Arbol, Especie, Necromasa, Herbaceas,
-    CalculoBiomasa, CalculoSatelital
+    CalculoBiomasa, CalculoSatelital,
+    AgregadoParcela, AgregadoModeloParcela,
+    MedicionCenso, TrabajoSatelital, ObservacionSatelital,
+    EstadoSatelitalParcela, CompuestoSatelital
 )
 
 # Set target metadata for 'autogenerate' support
@@ -0,0 +1,61 @@
+"""Agregados incrementales de biomasa por parcela
+
+Revision ID: 002_agregados_parcela
+Revises: 001_initial
+Create Date: 2026-10-17 09:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '002_agregados_parcela'
+down_revision: Union[str, None] = '001_initial'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """
+    Crea las tablas de agregados por parcela y por modelo alométrico.
+
+    No se llenan aquí: cada parcela se construye en su primera lectura
+    y desde entonces se mantiene con deltas.
+    """
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    existing_tables = inspector.get_table_names()
+
+    if 'agregados_parcela' not in existing_tables:
+        op.create_table(
+            'agregados_parcela',
+            sa.Column('parcela_id', sa.Integer(), nullable=False),
+            sa.Column('num_arboles', sa.Integer(), nullable=False),
+            sa.Column('area_basal_m2', sa.Float(), nullable=False),
+            sa.Column('necromasa_seca_kg', sa.Float(), nullable=False),
+            sa.Column('herbaceas_seca_kg', sa.Float(), nullable=False),
+            sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+            sa.ForeignKeyConstraint(['parcela_id'], ['parcelas.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('parcela_id')
+        )
+
+    if 'agregados_modelo_parcela' not in existing_tables:
+        op.create_table(
+            'agregados_modelo_parcela',
+            sa.Column('parcela_id', sa.Integer(), nullable=False),
+            sa.Column('modelo', sa.String(length=50), nullable=False),
+            sa.Column('biomasa_aerea_kg', sa.Float(), nullable=False),
+            sa.ForeignKeyConstraint(['parcela_id'], ['parcelas.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('parcela_id', 'modelo')
+        )
+
+
+def downgrade() -> None:
+    """
+    Elimina las tablas de agregados
+    """
+    op.drop_table('agregados_modelo_parcela')
+    op.drop_table('agregados_parcela')
@@ -0,0 +1,51 @@
+"""Huella de entradas en cálculos de biomasa
+
+Revision ID: 003_huella_calculos
+Revises: 002_agregados_parcela
+Create Date: 2026-10-17 10:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '003_huella_calculos'
+down_revision: Union[str, None] = '002_agregados_parcela'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """
+    Agrega la huella de entradas a calculos_biomasa con índice único por parcela.
+
+    Los cálculos existentes quedan con huella NULL y no participan del índice.
+    """
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    columnas = [c['name'] for c in inspector.get_columns('calculos_biomasa')]
+    indices = [i['name'] for i in inspector.get_indexes('calculos_biomasa')]
+
+    if 'huella_entrada' not in columnas:
+        with op.batch_alter_table('calculos_biomasa') as batch_op:
+            batch_op.add_column(sa.Column('huella_entrada', sa.String(length=64), nullable=True))
+
+    if 'ix_calculos_biomasa_parcela_huella' not in indices:
+        op.create_index(
+            'ix_calculos_biomasa_parcela_huella',
+            'calculos_biomasa',
+            ['parcela_id', 'huella_entrada'],
+            unique=True
+        )
+
+
+def downgrade() -> None:
+    """
+    Elimina la huella de entradas
+    """
+    op.drop_index('ix_calculos_biomasa_parcela_huella', table_name='calculos_biomasa')
+    with op.batch_alter_table('calculos_biomasa') as batch_op:
+        batch_op.drop_column('huella_entrada')
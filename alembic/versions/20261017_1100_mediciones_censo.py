@@ -0,0 +1,61 @@
+"""Mediciones por campaña de censo
+
+Revision ID: 004_mediciones_censo
+Revises: 003_huella_calculos
+Create Date: 2026-10-17 11:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '004_mediciones_censo'
+down_revision: Union[str, None] = '003_huella_calculos'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """
+    Crea la tabla de mediciones por campaña (censo)
+    """
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    existing_tables = inspector.get_table_names()
+
+    if 'mediciones_censo' not in existing_tables:
+        op.create_table(
+            'mediciones_censo',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('parcela_id', sa.Integer(), nullable=False),
+            sa.Column('campana', sa.String(length=20), nullable=False),
+            sa.Column('numero_arbol', sa.Integer(), nullable=False),
+            sa.Column('especie_id', sa.Integer(), nullable=True),
+            sa.Column('dap', sa.Float(), nullable=False),
+            sa.Column('altura', sa.Float(), nullable=True),
+            sa.Column('vivo', sa.Boolean(), nullable=False),
+            sa.Column('fecha_medicion', sa.Date(), nullable=True),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+            sa.ForeignKeyConstraint(['parcela_id'], ['parcelas.id'], ondelete='CASCADE'),
+            sa.ForeignKeyConstraint(['especie_id'], ['especies.id'], ),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_mediciones_censo_id'), 'mediciones_censo', ['id'], unique=False)
+        op.create_index(
+            'ix_mediciones_censo_campana_parcela_arbol',
+            'mediciones_censo',
+            ['campana', 'parcela_id', 'numero_arbol'],
+            unique=True
+        )
+
+
+def downgrade() -> None:
+    """
+    Elimina la tabla de mediciones por campaña
+    """
+    op.drop_index('ix_mediciones_censo_campana_parcela_arbol', table_name='mediciones_censo')
+    op.drop_index(op.f('ix_mediciones_censo_id'), table_name='mediciones_censo')
+    op.drop_table('mediciones_censo')
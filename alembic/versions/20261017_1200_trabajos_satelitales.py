@@ -0,0 +1,66 @@
+"""Cola persistente de trabajos satelitales
+
+Revision ID: 005_trabajos_satelitales
+Revises: 004_mediciones_censo
+Create Date: 2026-10-17 12:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '005_trabajos_satelitales'
+down_revision: Union[str, None] = '004_mediciones_censo'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """
+    Crea la tabla de trabajos de la cola satelital
+    """
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    existing_tables = inspector.get_table_names()
+
+    if 'trabajos_satelitales' not in existing_tables:
+        op.create_table(
+            'trabajos_satelitales',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('tipo', sa.String(length=50), nullable=False),
+            sa.Column('estado', sa.String(length=20), nullable=False),
+            sa.Column('parametros', sa.JSON(), nullable=False),
+            sa.Column('nasa_task_id', sa.String(length=100), nullable=True),
+            sa.Column('estado_nasa', sa.String(length=50), nullable=True),
+            sa.Column('intentos', sa.Integer(), nullable=False),
+            sa.Column('max_intentos', sa.Integer(), nullable=False),
+            sa.Column('consultas', sa.Integer(), nullable=False),
+            sa.Column('disponible_desde', sa.DateTime(timezone=True), nullable=False),
+            sa.Column('trabajador', sa.String(length=100), nullable=True),
+            sa.Column('latido', sa.DateTime(timezone=True), nullable=True),
+            sa.Column('iniciado_en', sa.DateTime(timezone=True), nullable=True),
+            sa.Column('terminado_en', sa.DateTime(timezone=True), nullable=True),
+            sa.Column('error_mensaje', sa.Text(), nullable=True),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+            sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_trabajos_satelitales_id'), 'trabajos_satelitales', ['id'], unique=False)
+        op.create_index(
+            'ix_trabajos_satelitales_estado_disponible',
+            'trabajos_satelitales',
+            ['estado', 'disponible_desde'],
+            unique=False
+        )
+
+
+def downgrade() -> None:
+    """
+    Elimina la tabla de trabajos satelitales
+    """
+    op.drop_index('ix_trabajos_satelitales_estado_disponible', table_name='trabajos_satelitales')
+    op.drop_index(op.f('ix_trabajos_satelitales_id'), table_name='trabajos_satelitales')
+    op.drop_table('trabajos_satelitales')
@@ -0,0 +1,104 @@
+"""Observaciones satelitales normalizadas
+
+Revision ID: 006_observaciones_satelitales
+Revises: 005_trabajos_satelitales
+Create Date: 2026-10-17 13:00:00
+
+"""
+from datetime import date
+import json
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '006_observaciones_satelitales'
+down_revision: Union[str, None] = '005_trabajos_satelitales'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+CAPAS = {
+    'ndvi': '_250m_16_days_NDVI',
+    'evi': '_250m_16_days_EVI',
+}
+
+
+def _decodificar_serie(valor):
+    """La serie se guardaba con json.dumps dentro de una columna JSON (a veces doble codificada)"""
+    while isinstance(valor, (str, bytes)):
+        try:
+            valor = json.loads(valor)
+        except ValueError:
+            return []
+    return valor if isinstance(valor, list) else []
+
+
+def upgrade() -> None:
+    """
+    Crea la tabla de observaciones y la llena con las series guardadas en los cálculos
+    """
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    existing_tables = inspector.get_table_names()
+
+    if 'observaciones_satelitales' in existing_tables:
+        return
+
+    observaciones = op.create_table(
+        'observaciones_satelitales',
+        sa.Column('parcela_id', sa.Integer(), nullable=False),
+        sa.Column('producto', sa.String(length=50), nullable=False),
+        sa.Column('capa', sa.String(length=50), nullable=False),
+        sa.Column('fecha', sa.Date(), nullable=False),
+        sa.Column('valor', sa.Float(), nullable=False),
+        sa.Column('calidad', sa.String(length=20), nullable=True),
+        sa.Column('calculo_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['parcela_id'], ['parcelas.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['calculo_id'], ['calculos_satelitales.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('parcela_id', 'producto', 'capa', 'fecha'),
+        sqlite_with_rowid=False
+    )
+
+    # Backfill: el cálculo más reciente gana cuando dos periodos se superponen
+    calculos = conn.execute(sa.text(
+        "SELECT id, parcela_id, producto, serie_temporal FROM calculos_satelitales "
+        "WHERE serie_temporal IS NOT NULL ORDER BY created_at, id"
+    )).fetchall()
+
+    filas = {}
+    for calculo_id, parcela_id, producto, serie_temporal in calculos:
+        producto = producto or 'MOD13Q1.061'
+        for punto in _decodificar_serie(serie_temporal):
+            if not isinstance(punto, dict) or not punto.get('fecha'):
+                continue
+            try:
+                fecha = date.fromisoformat(str(punto['fecha'])[:10])
+            except ValueError:
+                continue
+            for indice, capa in CAPAS.items():
+                if punto.get(indice) is None:
+                    continue
+                filas[(parcela_id, producto, capa, fecha)] = {
+                    'parcela_id': parcela_id,
+                    'producto': producto,
+                    'capa': capa,
+                    'fecha': fecha,
+                    'valor': float(punto[indice]),
+                    'calidad': punto.get('calidad'),
+                    'calculo_id': calculo_id,
+                }
+
+    if filas:
+        op.bulk_insert(observaciones, list(filas.values()))
+
+
+def downgrade() -> None:
+    """
+    Elimina la tabla de observaciones satelitales
+    """
+    op.drop_table('observaciones_satelitales')
@@ -0,0 +1,42 @@
+"""Valor suavizado de las observaciones satelitales
+
+Revision ID: 007_observaciones_suavizadas
+Revises: 006_observaciones_satelitales
+Create Date: 2026-10-17 14:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '007_observaciones_suavizadas'
+down_revision: Union[str, None] = '006_observaciones_satelitales'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """
+    Agrega valor_suavizado a observaciones_satelitales.
+
+    Las observaciones existentes quedan en NULL hasta el próximo suavizado
+    (POST /api/v1/calculos-satelitales/observaciones/suavizar).
+    """
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    columnas = [c['name'] for c in inspector.get_columns('observaciones_satelitales')]
+
+    if 'valor_suavizado' not in columnas:
+        with op.batch_alter_table('observaciones_satelitales', table_kwargs={'sqlite_with_rowid': False}) as batch_op:
+            batch_op.add_column(sa.Column('valor_suavizado', sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    """
+    Elimina el valor suavizado
+    """
+    with op.batch_alter_table('observaciones_satelitales', table_kwargs={'sqlite_with_rowid': False}) as batch_op:
+        batch_op.drop_column('valor_suavizado')
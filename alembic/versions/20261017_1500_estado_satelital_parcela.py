@@ -0,0 +1,51 @@
+"""Estado satelital por parcela (detección de cambios)
+
+Revision ID: 008_estado_satelital_parcela
+Revises: 007_observaciones_suavizadas
+Create Date: 2026-10-17 15:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '008_estado_satelital_parcela'
+down_revision: Union[str, None] = '007_observaciones_suavizadas'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """
+    Crea la tabla con el resultado de la detección de cambios por parcela
+    """
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    existing_tables = inspector.get_table_names()
+
+    if 'estado_satelital_parcela' not in existing_tables:
+        op.create_table(
+            'estado_satelital_parcela',
+            sa.Column('parcela_id', sa.Integer(), nullable=False),
+            sa.Column('ultima_fecha_evaluada', sa.Date(), nullable=True),
+            sa.Column('observaciones_evaluadas', sa.Integer(), nullable=False),
+            sa.Column('cambio_detectado', sa.String(length=200), nullable=True),
+            sa.Column('alerta', sa.Text(), nullable=True),
+            sa.Column('fecha_cambio', sa.Date(), nullable=True),
+            sa.Column('ndvi_antes', sa.Float(), nullable=True),
+            sa.Column('ndvi_despues', sa.Float(), nullable=True),
+            sa.Column('estadistico_cambio', sa.Float(), nullable=True),
+            sa.Column('evaluado_en', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+            sa.ForeignKeyConstraint(['parcela_id'], ['parcelas.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('parcela_id')
+        )
+
+
+def downgrade() -> None:
+    """
+    Elimina la tabla de estado satelital por parcela
+    """
+    op.drop_table('estado_satelital_parcela')
@@ -0,0 +1,45 @@
+"""Marca de agua de la sincronización satelital por parcela
+
+Revision ID: 009_sincronizacion_satelital
+Revises: 008_estado_satelital_parcela
+Create Date: 2026-10-17 16:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '009_sincronizacion_satelital'
+down_revision: Union[str, None] = '008_estado_satelital_parcela'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """
+    Agrega ultima_fecha_sincronizada y sincronizado_en a estado_satelital_parcela.
+
+    Las parcelas sin marca de agua toman la fecha de su última observación
+    guardada la primera vez que corre la sincronización.
+    """
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    columnas = [c['name'] for c in inspector.get_columns('estado_satelital_parcela')]
+
+    with op.batch_alter_table('estado_satelital_parcela') as batch_op:
+        if 'ultima_fecha_sincronizada' not in columnas:
+            batch_op.add_column(sa.Column('ultima_fecha_sincronizada', sa.Date(), nullable=True))
+        if 'sincronizado_en' not in columnas:
+            batch_op.add_column(sa.Column('sincronizado_en', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    """
+    Elimina la marca de agua de la sincronización
+    """
+    with op.batch_alter_table('estado_satelital_parcela') as batch_op:
+        batch_op.drop_column('sincronizado_en')
+        batch_op.drop_column('ultima_fecha_sincronizada')
@@ -0,0 +1,89 @@
+"""Píxel MOD13Q1 de cada parcela
+
+Revision ID: 010_pixel_modis_parcela
+Revises: 009_sincronizacion_satelital
+Create Date: 2026-10-17 17:00:00
+
+"""
+import math
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '010_pixel_modis_parcela'
+down_revision: Union[str, None] = '009_sincronizacion_satelital'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Grilla sinusoidal MODIS de 250 m (ver src/services/pixel_modis.py)
+RADIO_SINUSOIDAL = 6371007.181
+TAMANO_TILE = 1111950.5197665
+TAMANO_PIXEL = TAMANO_TILE / 4800
+
+
+def _pixel(lat, lon):
+    phi = math.radians(lat)
+    x = RADIO_SINUSOIDAL * math.radians(lon) * math.cos(phi) + 18 * TAMANO_TILE
+    y = 9 * TAMANO_TILE - RADIO_SINUSOIDAL * phi
+    h = min(int(x // TAMANO_TILE), 35)
+    v = min(int(y // TAMANO_TILE), 17)
+    muestra = min(int((x - h * TAMANO_TILE) // TAMANO_PIXEL), 4799)
+    linea = min(int((y - v * TAMANO_TILE) // TAMANO_PIXEL), 4799)
+    return f"h{h:02d}v{v:02d}", linea, muestra
+
+
+def upgrade() -> None:
+    """
+    Agrega modis_tile, modis_linea y modis_muestra a parcelas y los calcula
+    desde el centroide de los vértices (o el punto central si faltan)
+    """
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    columnas = [c['name'] for c in inspector.get_columns('parcelas')]
+    indices = [i['name'] for i in inspector.get_indexes('parcelas')]
+
+    with op.batch_alter_table('parcelas') as batch_op:
+        if 'modis_tile' not in columnas:
+            batch_op.add_column(sa.Column('modis_tile', sa.String(length=6), nullable=True))
+        if 'modis_linea' not in columnas:
+            batch_op.add_column(sa.Column('modis_linea', sa.Integer(), nullable=True))
+        if 'modis_muestra' not in columnas:
+            batch_op.add_column(sa.Column('modis_muestra', sa.Integer(), nullable=True))
+
+    if 'ix_parcelas_pixel_modis' not in indices:
+        op.create_index('ix_parcelas_pixel_modis', 'parcelas', ['modis_tile', 'modis_linea', 'modis_muestra'])
+
+    # Backfill
+    parcelas = conn.execute(sa.text(
+        "SELECT id, latitud, longitud, vertice1_lat, vertice1_lon, vertice2_lat, vertice2_lon, "
+        "vertice3_lat, vertice3_lon, vertice4_lat, vertice4_lon FROM parcelas WHERE modis_tile IS NULL"
+    )).fetchall()
+    for fila in parcelas:
+        vertices = [(fila[i], fila[i + 1]) for i in range(3, 11, 2)]
+        if all(lat is not None and lon is not None for lat, lon in vertices):
+            lat = sum(v[0] for v in vertices) / 4
+            lon = sum(v[1] for v in vertices) / 4
+        elif fila[1] is not None and fila[2] is not None:
+            lat, lon = fila[1], fila[2]
+        else:
+            continue
+        tile, linea, muestra = _pixel(lat, lon)
+        conn.execute(
+            sa.text("UPDATE parcelas SET modis_tile = :tile, modis_linea = :linea, modis_muestra = :muestra WHERE id = :id"),
+            {'tile': tile, 'linea': linea, 'muestra': muestra, 'id': fila[0]}
+        )
+
+
+def downgrade() -> None:
+    """
+    Elimina el píxel MOD13Q1 de las parcelas
+    """
+    op.drop_index('ix_parcelas_pixel_modis', table_name='parcelas')
+    with op.batch_alter_table('parcelas') as batch_op:
+        batch_op.drop_column('modis_muestra')
+        batch_op.drop_column('modis_linea')
+        batch_op.drop_column('modis_tile')
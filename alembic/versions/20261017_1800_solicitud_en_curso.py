@@ -0,0 +1,52 @@
+"""Clave de solicitud en curso en calculos_satelitales
+
+Revision ID: 011_solicitud_en_curso
+Revises: 010_pixel_modis_parcela
+Create Date: 2026-10-17 18:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '011_solicitud_en_curso'
+down_revision: Union[str, None] = '010_pixel_modis_parcela'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """
+    Agrega solicitud_en_curso con índice único (NULL en los cálculos terminados).
+
+    Los cálculos ya en curso quedan sin clave: solo las solicitudes nuevas
+    se unen entre sí.
+    """
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    columnas = [c['name'] for c in inspector.get_columns('calculos_satelitales')]
+    indices = [i['name'] for i in inspector.get_indexes('calculos_satelitales')]
+
+    if 'solicitud_en_curso' not in columnas:
+        with op.batch_alter_table('calculos_satelitales') as batch_op:
+            batch_op.add_column(sa.Column('solicitud_en_curso', sa.String(length=200), nullable=True))
+
+    if 'ix_calculos_satelitales_solicitud_en_curso' not in indices:
+        op.create_index(
+            'ix_calculos_satelitales_solicitud_en_curso',
+            'calculos_satelitales',
+            ['solicitud_en_curso'],
+            unique=True
+        )
+
+
+def downgrade() -> None:
+    """
+    Elimina la clave de solicitud en curso
+    """
+    op.drop_index('ix_calculos_satelitales_solicitud_en_curso', table_name='calculos_satelitales')
+    with op.batch_alter_table('calculos_satelitales') as batch_op:
+        batch_op.drop_column('solicitud_en_curso')
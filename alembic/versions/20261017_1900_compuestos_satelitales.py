@@ -0,0 +1,55 @@
+"""Compuestos satelitales ya devueltos por AppEEARS
+
+Revision ID: 012_compuestos_satelitales
+Revises: 011_solicitud_en_curso
+Create Date: 2026-10-17 19:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '012_compuestos_satelitales'
+down_revision: Union[str, None] = '011_solicitud_en_curso'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """
+    Crea la tabla de compuestos recibidos y la llena con las fechas de NDVI ya guardadas
+    """
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    existing_tables = inspector.get_table_names()
+
+    if 'compuestos_satelitales' in existing_tables:
+        return
+
+    op.create_table(
+        'compuestos_satelitales',
+        sa.Column('parcela_id', sa.Integer(), nullable=False),
+        sa.Column('producto', sa.String(length=50), nullable=False),
+        sa.Column('fecha', sa.Date(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.ForeignKeyConstraint(['parcela_id'], ['parcelas.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('parcela_id', 'producto', 'fecha'),
+        sqlite_with_rowid=False
+    )
+
+    # Backfill: toda observación de NDVI guardada vino de un compuesto recibido
+    op.execute(
+        "INSERT INTO compuestos_satelitales (parcela_id, producto, fecha) "
+        "SELECT parcela_id, producto, fecha FROM observaciones_satelitales "
+        "WHERE capa = '_250m_16_days_NDVI'"
+    )
+
+
+def downgrade() -> None:
+    """
+    Elimina la tabla de compuestos recibidos
+    """
+    op.drop_table('compuestos_satelitales')
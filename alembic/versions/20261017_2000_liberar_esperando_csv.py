@@ -0,0 +1,43 @@
+"""Libera la clave de solicitud de los cálculos que esperan el CSV
+
+Revision ID: 013_liberar_esperando_csv
+Revises: 012_compuestos_satelitales
+Create Date: 2026-10-17 20:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '013_liberar_esperando_csv'
+down_revision: Union[str, None] = '012_compuestos_satelitales'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """
+    Quita solicitud_en_curso de los cálculos en 'esperando_csv'.
+
+    Ningún trabajo los lleva a un estado terminado, así que retenían a las
+    solicitudes idénticas (incluidas las de procesamiento automático).
+    """
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    columnas = [c['name'] for c in inspector.get_columns('calculos_satelitales')]
+
+    if 'solicitud_en_curso' in columnas:
+        op.execute(
+            "UPDATE calculos_satelitales SET solicitud_en_curso = NULL "
+            "WHERE estado_procesamiento = 'esperando_csv'"
+        )
+
+
+def downgrade() -> None:
+    """
+    Sin cambios: las claves liberadas no se pueden reconstruir
+    """
+    pass
@@ -2,7 +2,10 @@
 Configuración de la base de datos usando SQLAlchemy
 """
 
-from sqlalchemy import create_engine
+from contextvars import ContextVar
+from typing import List, Optional
+
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from .settings import settings
@@ -14,6 +17,31 @@ engine = create_engine(
     echo=settings.DEBUG
 )
 
+# Contador de consultas de la solicitud HTTP en curso (lo inicia el middleware de la API).
+# Se guarda una lista mutable para que los endpoints síncronos, que corren en otro
+# hilo con una copia del contexto, incrementen el mismo contador.
+_consultas_solicitud: ContextVar[Optional[List[int]]] = ContextVar("consultas_solicitud", default=None)
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _contar_consulta(conn, cursor, statement, parameters, context, executemany):
+    contador = _consultas_solicitud.get()
+    if contador is not None:
+        contador[0] += 1
+
+
+def iniciar_conteo_consultas() -> List[int]:
+    """
+    Inicia el conteo de consultas SQL para el contexto actual.
+
+    Returns:
+        Contador (lista de un elemento) que acumula las consultas ejecutadas
+    """
+    contador = [0]
+    _consultas_solicitud.set(contador)
+    return contador
+
+
 # Crear session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
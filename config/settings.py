@@ -46,6 +46,10 @@ class Settings(BaseSettings):
     NASA_EARTHDATA_PASSWORD: Optional[str] = None
     NASA_EARTHDATA_TOKEN: Optional[str] = None
 
+    # Caché local de los archivos descargados de AppEEARS
+    APPEEARS_CACHE_DIR: str = "./cache/appeears"
+    APPEEARS_CACHE_MAX_MB: int = 2048
+
     # Coordenadas
     DEFAULT_UTM_ZONE: str = "18M"  # Zona UTM para Amazonas, Colombia
 
@@ -3,9 +3,10 @@ API Principal - FastAPI
 Sistema de Gestión de Biomasa y Carbono - Proyecto Ecoturismo Amazónico
 """
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from config.settings import settings
+from config.database import iniciar_conteo_consultas
 
 # Crear aplicación FastAPI
 app = FastAPI(
@@ -23,8 +24,18 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-DB-Query-Count"],
 )
 
+
+@app.middleware("http")
+async def contar_consultas(request: Request, call_next):
+    """Expone en X-DB-Query-Count las consultas SQL ejecutadas por la solicitud"""
+    contador = iniciar_conteo_consultas()
+    response = await call_next(request)
+    response.headers["X-DB-Query-Count"] = str(contador[0])
+    return response
+
 # Importar routers
 from .routes import parcelas_router
 from .routes.puntos_referencia import router as puntos_router
@@ -35,6 +46,7 @@ from .routes.herbaceas import router as herbaceas_router
 from .routes.calculos import router as calculos_router
 from .routes.calculos_satelitales import router as calculos_satelitales_router
 from .routes.subparcelas import router as subparcelas_router
+from .routes.censos import router as censos_router
 
 # Registrar routers
 app.include_router(parcelas_router, prefix="/api/v1/parcelas", tags=["Parcelas"])
@@ -46,6 +58,7 @@ app.include_router(herbaceas_router, prefix="/api/v1/herbaceas", tags=["Herbáce
 app.include_router(calculos_router, prefix="/api/v1/calculos", tags=["Cálculos de Biomasa"])
 app.include_router(calculos_satelitales_router, prefix="/api/v1/calculos-satelitales", tags=["Cálculos Satelitales"])
 app.include_router(subparcelas_router, prefix="/api/v1/subparcelas", tags=["Subparcelas"])
+app.include_router(censos_router, prefix="/api/v1/censos", tags=["Censos"])
 
 
 @app.get("/")
@@ -3,17 +3,25 @@ Endpoints API para cálculos de biomasa y carbono
 """
 
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import Optional
-from pydantic import BaseModel
+from typing import Optional, Dict, Any
+from pydantic import BaseModel, Field
 
 from config.database import get_db
 from src.services.biomasa_calculator import BiomasaCalculator
+from src.services.incertidumbre_biomasa import simular_biomasa_parcela
+from src.services.snapshot_arboles import cargar_snapshot_arboles
+from src.services.agregados_service import obtener_agregados
+from src.services.modelos_alometricos import obtener_modelo, modelos_registrados
+from src.services.huella_calculo import (
+    cargar_resumen_componentes,
+    calcular_huella,
+    buscar_calculo,
+    calculo_exclusivo,
+)
 from src.models.calculo import CalculoBiomasa
-from src.models.arbol import Arbol
-from src.models.parcela import Parcela
-from src.models.necromasa import Necromasa
-from src.models.herbaceas import Herbaceas
+from src.utils.constants import FACTOR_RAICES, N_SIMULACIONES_DEFECTO
 
 router = APIRouter()
 
@@ -22,6 +30,8 @@ class CalculoRequest(BaseModel):
     parcela_id: int
     modelo_alometrico: str = "chave2014"
     factor_carbono: float = 0.47
+    incertidumbre: bool = False  # Propagar incertidumbre con Monte Carlo
+    n_simulaciones: int = Field(N_SIMULACIONES_DEFECTO, ge=100, le=100000)
 
 
 class CalculoResponse(BaseModel):
@@ -38,6 +48,7 @@ class CalculoResponse(BaseModel):
     carbono_total: float
     factor_carbono: float
     created_at: str
+    incertidumbre: Optional[Dict[str, Any]] = None  # Solo si se solicitó
 
     class Config:
         from_attributes = True
@@ -69,77 +80,100 @@ def ejecutar_calculo(
     db: Session = Depends(get_db)
 ):
     """
-    Ejecuta el cálculo de biomasa y carbono para una parcela
+    Ejecuta el cálculo de biomasa y carbono para una parcela.
+
+    Si las mediciones, el modelo y el factor de carbono no cambiaron desde
+    un cálculo anterior, retorna ese mismo registro sin recalcular. Si no,
+    arma el cálculo con los agregados de la parcela.
     """
     try:
-        # Verificar que la parcela existe
-        parcela = db.query(Parcela).filter(Parcela.id == request.parcela_id).first()
-        if not parcela:
-            raise HTTPException(status_code=404, detail="Parcela no encontrada")
-
-        # Obtener árboles de la parcela
-        arboles = db.query(Arbol).filter(Arbol.parcela_id == request.parcela_id).all()
-
-        # Crear calculadora
-        calculator = BiomasaCalculator()
-        calculator.factor_carbono = request.factor_carbono
-
-        # Normalizar nombre del modelo
-        modelo = request.modelo_alometrico.lower().replace(" ", "_")
-        if modelo == "chave2014":
-            modelo = "chave_2014"
-        elif modelo == "ipcc":
-            modelo = "ipcc_2006"
-
-        # Calcular biomasa arbórea
-        resultado_arboles = calculator.calcular_biomasa_parcela(arboles, modelo=modelo)
-        biomasa_aerea = resultado_arboles.get("biomasa_total_mg", 0)  # en toneladas (Mg)
-
-        # Calcular biomasa subterránea (raíces) - aproximadamente 20-30% de la aérea según IPCC
-        factor_raices = 0.25  # 25% típico para bosques tropicales
-        biomasa_subterranea = biomasa_aerea * factor_raices
-
-        # Calcular necromasa
-        necromasas = db.query(Necromasa).filter(Necromasa.parcela_id == request.parcela_id).all()
-        biomasa_necromasa = 0.0
-        if necromasas:
-            # Sumar peso seco de todas las necromasas y extrapolar a hectárea
-            peso_seco_total = sum(n.peso_seco for n in necromasas)
-            # peso_seco está en kg, convertir a toneladas
-            biomasa_necromasa = peso_seco_total / 1000.0
-
-        # Calcular herbáceas
-        herbaceas_list = db.query(Herbaceas).filter(Herbaceas.parcela_id == request.parcela_id).all()
-        biomasa_herbaceas = 0.0
-        if herbaceas_list:
-            # Sumar peso seco de todas las herbáceas
-            peso_seco_total = sum(h.peso_seco for h in herbaceas_list)
-            # peso_seco está en kg, convertir a toneladas
-            biomasa_herbaceas = peso_seco_total / 1000.0
-
-        # Calcular totales
-        biomasa_total = biomasa_aerea + biomasa_subterranea + biomasa_necromasa + biomasa_herbaceas
-        carbono_total = biomasa_total * request.factor_carbono
-
-        # Crear registro de cálculo
-        calculo = CalculoBiomasa(
-            parcela_id=request.parcela_id,
-            modelo_alometrico=request.modelo_alometrico,
-            biomasa_aerea=biomasa_aerea,
-            biomasa_subterranea=biomasa_subterranea,
-            biomasa_necromasa=biomasa_necromasa,
-            biomasa_herbaceas=biomasa_herbaceas,
-            biomasa_total=biomasa_total,
-            carbono_total=carbono_total,
-            factor_carbono=request.factor_carbono
-        )
-
-        db.add(calculo)
-        db.commit()
-        db.refresh(calculo)
-
-        return CalculoResponse.from_orm(calculo)
-
+        # Resolver el nombre del modelo en el registro ('chave2014', 'Chave2014' → 'chave_2014')
+        modelo = obtener_modelo(request.modelo_alometrico).nombre
+
+        snapshot = None
+
+        # Solicitudes idénticas simultáneas esperan al primer cálculo en lugar de repetirlo
+        with calculo_exclusivo(request.parcela_id, modelo, request.factor_carbono):
+            # Primera consulta: existencia de la parcela, sumas de necromasa y
+            # herbáceas y el estado de todas las mediciones (UNION ALL)
+            resumen = cargar_resumen_componentes(db, request.parcela_id)
+            if not resumen["parcela"]["cantidad"]:
+                raise HTTPException(status_code=404, detail="Parcela no encontrada")
+
+            # Si las mediciones no cambiaron desde el último cálculo, reutilizarlo
+            huella = calcular_huella(resumen, modelo, request.factor_carbono)
+            calculo = buscar_calculo(db, request.parcela_id, huella)
+
+            if calculo is None:
+                # Totales mantenidos por parcela: no se recorre la parcela completa
+                agregados = obtener_agregados(db, request.parcela_id)
+                biomasa_aerea_kg = agregados["biomasa_aerea_kg"].get(modelo)
+
+                if biomasa_aerea_kg is None:
+                    # Modelo sin agregado: árboles de la parcela como arreglos (con la especie)
+                    snapshot = cargar_snapshot_arboles(db, request.parcela_id)
+                    calculator = BiomasaCalculator()
+                    calculator.factor_carbono = request.factor_carbono
+                    biomasa_aerea_kg = calculator.calcular_biomasa_lote(
+                        snapshot.dap, snapshot.altura, snapshot.densidad_madera, modelos=[modelo]
+                    )[modelo]["parcela"].get("biomasa_total_kg", 0)
+
+                biomasa_aerea = biomasa_aerea_kg / 1000.0  # en toneladas (Mg)
+
+                # Calcular biomasa subterránea (raíces) - aproximadamente 20-30% de la aérea según IPCC
+                biomasa_subterranea = biomasa_aerea * FACTOR_RAICES
+
+                # Necromasa y herbáceas: peso seco acumulado (kg → toneladas)
+                biomasa_necromasa = (agregados["necromasa_seca_kg"] or 0.0) / 1000.0
+                biomasa_herbaceas = (agregados["herbaceas_seca_kg"] or 0.0) / 1000.0
+
+                # Calcular totales
+                biomasa_total = biomasa_aerea + biomasa_subterranea + biomasa_necromasa + biomasa_herbaceas
+                carbono_total = biomasa_total * request.factor_carbono
+
+                # Crear registro de cálculo
+                calculo = CalculoBiomasa(
+                    parcela_id=request.parcela_id,
+                    modelo_alometrico=request.modelo_alometrico,
+                    biomasa_aerea=biomasa_aerea,
+                    biomasa_subterranea=biomasa_subterranea,
+                    biomasa_necromasa=biomasa_necromasa,
+                    biomasa_herbaceas=biomasa_herbaceas,
+                    biomasa_total=biomasa_total,
+                    carbono_total=carbono_total,
+                    factor_carbono=request.factor_carbono,
+                    huella_entrada=huella
+                )
+
+                db.add(calculo)
+                try:
+                    db.commit()
+                    db.refresh(calculo)
+                except IntegrityError:
+                    # Otro proceso guardó el mismo cálculo primero
+                    db.rollback()
+                    calculo = buscar_calculo(db, request.parcela_id, huella)
+
+        respuesta = CalculoResponse.from_orm(calculo)
+
+        # Intervalos de confianza (necromasa y herbáceas se suman como valores fijos)
+        if request.incertidumbre:
+            if snapshot is None:
+                snapshot = cargar_snapshot_arboles(db, request.parcela_id)
+            respuesta.incertidumbre = simular_biomasa_parcela(
+                snapshot.dap,
+                snapshot.altura,
+                snapshot.densidad_madera,
+                modelo=modelo,
+                n_simulaciones=request.n_simulaciones,
+                factor_carbono=request.factor_carbono,
+                biomasa_fija_kg=((calculo.biomasa_necromasa or 0.0) + (calculo.biomasa_herbaceas or 0.0)) * 1000
+            )
+
+        return respuesta
+
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -148,6 +182,12 @@ def ejecutar_calculo(
         raise HTTPException(status_code=500, detail=f"Error en cálculo: {str(e)}")
 
 
+@router.get("/modelos")
+def listar_modelos(grupo: Optional[str] = None):
+    """Lista los modelos alométricos registrados con sus coeficientes y entradas"""
+    return [obtener_modelo(nombre).como_dict() for nombre in modelos_registrados(grupo)]
+
+
 @router.get("/parcela/{parcela_id}", response_model=list[CalculoResponse])
 def obtener_calculos_parcela(
     parcela_id: int,
@@ -160,6 +200,24 @@ def obtener_calculos_parcela(
     return [CalculoResponse.from_orm(c) for c in calculos]
 
 
+@router.get("/parcela/{parcela_id}/agregados")
+def obtener_agregados_parcela(
+    parcela_id: int,
+    db: Session = Depends(get_db)
+):
+    """
+    Obtiene los totales acumulados de una parcela sin recalcular.
+
+    Incluye número de árboles, área basal, biomasa aérea por modelo alométrico
+    y peso seco de necromasa y herbáceas. Se mantienen al día con cada
+    registro, modificación o eliminación.
+    """
+    agregados = obtener_agregados(db, parcela_id)
+    if agregados is None:
+        raise HTTPException(status_code=404, detail="Parcela no encontrada")
+    return agregados
+
+
 @router.get("/subparcela/{subparcela_id}", response_model=list[CalculoResponse])
 def obtener_calculos_subparcela(
     subparcela_id: int,
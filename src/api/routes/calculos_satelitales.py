@@ -2,15 +2,13 @@
 Endpoints API para cálculos satelitales con NASA AppEEARS
 """
 
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List
-from datetime import datetime
-import os
-import csv
-import math
+from typing import List, Optional
+from datetime import date
 import json
-from io import StringIO
+import logging
 
 from config.database import get_db
 from config.settings import get_settings
@@ -18,22 +16,51 @@ from src.models.calculo_satelital import CalculoSatelital
 from src.models.parcela import Parcela
 from src.api.schemas.calculo_satelital_schema import (
     CalculoSatelitalRequest,
+    CalculoSatelitalLoteRequest,
+    CalculoSatelitalLoteResponse,
+    CalculoSatelitalReprocesarRequest,
     CalculoSatelitalResponse,
     CalculoSatelitalSimple,
     CalculoSatelitalEstado,
     SerieTemporalResponse
 )
-from src.services.nasa_appeears_service import (
-    NASAAppEEARSService,
-    estimar_biomasa_desde_ndvi,
-    estimar_carbono_desde_biomasa
+from src.services.nasa_appeears_service import NASAAppEEARSService, TIPOS_TAREA
+from src.services.nasa_appeears_async import NASAAppEEARSAsyncClient, TareasLoteIncompletas, obtener_cliente_async
+from src.services.cola_satelital import ColaSatelitalService
+from src.services.deteccion_cambios import DeteccionCambiosService
+from src.services.csv_appeears import (
+    abrir_texto,
+    leer_csv_appeears,
+    numero_aid,
+    repartir_por_pixel,
+    serie_para_parcela,
+    series_por_aid,
+    series_por_parcela
 )
+from src.services.observaciones_service import PRODUCTO_MOD13Q1, ObservacionesService, producto_observaciones
+from src.services.procesamiento_satelital import (
+    aplicar_observaciones,
+    asignar_series,
+    aplicar_serie_temporal,
+    pixeles_de_parcelas,
+    preparar_series,
+    serie_con_estimaciones,
+    series_en_cache
+)
+from src.services.sincronizacion_satelital import SincronizacionSatelitalService
+from src.services.solicitud_satelital import buscar_en_curso, clave_solicitud, registrar_solicitud
+from src.services.trabajador_satelital import encolar_tarea_appeears, parametros_de_tarea
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Modelo de estimación de los cálculos creados desde un CSV subido
+MODELO_CSV = "NDVI-Biomasa (CSV)"
 
-def get_nasa_service() -> NASAAppEEARSService:
-    """Obtiene instancia del servicio NASA AppEEARS"""
+
+def _credenciales_nasa():
+    """Usuario y contraseña de NASA EarthData desde la configuración"""
     settings = get_settings()
     username = settings.NASA_EARTHDATA_USERNAME
     password = settings.NASA_EARTHDATA_PASSWORD
@@ -50,6 +77,13 @@ def get_nasa_service() -> NASAAppEEARSService:
             detail="Debe configurar NASA_EARTHDATA_PASSWORD en .env"
         )
 
+    return username, password
+
+
+def get_nasa_service() -> NASAAppEEARSService:
+    """Obtiene instancia del servicio NASA AppEEARS (reutiliza el token en caché)"""
+    username, password = _credenciales_nasa()
+
     try:
         # Solo pasar username y password - el servicio obtendrá el token de AppEEARS automáticamente
         return NASAAppEEARSService(username, password=password)
@@ -60,252 +94,57 @@ def get_nasa_service() -> NASAAppEEARSService:
         )
 
 
-def procesar_calculo_background(
-    calculo_id: int,
-    parcela_id: int,
-    vertices: List[List[float]],
-    fecha_inicio,
-    fecha_fin,
-    modelo_estimacion: str,
-    factor_carbono: float,
-    db: Session,
-    codigo_parcela: str = None
-):
-    """
-    Procesa el cálculo satelital en segundo plano
-    (En producción, esto se ejecutaría con Celery o similar)
-    """
-    try:
-        # Obtener servicio NASA
-        nasa_service = get_nasa_service()
-
-        # Crear tarea en AppEEARS
-        task_id = nasa_service.crear_tarea_ndvi(
-            parcela_id,
-            vertices,
-            fecha_inicio,
-            fecha_fin,
-            codigo_parcela=codigo_parcela
-        )
-
-        # Actualizar con task_id
-        calculo = db.query(CalculoSatelital).filter(CalculoSatelital.id == calculo_id).first()
-        calculo.nasa_task_id = task_id
-        calculo.estado_procesamiento = 'procesando'
-        db.commit()
-
-        # Esperar completación (esto puede tomar 10-30 minutos)
-        # NOTA: En producción, esto se haría de forma asíncrona
-        completado = nasa_service.esperar_completacion(task_id, max_intentos=60, intervalo_segundos=30)
-
-        if not completado:
-            calculo.estado_procesamiento = 'error'
-            calculo.error_mensaje = 'La tarea no se completó en el tiempo esperado'
-            db.commit()
-            return
-
-        # Obtener resultados
-        resultados = nasa_service.obtener_resultados(task_id)
-
-        # Procesar archivos CSV descargados de NASA (Point Sample)
-        import os
-        import tempfile
-        from datetime import timedelta, datetime as dt
-        import csv
-
-        serie_temporal = []
-        archivos_procesados = 0
-
-        # Crear directorio temporal para descargas
-        temp_dir = tempfile.mkdtemp()
-
-        try:
-            # Obtener lista de archivos disponibles
-            files = resultados.get('files', [])
-
-            # Buscar el archivo CSV con los datos
-            for file_info in files:
-                file_id = file_info.get('file_id')
-                file_name = file_info.get('file_name', '')
-
-                # Buscar archivo CSV con datos de punto
-                if file_name.endswith('.csv') and 'MOD13Q1' in file_name:
-                    try:
-                        destino = os.path.join(temp_dir, file_name)
-
-                        # Descargar archivo
-                        if nasa_service.descargar_archivo(task_id, file_id, destino):
-                            archivos_procesados += 1
-
-                            # Leer CSV
-                            with open(destino, 'r') as csvfile:
-                                reader = csv.DictReader(csvfile)
-
-                                for row in reader:
-                                    try:
-                                        # Extraer fecha
-                                        fecha_str = row.get('Date')
-                                        if not fecha_str:
-                                            continue
-
-                                        # Parsear fecha
-                                        fecha_obj = dt.strptime(fecha_str, '%Y-%m-%d')
-
-                                        # Buscar si ya existe punto para esta fecha
-                                        punto_existente = None
-                                        for punto in serie_temporal:
-                                            if punto.get('fecha') == fecha_obj.date().isoformat():
-                                                punto_existente = punto
-                                                break
-
-                                        if not punto_existente:
-                                            punto_existente = {
-                                                'fecha': fecha_obj.date().isoformat(),
-                                                'calidad': 'buena'
-                                            }
-                                            serie_temporal.append(punto_existente)
-
-                                        # Extraer valores NDVI y EVI
-                                        # Las columnas dependen del producto, buscar por nombre
-                                        for key, value in row.items():
-                                            if 'NDVI' in key and value and value != 'NA':
-                                                try:
-                                                    # MODIS NDVI viene escalado por 10000
-                                                    ndvi_val = float(value) / 10000.0
-                                                    if -1 <= ndvi_val <= 1:
-                                                        punto_existente['ndvi'] = round(ndvi_val, 4)
-                                                except:
-                                                    pass
-
-                                            if 'EVI' in key and value and value != 'NA':
-                                                try:
-                                                    evi_val = float(value) / 10000.0
-                                                    if -1 <= evi_val <= 1:
-                                                        punto_existente['evi'] = round(evi_val, 4)
-                                                except:
-                                                    pass
-
-                                    except Exception as e:
-                                        print(f"Error procesando fila CSV: {e}")
-                                        continue
-
-                    except Exception as e:
-                        print(f"Error procesando {file_name}: {e}")
-                        continue
-
-        finally:
-            # Limpiar archivos temporales
-            import shutil
-            shutil.rmtree(temp_dir, ignore_errors=True)
-
-        # Si no se procesaron archivos (error o sin datos), usar simulación como fallback
-        if len(serie_temporal) == 0:
-            print("WARNING: No se pudieron procesar archivos GeoTIFF. Usando datos simulados.")
-            import random
-            fecha_actual = fecha_inicio
-            ndvi_base = 0.78
-
-            while fecha_actual <= fecha_fin:
-                variacion = random.uniform(-0.08, 0.08)
-                ndvi_dia = max(0.65, min(0.90, ndvi_base + variacion))
-                evi_dia = ndvi_dia * 0.8
-
-                serie_temporal.append({
-                    'fecha': fecha_actual.isoformat(),
-                    'ndvi': round(ndvi_dia, 4),
-                    'evi': round(evi_dia, 4),
-                    'calidad': 'buena' if random.random() > 0.2 else 'nubosidad'
-                })
-                fecha_actual += timedelta(days=16)
-
-        # Calcular biomasa y carbono para cada punto
-        for punto in serie_temporal:
-            if 'ndvi' in punto:
-                biomasa_dia = estimar_biomasa_desde_ndvi(punto['ndvi'], area_ha=0.1)
-                carbono_dia = estimar_carbono_desde_biomasa(biomasa_dia, factor_carbono)
-                punto['biomasa'] = round(biomasa_dia, 4)
-                punto['carbono'] = round(carbono_dia, 4)
-
-        # Filtrar solo observaciones de buena calidad
-        serie_buena_calidad = [s for s in serie_temporal if s.get('calidad') == 'buena' and 'ndvi' in s and 'evi' in s]
-
-        if len(serie_buena_calidad) == 0:
-            serie_buena_calidad = serie_temporal  # Usar todas si no hay buenas
-
-        # Calcular promedios
-        ndvi_promedio = sum(s['ndvi'] for s in serie_buena_calidad) / len(serie_buena_calidad)
-        evi_promedio = sum(s.get('evi', s['ndvi'] * 0.8) for s in serie_buena_calidad) / len(serie_buena_calidad)
-        ndvi_min = min(s['ndvi'] for s in serie_buena_calidad)
-        ndvi_max = max(s['ndvi'] for s in serie_buena_calidad)
-        evi_min = min(s.get('evi', s['ndvi'] * 0.8) for s in serie_buena_calidad)
-        evi_max = max(s.get('evi', s['ndvi'] * 0.8) for s in serie_buena_calidad)
-
-        # Estimar biomasa usando modelo
-        biomasa_mg = estimar_biomasa_desde_ndvi(ndvi_promedio, area_ha=0.1)
-        carbono = estimar_carbono_desde_biomasa(biomasa_mg, factor_carbono)
-
-        # Actualizar registro
-        calculo.fuente_datos = 'NASA_MODIS'
-        calculo.producto = 'MOD13Q1.061'
-        calculo.ndvi_promedio = ndvi_promedio
-        calculo.ndvi_min = ndvi_min
-        calculo.ndvi_max = ndvi_max
-        calculo.ndvi_std = 0.05
-        calculo.evi_promedio = evi_promedio
-        calculo.evi_min = evi_min
-        calculo.evi_max = evi_max
-        calculo.biomasa_aerea_estimada = biomasa_mg
-        calculo.biomasa_por_hectarea = biomasa_mg / 0.1
-        calculo.carbono_estimado = carbono
-        calculo.carbono_por_hectarea = carbono / 0.1
-        calculo.modelo_estimacion = modelo_estimacion
-        calculo.num_imagenes_usadas = len(serie_temporal)
-        calculo.cobertura_nubosidad_pct = (1 - len(serie_buena_calidad) / len(serie_temporal)) * 100
-        calculo.calidad_datos = calculo.clasificar_calidad_ndvi()
-        calculo.estado_procesamiento = 'completado'
-
-        # Guardar serie temporal completa en JSON
-        import json
-        calculo.serie_temporal = json.dumps(serie_temporal)
-
-        db.commit()
-
-    except Exception as e:
-        # Marcar como error
-        calculo = db.query(CalculoSatelital).filter(CalculoSatelital.id == calculo_id).first()
-        if calculo:
-            calculo.estado_procesamiento = 'error'
-            calculo.error_mensaje = str(e)
-            db.commit()
+def get_nasa_async_client() -> NASAAppEEARSAsyncClient:
+    """Obtiene el cliente asíncrono compartido de NASA AppEEARS"""
+    username, password = _credenciales_nasa()
+    return obtener_cliente_async(username, password)
 
 
 @router.post("/", response_model=CalculoSatelitalResponse, status_code=201)
 async def crear_calculo_satelital(
     request: CalculoSatelitalRequest,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
     """
     Crea un cálculo satelital para una parcela
 
-    El procesamiento se ejecuta en segundo plano y puede tomar 10-30 minutos.
+    Crea la tarea en AppEEARS y deja el cálculo esperando el CSV. Con
+    `procesar_automaticamente` la tarea queda en la cola de trabajos y el
+    trabajador satelital la procesa al completarse (10-30 minutos).
+    Con `tipo_tarea='area'` se pide el polígono completo y el trabajador
+    resume sus píxeles (estadísticas zonales); no hay CSV que subir.
+
+    Si las observaciones ya guardadas de la parcela cubren el periodo, el
+    cálculo se completa al instante sin AppEEARS; si todos sus compuestos
+    llegaron enmascarados, queda en error sin pedir otra tarea. Si lo cubren en parte,
+    la tarea pide solo las fechas que faltan y el trabajador completa el
+    cálculo con todo el periodo.
     Use el endpoint GET /{id}/estado para verificar el progreso.
 
     Si ya existe un cálculo completado para el mismo periodo y modelo, lo retorna
-    (cacheo para evitar procesamiento duplicado)
+    (cacheo para evitar procesamiento duplicado). Si hay uno todavía en
+    curso (otro usuario o un reintento), retorna ese en lugar de crear otra
+    tarea en AppEEARS.
     """
+    if request.tipo_tarea not in TIPOS_TAREA:
+        raise HTTPException(status_code=400, detail=f"tipo_tarea debe ser uno de: {', '.join(TIPOS_TAREA)}")
+
     try:
         # Verificar que la parcela existe
         parcela = db.query(Parcela).filter(Parcela.id == request.parcela_id).first()
         if not parcela:
             raise HTTPException(status_code=404, detail="Parcela no encontrada")
 
+        # Observaciones point y medias zonales area se guardan por separado
+        producto = producto_observaciones(request.tipo_tarea)
+
         # Buscar si ya existe un cálculo similar completado (cache)
         calculo_existente = db.query(CalculoSatelital).filter(
             CalculoSatelital.parcela_id == request.parcela_id,
             CalculoSatelital.fecha_inicio == request.fecha_inicio,
             CalculoSatelital.fecha_fin == request.fecha_fin,
             CalculoSatelital.modelo_estimacion == request.modelo_estimacion,
+            CalculoSatelital.producto == producto,
             CalculoSatelital.estado_procesamiento == 'completado'
         ).first()
 
@@ -313,6 +152,47 @@ async def crear_calculo_satelital(
             # Retornar el cálculo existente (cache hit)
             return calculo_existente
 
+        # Misma solicitud en curso: unirse a ella
+        clave = clave_solicitud(
+            request.parcela_id,
+            request.fecha_inicio,
+            request.fecha_fin,
+            request.modelo_estimacion,
+            request.tipo_tarea
+        )
+        calculo_en_curso = buscar_en_curso(db, clave)
+        if calculo_en_curso:
+            return calculo_en_curso
+
+        # Periodo cubierto por observaciones ya guardadas del mismo tipo de tarea
+        # (de cualquier cálculo anterior): se responde con los datos locales, sin tarea en AppEEARS
+        faltantes = ObservacionesService(db).rangos_faltantes(
+            request.parcela_id, request.fecha_inicio, request.fecha_fin, producto=producto
+        )
+        if not faltantes:
+            calculo = CalculoSatelital(
+                parcela_id=request.parcela_id,
+                fecha_inicio=request.fecha_inicio,
+                fecha_fin=request.fecha_fin,
+                estado_procesamiento='pendiente'
+            )
+            if aplicar_observaciones(db, calculo, request.modelo_estimacion, request.factor_carbono, producto):
+                calculo.observaciones = "Calculado con observaciones ya descargadas (sin tarea en AppEEARS)"
+            else:
+                # Todos los compuestos del periodo llegaron enmascarados: pedirlos otra vez daría lo mismo
+                calculo.producto = producto
+                calculo.modelo_estimacion = request.modelo_estimacion
+                calculo.factor_carbono = request.factor_carbono
+                calculo.estado_procesamiento = 'error'
+                calculo.error_mensaje = "No hay NDVI utilizable en el periodo"
+                db.add(calculo)
+            db.commit()
+            db.refresh(calculo)
+            return calculo
+
+        # Si parte del periodo ya está guardado, la tarea pide solo lo que falta
+        parcial = bool(faltantes) and faltantes != [(request.fecha_inicio, request.fecha_fin)]
+
         # Obtener vértices
         vertices = [
             [parcela.vertice1_lat, parcela.vertice1_lon],
@@ -338,24 +218,49 @@ async def crear_calculo_satelital(
             estado_procesamiento='pendiente'
         )
 
-        db.add(calculo)
-        db.commit()
-        db.refresh(calculo)
+        # Solo la primera de varias solicitudes simultáneas crea la tarea
+        calculo, creado = registrar_solicitud(db, calculo, clave)
+        if not creado:
+            return calculo
 
-        # Crear tarea en NASA pero NO procesarla automáticamente
-        # Usuario descargará CSV manualmente y lo subirá
+        # Crear tarea en NASA; por defecto el usuario descargará el CSV manualmente y lo subirá
         try:
-            nasa_service = get_nasa_service()
-            task_id = nasa_service.crear_tarea_ndvi(
-                request.parcela_id,
-                vertices,
-                request.fecha_inicio,
-                request.fecha_fin,
-                codigo_parcela=parcela.codigo
-            )
+            nasa_client = get_nasa_async_client()
+            if request.tipo_tarea == 'area':
+                [(task_id, orden)] = await nasa_client.crear_tarea_ndvi_lote(
+                    [{'parcela_id': request.parcela_id, 'vertices': vertices}],
+                    request.fecha_inicio,
+                    request.fecha_fin,
+                    tipo_tarea='area'
+                )
+            else:
+                task_id = await nasa_client.crear_tarea_ndvi(
+                    request.parcela_id,
+                    vertices,
+                    request.fecha_inicio,
+                    request.fecha_fin,
+                    codigo_parcela=parcela.codigo,
+                    rangos=faltantes if parcial else None
+                )
+                orden = None
             calculo.nasa_task_id = task_id
-            calculo.estado_procesamiento = 'esperando_csv'
-            db.commit()
+            if request.procesar_automaticamente or request.tipo_tarea == 'area' or parcial:
+                calculo.estado_procesamiento = 'procesando'
+                encolar_tarea_appeears(
+                    db,
+                    {request.parcela_id: calculo.id},
+                    request.fecha_inicio,
+                    request.fecha_fin,
+                    request.modelo_estimacion,
+                    request.factor_carbono,
+                    nasa_task_id=task_id,
+                    tipo_tarea=request.tipo_tarea,
+                    orden=orden,
+                    completar_con_observaciones=parcial
+                )
+            else:
+                calculo.estado_procesamiento = 'esperando_csv'
+                db.commit()
         except Exception as e:
             print(f"Error creando tarea NASA: {e}")
             calculo.estado_procesamiento = 'error'
@@ -372,6 +277,255 @@ async def crear_calculo_satelital(
         raise HTTPException(status_code=500, detail=f"Error al crear cálculo: {str(e)}")
 
 
+@router.post("/lote", response_model=CalculoSatelitalLoteResponse, status_code=201)
+async def crear_calculos_satelitales_lote(
+    request: CalculoSatelitalLoteRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Crea cálculos satelitales para varias parcelas con pocas tareas en AppEEARS.
+
+    Las parcelas viajan en la misma tarea point con una coordenada por
+    píxel MOD13Q1 (hasta MAX_COORDENADAS_POR_TAREA píxeles por tarea), con
+    el ID 'parcela_{id}' de la primera parcela del píxel. Cada tarea queda en la cola de trabajos: al completarse,
+    el trabajador descarga el CSV una sola vez y lo reparte entre los
+    cálculos según su columna 'ID' y su píxel. Con `tipo_tarea='area'` viajan los
+    polígonos (hasta MAX_POLIGONOS_POR_TAREA) y el trabajador resume los
+    GeoTIFF de cada uno.
+
+    Las parcelas con un cálculo completado o en curso para el mismo periodo
+    y modelo lo reutilizan; las que no tienen todos los vértices se omiten.
+    Si alguna tarea no se puede crear, solo los cálculos de sus parcelas
+    quedan en error (con `error_mensaje`); responde 502 si no se creó ninguna.
+    """
+    if request.tipo_tarea not in TIPOS_TAREA:
+        raise HTTPException(status_code=400, detail=f"tipo_tarea debe ser uno de: {', '.join(TIPOS_TAREA)}")
+
+    query = db.query(Parcela)
+    if request.parcela_ids:
+        query = query.filter(Parcela.id.in_(request.parcela_ids))
+    else:
+        query = query.filter(Parcela.estado == 'activa')
+    parcelas = query.order_by(Parcela.id).all()
+
+    if not parcelas:
+        raise HTTPException(status_code=404, detail="No se encontraron parcelas")
+
+    # Cálculos completados para el mismo periodo y modelo (cache), en una consulta
+    existentes = {
+        calculo.parcela_id: calculo
+        for calculo in db.query(CalculoSatelital).filter(
+            CalculoSatelital.parcela_id.in_([p.id for p in parcelas]),
+            CalculoSatelital.fecha_inicio == request.fecha_inicio,
+            CalculoSatelital.fecha_fin == request.fecha_fin,
+            CalculoSatelital.modelo_estimacion == request.modelo_estimacion,
+            CalculoSatelital.producto == producto_observaciones(request.tipo_tarea),
+            CalculoSatelital.estado_procesamiento == 'completado'
+        )
+    }
+
+    # Solicitudes idénticas todavía en curso, en una consulta
+    claves = {
+        parcela.id: clave_solicitud(
+            parcela.id,
+            request.fecha_inicio,
+            request.fecha_fin,
+            request.modelo_estimacion,
+            request.tipo_tarea
+        )
+        for parcela in parcelas
+    }
+    en_curso = {
+        calculo.parcela_id: calculo
+        for calculo in db.query(CalculoSatelital).filter(
+            CalculoSatelital.solicitud_en_curso.in_(list(claves.values()))
+        )
+    }
+
+    reutilizados = []
+    omitidas = []
+    por_enviar = []
+    for parcela in parcelas:
+        if parcela.id in existentes or parcela.id in en_curso:
+            reutilizados.append(existentes.get(parcela.id) or en_curso[parcela.id])
+            continue
+        vertices = [list(v) for v in parcela.vertices]
+        if any(v[0] is None or v[1] is None for v in vertices):
+            omitidas.append(parcela.id)
+            continue
+        por_enviar.append({'parcela_id': parcela.id, 'vertices': vertices})
+
+    calculos = {}
+    tareas = []
+    if por_enviar:
+        # Crear registros iniciales
+        for parcela in por_enviar:
+            calculo = CalculoSatelital(
+                parcela_id=parcela['parcela_id'],
+                fecha_inicio=request.fecha_inicio,
+                fecha_fin=request.fecha_fin,
+                modelo_estimacion=request.modelo_estimacion,
+                factor_carbono=request.factor_carbono,
+                estado_procesamiento='pendiente',
+                solicitud_en_curso=claves[parcela['parcela_id']]
+            )
+            db.add(calculo)
+            calculos[parcela['parcela_id']] = calculo
+        try:
+            db.commit()
+        except IntegrityError:
+            # Otra solicitud con alguna de estas parcelas y el mismo periodo se guardó primero
+            db.rollback()
+            raise HTTPException(
+                status_code=409,
+                detail="Otra solicitud para estas parcelas y periodo se está registrando; reintente para unirse a ella"
+            )
+
+        # Si solo algunas tareas fallan, las creadas siguen su curso y solo
+        # las parcelas de las tareas fallidas quedan en error (y se pueden reintentar)
+        fallidas = []
+        try:
+            nasa_client = get_nasa_async_client()
+            tareas = await nasa_client.crear_tarea_ndvi_lote(
+                por_enviar,
+                request.fecha_inicio,
+                request.fecha_fin,
+                tipo_tarea=request.tipo_tarea
+            )
+        except TareasLoteIncompletas as e:
+            logger.error(f"Error creando tareas NASA en lote: {e}")
+            tareas, fallidas = e.creadas, e.fallidas
+        except Exception as e:
+            logger.exception("Error creando tareas NASA en lote")
+            fallidas = [(e, list(calculos))]
+
+        for error, parcela_ids in fallidas:
+            for parcela_id in parcela_ids:
+                calculos[parcela_id].estado_procesamiento = 'error'
+                calculos[parcela_id].error_mensaje = f"Error al crear tarea en NASA: {str(error)}"
+        for task_id, parcela_ids in tareas:
+            for parcela_id in parcela_ids:
+                calculos[parcela_id].nasa_task_id = task_id
+                calculos[parcela_id].estado_procesamiento = 'procesando'
+        db.commit()
+
+        if not tareas:
+            raise HTTPException(status_code=502, detail=f"Error al crear tareas en NASA: {str(fallidas[0][0])}")
+
+        # Un trabajo por tarea en la cola persistente (lo procesa el trabajador satelital)
+        for task_id, parcela_ids in tareas:
+            encolar_tarea_appeears(
+                db,
+                {parcela_id: calculos[parcela_id].id for parcela_id in parcela_ids},
+                request.fecha_inicio,
+                request.fecha_fin,
+                request.modelo_estimacion,
+                request.factor_carbono,
+                nasa_task_id=task_id,
+                tipo_tarea=request.tipo_tarea,
+                orden=parcela_ids
+            )
+
+    return {
+        'tareas': [task_id for task_id, _ in tareas],
+        'calculos': [
+            {
+                'parcela_id': c.parcela_id,
+                'calculo_id': c.id,
+                'nasa_task_id': c.nasa_task_id,
+                'reutilizado': False,
+                'error_mensaje': c.error_mensaje
+            }
+            for c in calculos.values()
+        ] + [
+            {'parcela_id': c.parcela_id, 'calculo_id': c.id, 'nasa_task_id': c.nasa_task_id, 'reutilizado': True}
+            for c in reutilizados
+        ],
+        'parcelas_omitidas': omitidas
+    }
+
+
+@router.get("/cola")
+def obtener_estado_cola(db: Session = Depends(get_db)):
+    """
+    Estado de la cola de trabajos satelitales
+
+    Incluye trabajos por estado, profundidad (pendientes + en curso),
+    trabajos listos para ejecutarse, antigüedad del más viejo en espera
+    y tiempos promedio de espera y duración por tipo.
+    """
+    return ColaSatelitalService(db).estado_cola()
+
+
+@router.get("/cola/trabajos")
+def listar_trabajos_cola(
+    estado: Optional[str] = None,
+    limite: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db)
+):
+    """Lista los trabajos más recientes de la cola con sus tiempos"""
+    return ColaSatelitalService(db).listar(estado=estado, limite=limite)
+
+
+@router.post("/cambios/evaluar")
+def evaluar_cambios(
+    parcela_ids: Optional[List[int]] = Query(None),
+    forzar: bool = False,
+    tipo_tarea: str = 'point',
+    db: Session = Depends(get_db)
+):
+    """
+    Detección de cambios sobre las series NDVI guardadas
+
+    Evalúa en bloque las parcelas con compuestos nuevos desde la última
+    pasada (o todas con `forzar`) y escribe `cambio_detectado` y
+    `alerta_generada` en el último cálculo completado de cada una.
+    Con `tipo_tarea='area'` evalúa las medias zonales en lugar de las
+    muestras point.
+    """
+    if tipo_tarea not in TIPOS_TAREA:
+        raise HTTPException(status_code=400, detail=f"tipo_tarea debe ser uno de: {', '.join(TIPOS_TAREA)}")
+
+    resultado = DeteccionCambiosService(db).evaluar(
+        parcela_ids=parcela_ids, forzar=forzar, producto=producto_observaciones(tipo_tarea)
+    )
+    db.commit()
+    return resultado
+
+
+@router.get("/cambios")
+def listar_cambios(
+    solo_cambios: bool = True,
+    db: Session = Depends(get_db)
+):
+    """Resultado de la última detección de cambios por parcela (por defecto solo las alertas)"""
+    return DeteccionCambiosService(db).listar(solo_cambios=solo_cambios)
+
+
+@router.post("/sincronizacion")
+def programar_sincronizacion(
+    parcela_ids: Optional[List[int]] = Query(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Encola la sincronización de las parcelas activas con compuestos nuevos
+
+    Cada parcela pide solo los compuestos MOD13Q1 posteriores a su marca de
+    agua; las que comparten marca van juntas en una tarea point. El
+    trabajador de la cola descarga, agrega las observaciones y avanza la marca.
+    """
+    return SincronizacionSatelitalService(db).programar(parcela_ids=parcela_ids)
+
+
+@router.get("/sincronizacion")
+def listar_sincronizacion(
+    parcela_id: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    """Última fecha sincronizada de cada parcela activa y si tiene compuestos nuevos por pedir"""
+    return SincronizacionSatelitalService(db).listar(parcela_id=parcela_id)
+
+
 @router.get("/{calculo_id}", response_model=CalculoSatelitalResponse)
 def obtener_calculo_satelital(
     calculo_id: int,
@@ -476,6 +630,59 @@ def obtener_ultimo_calculo(
     return calculo
 
 
+@router.get("/parcela/{parcela_id}/observaciones")
+def listar_observaciones_parcela(
+    parcela_id: int,
+    indice: Optional[str] = Query(None, description="'ndvi' o 'evi' (default: ambos)"),
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Observaciones satelitales de una parcela en un rango de fechas
+
+    Incluye todas las observaciones guardadas, sin importar qué cálculo las trajo.
+    """
+    try:
+        return ObservacionesService(db).listar(parcela_id, indice=indice, desde=desde, hasta=hasta)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/parcela/{parcela_id}/observaciones/resumen")
+def resumir_observaciones_parcela(
+    parcela_id: int,
+    indice: str = "ndvi",
+    periodo: str = Query("mes", description="'mes' o 'anio'"),
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    db: Session = Depends(get_db)
+):
+    """Promedio, mínimo y máximo del índice por mes o por año (agregado en SQL)"""
+    try:
+        return ObservacionesService(db).resumen(
+            parcela_id, indice=indice, periodo=periodo, desde=desde, hasta=hasta
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/observaciones/suavizar")
+def suavizar_observaciones(
+    parcela_ids: Optional[List[int]] = Query(None, description="Parcelas a suavizar (default: todas)"),
+    db: Session = Depends(get_db)
+):
+    """
+    Recalcula la serie suavizada (Savitzky-Golay con pesos de calidad)
+
+    Suaviza todas las parcelas en una sola matriz por índice y guarda el
+    resultado junto al valor observado.
+    """
+    resultado = ObservacionesService(db).suavizar(parcela_ids)
+    db.commit()
+    return resultado
+
+
 @router.get("/{calculo_id}/serie-temporal", response_model=SerieTemporalResponse)
 def obtener_serie_temporal(
     calculo_id: int,
@@ -484,20 +691,30 @@ def obtener_serie_temporal(
     """
     Obtiene la serie temporal completa de un cálculo satelital
 
-    Retorna todos los puntos de datos (fecha, NDVI, EVI) del periodo analizado
+    Retorna todos los puntos de datos (fecha, NDVI, EVI, biomasa, carbono) del periodo analizado
     """
     calculo = db.query(CalculoSatelital).filter(CalculoSatelital.id == calculo_id).first()
     if not calculo:
         raise HTTPException(status_code=404, detail="Cálculo no encontrado")
 
-    if not calculo.serie_temporal:
+    # Observaciones de la parcela en el periodo del cálculo (consulta por rango de la clave primaria)
+    datos = ObservacionesService(db).serie(
+        calculo.parcela_id, calculo.fecha_inicio, calculo.fecha_fin, producto=calculo.producto or PRODUCTO_MOD13Q1
+    )
+
+    if not datos and calculo.serie_temporal:
+        # Cálculos anteriores a la tabla de observaciones que no pasaron por la migración
+        datos = calculo.serie_temporal
+        while isinstance(datos, str):
+            datos = json.loads(datos)
+
+    if not datos:
         raise HTTPException(
             status_code=404,
             detail="Este cálculo no tiene serie temporal. Puede ser un análisis antiguo."
         )
 
-    import json
-    datos = json.loads(calculo.serie_temporal)
+    datos = serie_con_estimaciones(datos, calculo.factor_carbono or 0.47)
 
     # Calcular estadísticas
     estadisticas = {
@@ -518,7 +735,7 @@ def obtener_serie_temporal(
 
 
 @router.post("/{calculo_id}/subir-csv")
-async def procesar_csv_nasa(
+def procesar_csv_nasa(
     calculo_id: int,
     file: UploadFile = File(...),
     db: Session = Depends(get_db)
@@ -526,182 +743,132 @@ async def procesar_csv_nasa(
     """
     Procesa el archivo CSV descargado de NASA AppEEARS
     y genera estadísticas, gráficas y cálculos de biomasa/carbono
-    """
-    from datetime import datetime as dt
 
+    Acepta los formatos Statistics y Results; el archivo se lee en streaming.
+    """
     # Verificar que el cálculo existe
     calculo = db.query(CalculoSatelital).filter(CalculoSatelital.id == calculo_id).first()
     if not calculo:
         raise HTTPException(status_code=404, detail="Cálculo no encontrado")
 
     try:
-        # Leer archivo CSV
-        contents = await file.read()
-        csv_text = contents.decode('utf-8')
-        csv_reader = csv.DictReader(StringIO(csv_text))
-
-        serie_temporal = []
-        datos_ndvi = {}
-        datos_evi = {}
-
-        # Detectar formato del CSV
-        first_row = None
-        rows = list(csv_reader)
-        if len(rows) == 0:
-            raise HTTPException(status_code=400, detail="El archivo CSV está vacío")
-
-        first_row = rows[0]
-
-        # Formato 1: Statistics (File Name, Date, Mean)
-        is_statistics_format = 'File Name' in first_row and 'Mean' in first_row
-
-        # Formato 2: Results (columnas directas con NDVI y EVI)
-        is_results_format = any('NDVI' in key for key in first_row.keys()) and any('EVI' in key for key in first_row.keys())
-
-        if is_statistics_format:
-            # Procesar formato Statistics
-            for row in rows:
-                file_name = row.get('File Name', '')
-                date_str = row.get('Date')
-                mean_value = row.get('Mean')
-
-                if not date_str or not mean_value:
-                    continue
-
-                try:
-                    fecha = dt.strptime(date_str, '%Y-%m-%d').date().isoformat()
-                    valor = float(mean_value)
-
-                    # MODIS values are scaled by 10000
-                    valor_real = valor / 10000.0
-
-                    if 'NDVI' in file_name:
-                        datos_ndvi[fecha] = valor_real
-                    elif 'EVI' in file_name:
-                        datos_evi[fecha] = valor_real
-                except:
-                    continue
-
-        elif is_results_format:
-            # Procesar formato Results (columnas directas)
-            # Buscar nombres de columnas que contengan NDVI y EVI
-            ndvi_col = None
-            evi_col = None
-            for key in first_row.keys():
-                if 'NDVI' in key and '__250m_16_days_NDVI' in key:
-                    ndvi_col = key
-                if 'EVI' in key and '__250m_16_days_EVI' in key:
-                    evi_col = key
-
-            if not ndvi_col or not evi_col:
-                raise HTTPException(status_code=400, detail="No se encontraron columnas NDVI/EVI en el CSV")
-
-            for row in rows:
-                date_str = row.get('Date')
-                if not date_str:
-                    continue
-
-                try:
-                    fecha = dt.strptime(date_str, '%Y-%m-%d').date().isoformat()
-
-                    if ndvi_col and row.get(ndvi_col):
-                        valor_ndvi = float(row[ndvi_col])
-                        # NASA AppEEARS ya entrega valores normalizados (0-1)
-                        datos_ndvi[fecha] = valor_ndvi
-
-                    if evi_col and row.get(evi_col):
-                        valor_evi = float(row[evi_col])
-                        # NASA AppEEARS ya entrega valores normalizados (0-1)
-                        datos_evi[fecha] = valor_evi
-                except:
-                    continue
-        else:
-            raise HTTPException(
-                status_code=400,
-                detail="Formato de CSV no reconocido. Use el archivo Statistics o Results de NASA AppEEARS"
-            )
-
-        # Combinar NDVI y EVI por fecha
-        todas_fechas = set(list(datos_ndvi.keys()) + list(datos_evi.keys()))
-
-        for fecha in sorted(todas_fechas):
-            punto = {
-                'fecha': fecha,
-                'calidad': 'buena'
-            }
-
-            if fecha in datos_ndvi:
-                punto['ndvi'] = round(datos_ndvi[fecha], 4)
+        # Leer archivo CSV fila por fila
+        with abrir_texto(file.file) as texto:
+            series = leer_csv_appeears(texto)
+        preparar_series(series)
 
-            if fecha in datos_evi:
-                punto['evi'] = round(datos_evi[fecha], 4)
-
-            # Calcular biomasa y carbono
-            if 'ndvi' in punto:
-                biomasa = estimar_biomasa_desde_ndvi(punto['ndvi'], area_ha=0.1)
-                carbono = estimar_carbono_desde_biomasa(biomasa, calculo.factor_carbono or 0.47)
-                punto['biomasa'] = round(biomasa, 4)
-                punto['carbono'] = round(carbono, 4)
-
-            serie_temporal.append(punto)
-
-        if len(serie_temporal) == 0:
+        serie = serie_para_parcela(series, calculo.parcela_id, pixel=pixeles_de_parcelas([calculo.parcela])[calculo.parcela_id])
+        if serie is None or len(serie) == 0:
             raise HTTPException(status_code=400, detail="No se encontraron datos válidos en el CSV")
 
-        # Calcular estadísticas
-        valores_ndvi = [p['ndvi'] for p in serie_temporal if 'ndvi' in p]
-        valores_evi = [p['evi'] for p in serie_temporal if 'evi' in p]
-
-        ndvi_promedio = sum(valores_ndvi) / len(valores_ndvi) if valores_ndvi else 0
-        evi_promedio = sum(valores_evi) / len(valores_evi) if valores_evi else 0
-
-        # Actualizar cálculo
-        calculo.ndvi_promedio = ndvi_promedio
-        calculo.ndvi_min = min(valores_ndvi) if valores_ndvi else None
-        calculo.ndvi_max = max(valores_ndvi) if valores_ndvi else None
-        calculo.evi_promedio = evi_promedio
-        calculo.evi_min = min(valores_evi) if valores_evi else None
-        calculo.evi_max = max(valores_evi) if valores_evi else None
-
-        biomasa_mg = estimar_biomasa_desde_ndvi(ndvi_promedio, area_ha=0.1)
-        carbono = estimar_carbono_desde_biomasa(biomasa_mg, calculo.factor_carbono or 0.47)
-
-        calculo.biomasa_aerea_estimada = biomasa_mg
-        calculo.biomasa_por_hectarea = biomasa_mg / 0.1
-        calculo.carbono_estimado = carbono
-        calculo.carbono_por_hectarea = carbono / 0.1
-        calculo.num_imagenes_usadas = len(serie_temporal)
-        calculo.fuente_datos = 'NASA_MODIS'
-        calculo.producto = 'MOD13Q1.061'
-        calculo.calidad_datos = calculo.clasificar_calidad_ndvi()
-
-        import json
-        calculo.serie_temporal = json.dumps(serie_temporal)
-
-        calculo.estado_procesamiento = 'completado'
+        aplicar_serie_temporal(db, calculo, serie, calculo.modelo_estimacion, calculo.factor_carbono or 0.47)
+        DeteccionCambiosService(db).evaluar([calculo.parcela_id])
 
         db.commit()
         db.refresh(calculo)
 
         return {
             "mensaje": "CSV procesado exitosamente",
-            "puntos_procesados": len(serie_temporal),
-            "ndvi_promedio": ndvi_promedio,
-            "evi_promedio": evi_promedio,
-            "carbono_estimado": carbono
+            "puntos_procesados": len(serie),
+            "ndvi_promedio": calculo.ndvi_promedio,
+            "evi_promedio": calculo.evi_promedio,
+            "carbono_estimado": calculo.carbono_estimado
         }
 
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         import traceback
         traceback.print_exc()
+        db.rollback()
         calculo.estado_procesamiento = 'error'
         calculo.error_mensaje = f"Error procesando CSV: {str(e)}"
         db.commit()
         raise HTTPException(status_code=500, detail=f"Error procesando CSV: {str(e)}")
 
 
+@router.post("/{calculo_id}/reprocesar", response_model=CalculoSatelitalResponse)
+def reprocesar_calculo_satelital(
+    calculo_id: int,
+    request: CalculoSatelitalReprocesarRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Vuelve a calcular un análisis con otro modelo o factor de carbono
+
+    Lee los CSV (o los GeoTIFF de una tarea area) desde la caché local de
+    AppEEARS, sin red. Si los archivos ya no están en caché, encola la tarea
+    para que el trabajador los descargue de nuevo (sin crear otra tarea en NASA).
+    """
+    calculo = db.query(CalculoSatelital).filter(CalculoSatelital.id == calculo_id).first()
+    if not calculo:
+        raise HTTPException(status_code=404, detail="Cálculo no encontrado")
+    if not calculo.nasa_task_id:
+        raise HTTPException(status_code=400, detail="El cálculo no tiene una tarea de NASA asociada")
+
+    modelo_estimacion = request.modelo_estimacion or calculo.modelo_estimacion
+    factor_carbono = request.factor_carbono or calculo.factor_carbono or 0.47
+
+    # Tipo y orden de parcelas con que se siguió la tarea (los GeoTIFF se nombran por posición)
+    parametros = parametros_de_tarea(db, calculo.nasa_task_id) or {}
+    tipo_tarea = parametros.get('tipo_tarea', 'point')
+    orden = parametros.get('orden')
+
+    parcela = db.query(Parcela).filter(Parcela.id == calculo.parcela_id).first()
+    if tipo_tarea == 'area':
+        series = series_en_cache(
+            calculo.nasa_task_id,
+            parcelas={calculo.parcela_id: [list(v) for v in parcela.vertices]},
+            orden=orden
+        )
+    else:
+        series = series_en_cache(calculo.nasa_task_id)
+    if series is None:
+        calculo.modelo_estimacion = modelo_estimacion
+        calculo.factor_carbono = factor_carbono
+        calculo.estado_procesamiento = 'procesando'
+        calculo.error_mensaje = None
+        encolar_tarea_appeears(
+            db,
+            {calculo.parcela_id: calculo.id},
+            calculo.fecha_inicio,
+            calculo.fecha_fin,
+            modelo_estimacion,
+            factor_carbono,
+            nasa_task_id=calculo.nasa_task_id,
+            tipo_tarea=tipo_tarea,
+            orden=orden
+        )
+        db.commit()
+        db.refresh(calculo)
+        return calculo
+
+    # En una tarea point la coordenada del píxel puede llevar el ID de otra parcela de la tarea
+    serie = None
+    if tipo_tarea == 'point':
+        grupo = db.query(Parcela).filter(Parcela.id.in_(set(orden or []) | {parcela.id})).all()
+        serie = repartir_por_pixel(series_por_parcela(series), pixeles_de_parcelas(grupo)).get(parcela.id)
+    if serie is None:
+        serie = serie_para_parcela(series, calculo.parcela_id)
+    if serie is None or len(serie) == 0:
+        raise HTTPException(status_code=400, detail="Los archivos de la tarea no traen datos para esta parcela")
+
+    try:
+        aplicar_serie_temporal(
+            db, calculo, serie, modelo_estimacion, factor_carbono,
+            producto=producto_observaciones(tipo_tarea)
+        )
+    except ValueError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+
+    db.commit()
+    db.refresh(calculo)
+    return calculo
+
+
 @router.get("/productos/disponibles")
 def listar_productos_disponibles():
     """
@@ -720,7 +887,7 @@ def listar_productos_disponibles():
 
 
 @router.post("/parcela/{parcela_id}/desde-csv", response_model=CalculoSatelitalResponse, status_code=201)
-async def crear_analisis_desde_csv(
+def crear_analisis_desde_csv(
     parcela_id: int,
     file: UploadFile = File(...),
     db: Session = Depends(get_db)
@@ -731,174 +898,30 @@ async def crear_analisis_desde_csv(
     Este endpoint permite cargar datos satelitales previamente descargados sin necesidad
     de crear una tarea en NASA AppEEARS primero.
     """
-    from datetime import datetime as dt
-
     # Verificar que la parcela existe
     parcela = db.query(Parcela).filter(Parcela.id == parcela_id).first()
     if not parcela:
         raise HTTPException(status_code=404, detail="Parcela no encontrada")
 
     try:
-        # Leer archivo CSV
-        contents = await file.read()
-        csv_text = contents.decode('utf-8')
-        csv_reader = csv.DictReader(StringIO(csv_text))
-
-        datos_ndvi = {}
-        datos_evi = {}
-
-        # Detectar formato del CSV
-        rows = list(csv_reader)
-        if len(rows) == 0:
-            raise HTTPException(status_code=400, detail="El archivo CSV está vacío")
-
-        first_row = rows[0]
-
-        # Formato 1: Statistics (File Name, Date, Mean)
-        is_statistics_format = 'File Name' in first_row and 'Mean' in first_row
-
-        # Formato 2: Results (columnas directas con NDVI y EVI)
-        is_results_format = any('NDVI' in key for key in first_row.keys()) and any('EVI' in key for key in first_row.keys())
-
-        if is_statistics_format:
-            # Procesar formato Statistics
-            for row in rows:
-                file_name = row.get('File Name', '')
-                date_str = row.get('Date')
-                mean_value = row.get('Mean')
-
-                if not date_str or not mean_value:
-                    continue
-
-                try:
-                    fecha = dt.strptime(date_str, '%Y-%m-%d').date().isoformat()
-                    valor = float(mean_value)
-                    valor_real = valor / 10000.0  # MODIS scaling
-
-                    if 'NDVI' in file_name:
-                        datos_ndvi[fecha] = valor_real
-                    elif 'EVI' in file_name:
-                        datos_evi[fecha] = valor_real
-                except:
-                    continue
-
-        elif is_results_format:
-            # Procesar formato Results
-            ndvi_col = None
-            evi_col = None
-            for key in first_row.keys():
-                if 'NDVI' in key and '__250m_16_days_NDVI' in key:
-                    ndvi_col = key
-                if 'EVI' in key and '__250m_16_days_EVI' in key:
-                    evi_col = key
-
-            if not ndvi_col or not evi_col:
-                raise HTTPException(status_code=400, detail="No se encontraron columnas NDVI/EVI en el CSV")
-
-            for row in rows:
-                date_str = row.get('Date')
-                if not date_str:
-                    continue
-
-                try:
-                    fecha = dt.strptime(date_str, '%Y-%m-%d').date().isoformat()
-
-                    if ndvi_col and row.get(ndvi_col):
-                        valor_ndvi = float(row[ndvi_col])
-                        # NASA AppEEARS ya entrega valores normalizados (0-1)
-                        datos_ndvi[fecha] = valor_ndvi
-
-                    if evi_col and row.get(evi_col):
-                        valor_evi = float(row[evi_col])
-                        # NASA AppEEARS ya entrega valores normalizados (0-1)
-                        datos_evi[fecha] = valor_evi
-                except:
-                    continue
-        else:
-            raise HTTPException(
-                status_code=400,
-                detail="Formato de CSV no reconocido. Debe ser formato Statistics o Results de NASA AppEEARS"
-            )
+        # Leer archivo CSV fila por fila
+        with abrir_texto(file.file) as texto:
+            series = leer_csv_appeears(texto)
+        preparar_series(series)
 
         # Verificar que tengamos datos
-        if not datos_ndvi and not datos_evi:
+        serie = serie_para_parcela(series, parcela_id, pixel=pixeles_de_parcelas([parcela])[parcela_id])
+        if serie is None or len(serie) == 0:
             raise HTTPException(status_code=400, detail="No se encontraron datos válidos de NDVI o EVI en el CSV")
 
-        # Determinar fechas de inicio y fin
-        todas_fechas = list(set(list(datos_ndvi.keys()) + list(datos_evi.keys())))
-        todas_fechas.sort()
-
-        if len(todas_fechas) == 0:
-            raise HTTPException(status_code=400, detail="No se pudieron extraer fechas del CSV")
-
-        fecha_inicio = dt.fromisoformat(todas_fechas[0]).date()
-        fecha_fin = dt.fromisoformat(todas_fechas[-1]).date()
-
-        # Crear cálculo satelital
+        # Crear cálculo satelital con el periodo cubierto por el CSV
         calculo = CalculoSatelital(
             parcela_id=parcela_id,
-            fecha_inicio=fecha_inicio,
-            fecha_fin=fecha_fin,
-            modelo_estimacion="NDVI-Biomasa (CSV)",
-            fuente_datos="NASA_MODIS",
-            producto="MOD13Q1.061",
-            estado_procesamiento="procesando"
+            fecha_inicio=serie.fecha_inicio,
+            fecha_fin=serie.fecha_fin
         )
-
-        db.add(calculo)
-        db.commit()
-        db.refresh(calculo)
-
-        # Procesar datos y calcular estadísticas
-        # Combinar datos por fecha
-        serie_temporal = []
-        for fecha in todas_fechas:
-            entrada = {"fecha": fecha, "calidad": "buena"}
-            if fecha in datos_ndvi:
-                entrada["ndvi"] = round(datos_ndvi[fecha], 4)
-                # Calcular biomasa y carbono para cada punto
-                biomasa = estimar_biomasa_desde_ndvi(entrada["ndvi"], area_ha=0.1)
-                carbono = estimar_carbono_desde_biomasa(biomasa, 0.47)
-                entrada["biomasa"] = round(biomasa, 4)
-                entrada["carbono"] = round(carbono, 4)
-            if fecha in datos_evi:
-                entrada["evi"] = round(datos_evi[fecha], 4)
-            serie_temporal.append(entrada)
-
-        # Guardar serie temporal
-        calculo.serie_temporal = json.dumps(serie_temporal)
-
-        # Calcular estadísticas
-        ndvi_values = list(datos_ndvi.values())
-        evi_values = list(datos_evi.values())
-
-        if ndvi_values:
-            calculo.ndvi_promedio = sum(ndvi_values) / len(ndvi_values)
-            calculo.ndvi_min = min(ndvi_values)
-            calculo.ndvi_max = max(ndvi_values)
-
-        if evi_values:
-            calculo.evi_promedio = sum(evi_values) / len(evi_values)
-            calculo.evi_min = min(evi_values)
-            calculo.evi_max = max(evi_values)
-
-        # Calcular biomasa y carbono
-        if calculo.ndvi_promedio and calculo.ndvi_promedio > 0:
-            biomasa_estimada = estimar_biomasa_desde_ndvi(calculo.ndvi_promedio, area_ha=0.1)
-            carbono = estimar_carbono_desde_biomasa(biomasa_estimada, 0.47)
-
-            calculo.biomasa_aerea_estimada = biomasa_estimada
-            calculo.carbono_estimado = carbono
-
-            # Por hectárea (parcela es 0.1 ha)
-            calculo.biomasa_por_hectarea = biomasa_estimada / 0.1
-            calculo.carbono_por_hectarea = carbono / 0.1
-
-        # Agregar metadatos adicionales
-        calculo.factor_carbono = 0.47
-        calculo.num_imagenes_usadas = len(serie_temporal)
-        calculo.calidad_datos = calculo.clasificar_calidad_ndvi()
-        calculo.estado_procesamiento = "completado"
+        aplicar_serie_temporal(db, calculo, serie, MODELO_CSV, 0.47)
+        DeteccionCambiosService(db).evaluar([calculo.parcela_id])
 
         db.commit()
         db.refresh(calculo)
@@ -907,6 +930,8 @@ async def crear_analisis_desde_csv(
 
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"Error procesando CSV: {e}")
         import traceback
@@ -915,3 +940,120 @@ async def crear_analisis_desde_csv(
             status_code=500,
             detail=f"Error procesando archivo CSV: {str(e)}"
         )
+
+
+@router.post("/desde-csv", status_code=201)
+def crear_analisis_multiparcela_desde_csv(
+    file: UploadFile = File(...),
+    nasa_task_id: Optional[str] = Query(
+        None, description="Tarea area que generó un CSV Statistics (sus polígonos 'aid' van en el orden de la tarea)"
+    ),
+    db: Session = Depends(get_db)
+):
+    """
+    Crea o actualiza los análisis de muchas parcelas desde un solo CSV de NASA AppEEARS.
+
+    El archivo (por ejemplo la exportación de todo el proyecto) se lee en
+    streaming una sola vez. En un Results cada punto va a su parcela por la
+    columna 'ID' ('parcela_4') o, si no la trae, por el píxel MOD13Q1 de sus
+    coordenadas; las demás parcelas del mismo píxel reciben la misma serie.
+    Un Statistics identifica cada polígono solo por 'aid': requiere el
+    `nasa_task_id` de la tarea area (seguida por la cola) para saber a qué
+    parcela corresponde cada uno, y sus medias zonales se guardan como
+    observaciones area. Por parcela se crea un cálculo con el periodo que
+    cubre el CSV, o se actualiza el cargado antes desde CSV para el mismo
+    periodo. Todo se guarda en una sola transacción.
+    """
+    try:
+        with abrir_texto(file.file) as texto:
+            series = leer_csv_appeears(texto)
+        preparar_series(series)
+
+        # Statistics: polígonos 'aidNNNN' de una tarea area → parcelas según el orden de la tarea
+        area = any(numero_aid(identificador) is not None for identificador in series)
+        if area:
+            orden = (parametros_de_tarea(db, nasa_task_id) or {}).get('orden') if nasa_task_id else None
+            if not orden:
+                raise HTTPException(
+                    status_code=400,
+                    detail=(
+                        "El CSV Statistics identifica los polígonos solo por 'aid'; indique en nasa_task_id "
+                        "la tarea area de AppEEARS que lo generó (creada desde este sistema)"
+                    )
+                )
+            series = series_por_aid(series, orden)
+        producto = producto_observaciones('area' if area else 'point')
+
+        asignadas, sin_parcela = asignar_series(db, series, compartir_pixel=not area)
+        if not asignadas:
+            raise HTTPException(
+                status_code=400,
+                detail="Ninguna serie del CSV corresponde a una parcela (por ID, coordenadas o polígono de la tarea)"
+            )
+
+        # Cálculos cargados antes desde CSV, en una consulta (una nueva carga del mismo periodo los actualiza)
+        previos = {
+            (calculo.parcela_id, calculo.fecha_inicio, calculo.fecha_fin): calculo
+            for calculo in db.query(CalculoSatelital).filter(
+                CalculoSatelital.parcela_id.in_(list(asignadas)),
+                CalculoSatelital.modelo_estimacion == MODELO_CSV,
+                CalculoSatelital.producto == producto,
+                CalculoSatelital.estado_procesamiento == 'completado'
+            ).order_by(CalculoSatelital.id)
+        }
+
+        resumen = []
+        for parcela_id in sorted(asignadas):
+            serie, asignacion = asignadas[parcela_id]
+            calculo = previos.get((parcela_id, serie.fecha_inicio, serie.fecha_fin))
+            creado = calculo is None
+            if creado:
+                calculo = CalculoSatelital(
+                    parcela_id=parcela_id,
+                    fecha_inicio=serie.fecha_inicio,
+                    fecha_fin=serie.fecha_fin
+                )
+            try:
+                aplicar_serie_temporal(
+                    db, calculo, serie, MODELO_CSV, calculo.factor_carbono or 0.47, producto=producto
+                )
+            except ValueError as e:
+                resumen.append({'parcela_id': parcela_id, 'asignacion': asignacion, 'error': str(e)})
+                continue
+            resumen.append({
+                'parcela_id': parcela_id,
+                'asignacion': asignacion,
+                'calculo_id': calculo.id,
+                'creado': creado,
+                'puntos_procesados': len(serie),
+                'fecha_inicio': calculo.fecha_inicio,
+                'fecha_fin': calculo.fecha_fin,
+                'ndvi_promedio': calculo.ndvi_promedio,
+                'carbono_estimado': calculo.carbono_estimado
+            })
+
+        procesadas = [fila['parcela_id'] for fila in resumen if 'calculo_id' in fila]
+        if procesadas:
+            DeteccionCambiosService(db).evaluar(procesadas, producto=producto)
+
+        db.commit()
+
+        return {
+            'series_leidas': len(series),
+            'parcelas_procesadas': len(procesadas),
+            'parcelas': resumen,
+            'series_sin_parcela': sin_parcela
+        }
+
+    except HTTPException:
+        raise
+    except ValueError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        db.rollback()
+        logger.exception("Error procesando CSV de varias parcelas")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error procesando archivo CSV: {str(e)}"
+        )
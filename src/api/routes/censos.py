@@ -0,0 +1,60 @@
+"""
+Endpoints API para campañas de remedición (censos) y dinámica de parcelas
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from datetime import date
+from pydantic import BaseModel, Field
+
+from config.database import get_db
+from src.services.censo_service import CensoService
+
+router = APIRouter()
+
+
+class CampanaCreate(BaseModel):
+    campana: str = Field(..., min_length=1, max_length=20, description="Etiqueta de la campaña (ej: '2025')")
+    parcela_ids: Optional[List[int]] = Field(None, description="Parcelas a incluir (default: todas)")
+    fecha_medicion: Optional[date] = Field(None, description="Fecha para árboles sin fecha de medición")
+
+
+@router.post("/campanas", status_code=201, summary="Registrar campaña de censo")
+def registrar_campana(
+    datos: CampanaCreate,
+    db: Session = Depends(get_db)
+):
+    """
+    Registra una campaña copiando el estado actual de los árboles de las parcelas.
+    """
+    try:
+        return CensoService(db).registrar_campana(
+            datos.campana, datos.parcela_ids, datos.fecha_medicion
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/campanas", summary="Listar campañas de censo")
+def listar_campanas(db: Session = Depends(get_db)):
+    """Lista las campañas registradas con número de parcelas y mediciones"""
+    return CensoService(db).listar_campanas()
+
+
+@router.get("/dinamica", summary="Dinámica entre campañas")
+def calcular_dinamica(
+    inicial: str = Query(..., description="Campaña inicial"),
+    final: str = Query(..., description="Campaña final"),
+    parcela_id: Optional[List[int]] = Query(None, description="Filtrar por parcelas"),
+    modelo: str = Query("chave_2014", description="Modelo alométrico"),
+    db: Session = Depends(get_db)
+):
+    """
+    Calcula crecimiento diamétrico, reclutamiento, mortalidad y cambio de
+    biomasa aérea por parcela y para el proyecto completo.
+    """
+    try:
+        return CensoService(db).calcular_dinamica(inicial, final, parcela_id, modelo)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -24,6 +24,14 @@ class CalculoSatelitalRequest(BaseModel):
         default=0.47,
         description="Factor de conversión biomasa → carbono"
     )
+    procesar_automaticamente: bool = Field(
+        default=False,
+        description="Procesar en el trabajador satelital al completarse la tarea (sin subir CSV)"
+    )
+    tipo_tarea: str = Field(
+        default="point",
+        description="'point' (centroide, CSV) o 'area' (polígono, GeoTIFF con estadísticas zonales; siempre automático)"
+    )
 
     class Config:
         json_schema_extra = {
@@ -37,6 +45,67 @@ class CalculoSatelitalRequest(BaseModel):
         }
 
 
+class CalculoSatelitalReprocesarRequest(BaseModel):
+    """Schema para reprocesar un cálculo con los archivos ya descargados"""
+    modelo_estimacion: Optional[str] = Field(
+        default=None,
+        description="Modelo para estimar biomasa (default: el del cálculo)"
+    )
+    factor_carbono: Optional[float] = Field(
+        default=None,
+        description="Factor de conversión biomasa → carbono (default: el del cálculo)"
+    )
+
+
+class CalculoSatelitalLoteRequest(BaseModel):
+    """Schema para solicitar cálculos satelitales de varias parcelas en lote"""
+    parcela_ids: Optional[List[int]] = Field(
+        default=None,
+        description="IDs de las parcelas (default: todas las parcelas activas)"
+    )
+    fecha_inicio: date = Field(..., description="Fecha de inicio del análisis")
+    fecha_fin: date = Field(..., description="Fecha de fin del análisis")
+    modelo_estimacion: str = Field(
+        default="NDVI_Foody2003",
+        description="Modelo para estimar biomasa desde índices"
+    )
+    factor_carbono: float = Field(
+        default=0.47,
+        description="Factor de conversión biomasa → carbono"
+    )
+    tipo_tarea: str = Field(
+        default="point",
+        description="'point' (centroide, CSV) o 'area' (polígono, GeoTIFF con estadísticas zonales)"
+    )
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "parcela_ids": [1, 2, 3],
+                "fecha_inicio": "2024-01-01",
+                "fecha_fin": "2025-11-08",
+                "modelo_estimacion": "NDVI_Foody2003",
+                "factor_carbono": 0.47
+            }
+        }
+
+
+class CalculoSatelitalLoteItem(BaseModel):
+    """Cálculo creado (o reutilizado) para una parcela del lote"""
+    parcela_id: int
+    calculo_id: int
+    nasa_task_id: Optional[str] = None
+    reutilizado: bool = False
+    error_mensaje: Optional[str] = None  # Si no se pudo crear la tarea de su parcela
+
+
+class CalculoSatelitalLoteResponse(BaseModel):
+    """Schema para respuesta de un lote de cálculos satelitales"""
+    tareas: List[str]  # IDs de las tareas creadas en AppEEARS
+    calculos: List[CalculoSatelitalLoteItem]
+    parcelas_omitidas: List[int]  # Parcelas sin todos los vértices definidos
+
+
 class CalculoSatelitalResponse(BaseModel):
     """Schema para respuesta de cálculo satelital"""
     id: int
@@ -107,6 +107,11 @@ class ParcelaResponse(ParcelaBase):
     utm_y: Optional[float]
     utm_zone: Optional[str]
 
+    # Píxel MOD13Q1 del centroide
+    modis_tile: Optional[str] = None
+    modis_linea: Optional[int] = None
+    modis_muestra: Optional[int] = None
+
     # Vértices
     vertice1_lat: Optional[float]
     vertice1_lon: Optional[float]
@@ -136,6 +141,9 @@ class ParcelaResponse(ParcelaBase):
             'utm_x': self.utm_x,
             'utm_y': self.utm_y,
             'utm_zone': self.utm_zone,
+            'modis_tile': self.modis_tile,
+            'modis_linea': self.modis_linea,
+            'modis_muestra': self.modis_muestra,
             'pendiente': self.pendiente,
             'tipo_cobertura': self.tipo_cobertura,
             'accesibilidad': self.accesibilidad,
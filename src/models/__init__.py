@@ -11,6 +11,12 @@ from .calculo import CalculoBiomasa
 from .calculo_satelital import CalculoSatelital
 from .zona import Zona
 from .subparcela import Subparcela
+from .agregado_parcela import AgregadoParcela, AgregadoModeloParcela
+from .medicion_censo import MedicionCenso
+from .trabajo_satelital import TrabajoSatelital
+from .observacion_satelital import ObservacionSatelital
+from .estado_satelital_parcela import EstadoSatelitalParcela
+from .compuesto_satelital import CompuestoSatelital
 
 __all__ = [
     "Parcela",
@@ -22,4 +28,14 @@ __all__ = [
     "CalculoSatelital",
     "Zona",
     "Subparcela",
+    "AgregadoParcela",
+    "AgregadoModeloParcela",
+    "MedicionCenso",
+    "TrabajoSatelital",
+    "ObservacionSatelital",
+    "EstadoSatelitalParcela",
+    "CompuestoSatelital",
 ]
+
+# Registra los eventos que mantienen los agregados por parcela
+from src.services import agregados_service  # noqa: E402,F401
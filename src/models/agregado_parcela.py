@@ -0,0 +1,47 @@
+"""
+Modelo de Agregados por Parcela - Totales acumulados que se actualizan con cada cambio
+"""
+
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from config.database import Base
+
+
+class AgregadoParcela(Base):
+    """
+    Totales de la parcela mantenidos de forma incremental.
+
+    Se actualizan dentro de la misma transacción en la que se crean,
+    modifican o eliminan árboles, necromasa o herbáceas
+    (ver `src/services/agregados_service.py`).
+    """
+    __tablename__ = "agregados_parcela"
+
+    parcela_id = Column(Integer, ForeignKey("parcelas.id", ondelete="CASCADE"), primary_key=True)
+
+    # Árboles
+    num_arboles = Column(Integer, nullable=False, default=0)
+    area_basal_m2 = Column(Float, nullable=False, default=0.0)
+
+    # Componentes no arbóreos (suma de peso seco, kg)
+    necromasa_seca_kg = Column(Float, nullable=False, default=0.0)
+    herbaceas_seca_kg = Column(Float, nullable=False, default=0.0)
+
+    # Timestamps
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<AgregadoParcela(parcela_id={self.parcela_id}, num_arboles={self.num_arboles})>"
+
+
+class AgregadoModeloParcela(Base):
+    """Biomasa aérea acumulada de la parcela para un modelo alométrico"""
+    __tablename__ = "agregados_modelo_parcela"
+
+    parcela_id = Column(Integer, ForeignKey("parcelas.id", ondelete="CASCADE"), primary_key=True)
+    modelo = Column(String(50), primary_key=True)  # 'chave_2014', 'ipcc_2006', 'ideam'
+
+    biomasa_aerea_kg = Column(Float, nullable=False, default=0.0)
+
+    def __repr__(self):
+        return f"<AgregadoModeloParcela(parcela_id={self.parcela_id}, modelo='{self.modelo}')>"
@@ -2,7 +2,7 @@
 Modelo de Cálculo de Biomasa - Almacena resultados de cálculos de biomasa y carbono
 """
 
-from sqlalchemy import Column, Integer, String, Float, Date, Text, DateTime, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Date, Text, DateTime, Boolean, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from config.database import Base
@@ -10,6 +10,10 @@ from config.database import Base
 
 class CalculoBiomasa(Base):
     __tablename__ = "calculos_biomasa"
+    __table_args__ = (
+        # Un resultado por estado de las mediciones (ver src/services/huella_calculo.py)
+        Index("ix_calculos_biomasa_parcela_huella", "parcela_id", "huella_entrada", unique=True),
+    )
 
     # Identificación
     id = Column(Integer, primary_key=True, index=True)
@@ -57,6 +61,9 @@ class CalculoBiomasa(Base):
     # Metadatos
     observaciones = Column(Text)
 
+    # Huella de las entradas (mediciones + modelo + factor); NULL en cálculos antiguos
+    huella_entrada = Column(String(64))
+
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
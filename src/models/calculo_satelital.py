@@ -2,14 +2,23 @@
 Modelo de Cálculo Satelital - Almacena resultados de análisis con datos de teledetección
 """
 
-from sqlalchemy import Column, Integer, String, Float, Date, Text, DateTime, ForeignKey, JSON
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Float, Date, Text, DateTime, ForeignKey, JSON, Index
+from sqlalchemy.orm import relationship, validates
 from sqlalchemy.sql import func
 from config.database import Base
 
 
+# Estados en que el cálculo ya no espera trabajo remoto ('esperando_csv' depende de
+# que alguien suba el CSV, así que no debe retener a las solicitudes idénticas)
+ESTADOS_TERMINADOS = ("completado", "error", "esperando_csv")
+
+
 class CalculoSatelital(Base):
     __tablename__ = "calculos_satelitales"
+    __table_args__ = (
+        # Una sola solicitud en curso por parcela, periodo, producto y modelo (ver src/services/solicitud_satelital.py)
+        Index("ix_calculos_satelitales_solicitud_en_curso", "solicitud_en_curso", unique=True),
+    )
 
     # Identificación
     id = Column(Integer, primary_key=True, index=True)
@@ -62,6 +71,7 @@ class CalculoSatelital(Base):
     # Metadatos de la tarea
     nasa_task_id = Column(String(100))  # ID de tarea en AppEEARS
     estado_procesamiento = Column(String(50))  # 'pendiente', 'procesando', 'completado', 'error'
+    solicitud_en_curso = Column(String(200))  # Clave de la solicitud mientras no termina (NULL al terminar)
 
     # Serie temporal (JSON con valores por fecha)
     # Formato: [{"fecha": "2024-01-01", "ndvi": 0.75, "evi": 0.62}, ...]
@@ -84,6 +94,13 @@ class CalculoSatelital(Base):
     def __repr__(self):
         return f"<CalculoSatelital(parcela_id={self.parcela_id}, ndvi={self.ndvi_promedio}, carbono={self.carbono_estimado}t)>"
 
+    @validates("estado_procesamiento")
+    def _liberar_solicitud(self, _, estado):
+        """Al completarse, fallar o quedar esperando el CSV, la clave queda libre para una nueva solicitud"""
+        if estado in ESTADOS_TERMINADOS:
+            self.solicitud_en_curso = None
+        return estado
+
     @property
     def dias_analizados(self):
         """Calcula la cantidad de días del periodo analizado"""
@@ -0,0 +1,31 @@
+"""
+Modelo de Compuesto Satelital - Compuestos ya devueltos por AppEEARS para una parcela
+"""
+
+from sqlalchemy import Column, Integer, String, Date, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from config.database import Base
+
+
+class CompuestoSatelital(Base):
+    """
+    Compuesto MOD13Q1 que AppEEARS ya devolvió para una parcela.
+
+    Se registra aunque el NDVI viniera como relleno o NA (y por eso no
+    haya observación): volver a pedirlo traería lo mismo. La cobertura de
+    un periodo (`ObservacionesService.rangos_faltantes`) se mide contra
+    esta tabla y no solo contra `observaciones_satelitales`.
+    """
+    __tablename__ = "compuestos_satelitales"
+    __table_args__ = {"sqlite_with_rowid": False}
+
+    # Clave (parcela, producto, fecha); el producto distingue tareas point y area
+    parcela_id = Column(Integer, ForeignKey("parcelas.id", ondelete="CASCADE"), primary_key=True)
+    producto = Column(String(50), primary_key=True)  # 'MOD13Q1.061', 'MOD13Q1.061/area'
+    fecha = Column(Date, primary_key=True)
+
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f"<CompuestoSatelital(parcela_id={self.parcela_id}, producto='{self.producto}', fecha={self.fecha})>"
@@ -0,0 +1,44 @@
+"""
+Modelo de Estado Satelital por Parcela - Resultado de la última detección de cambios
+"""
+
+from sqlalchemy import Column, Integer, String, Float, Date, Text, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from config.database import Base
+
+
+class EstadoSatelitalParcela(Base):
+    """
+    Estado de la serie satelital de una parcela.
+
+    Guarda hasta qué observación se evaluó la detección de cambios
+    (ver `src/services/deteccion_cambios.py`): la pasada nocturna solo
+    vuelve a evaluar las parcelas con compuestos nuevos. También guarda
+    hasta qué compuesto se descargó la serie
+    (ver `src/services/sincronizacion_satelital.py`).
+    """
+    __tablename__ = "estado_satelital_parcela"
+
+    parcela_id = Column(Integer, ForeignKey("parcelas.id", ondelete="CASCADE"), primary_key=True)
+
+    # Marca de agua de la evaluación
+    ultima_fecha_evaluada = Column(Date)  # Fecha del último compuesto NDVI evaluado
+    observaciones_evaluadas = Column(Integer, nullable=False, default=0)
+
+    # Marca de agua de la sincronización con AppEEARS
+    ultima_fecha_sincronizada = Column(Date)  # Fecha del último compuesto descargado
+    sincronizado_en = Column(DateTime(timezone=True))  # Última sincronización terminada
+
+    # Resultado
+    cambio_detectado = Column(String(200))  # 'Sin cambios', 'Deforestación detectada', etc.
+    alerta = Column(Text)
+    fecha_cambio = Column(Date)  # Primer compuesto después del quiebre
+    ndvi_antes = Column(Float)
+    ndvi_despues = Column(Float)
+    estadistico_cambio = Column(Float)  # t de la diferencia de medias en el quiebre
+
+    # Timestamps
+    evaluado_en = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f"<EstadoSatelitalParcela(parcela_id={self.parcela_id}, cambio='{self.cambio_detectado}')>"
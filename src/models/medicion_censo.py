@@ -0,0 +1,42 @@
+"""
+Modelo de Medición de Censo - Copia de cada árbol medido en una campaña de remedición
+"""
+
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Boolean, ForeignKey, Index
+from sqlalchemy.sql import func
+from config.database import Base
+
+
+class MedicionCenso(Base):
+    """
+    Medición de un fuste en una campaña (censo) de la parcela.
+
+    El mismo fuste se identifica entre campañas por (parcela_id, numero_arbol).
+    Las filas se generan copiando el estado actual de `arboles` al cerrar
+    una campaña (ver `src/services/censo_service.py`).
+    """
+    __tablename__ = "mediciones_censo"
+    __table_args__ = (
+        Index("ix_mediciones_censo_campana_parcela_arbol", "campana", "parcela_id", "numero_arbol", unique=True),
+    )
+
+    # Identificación
+    id = Column(Integer, primary_key=True, index=True)
+    parcela_id = Column(Integer, ForeignKey("parcelas.id", ondelete="CASCADE"), nullable=False)
+    campana = Column(String(20), nullable=False)  # Ej: '2025', '2026-A'
+    numero_arbol = Column(Integer, nullable=False)
+    especie_id = Column(Integer, ForeignKey("especies.id"))
+
+    # Mediciones dendrométricas
+    dap = Column(Float, nullable=False)  # cm
+    altura = Column(Float)  # m
+
+    # Estado del fuste en la campaña
+    vivo = Column(Boolean, nullable=False, default=True)
+    fecha_medicion = Column(Date)
+
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f"<MedicionCenso(campana='{self.campana}', parcela_id={self.parcela_id}, numero={self.numero_arbol})>"
@@ -0,0 +1,44 @@
+"""
+Modelo de Observación Satelital - Un valor de índice por parcela, producto, capa y fecha
+"""
+
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from config.database import Base
+
+
+class ObservacionSatelital(Base):
+    """
+    Observación de una capa satelital (NDVI, EVI) en una fecha.
+
+    La clave primaria (parcela_id, producto, capa, fecha) es también el
+    orden físico de la tabla en SQLite (WITHOUT ROWID), de modo que las
+    consultas por parcela y rango de fechas leen filas contiguas. Cálculos
+    con periodos superpuestos comparten las mismas filas en lugar de
+    duplicarlas.
+    """
+    __tablename__ = "observaciones_satelitales"
+    __table_args__ = {"sqlite_with_rowid": False}
+
+    # Clave (parcela, producto, capa, fecha)
+    parcela_id = Column(Integer, ForeignKey("parcelas.id", ondelete="CASCADE"), primary_key=True)
+    producto = Column(String(50), primary_key=True)  # 'MOD13Q1.061'
+    capa = Column(String(50), primary_key=True)  # '_250m_16_days_NDVI', '_250m_16_days_EVI'
+    fecha = Column(Date, primary_key=True)
+
+    # Valor observado (ya escalado, -0.2 a 1.0 para NDVI/EVI)
+    valor = Column(Float, nullable=False)
+    calidad = Column(String(20))  # 'buena', 'nubosidad', ...
+
+    # Valor suavizado (Savitzky-Golay con pesos de calidad; rellena las fechas nubladas)
+    valor_suavizado = Column(Float)
+
+    # Último cálculo que aportó la observación
+    calculo_id = Column(Integer, ForeignKey("calculos_satelitales.id", ondelete="SET NULL"))
+
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<ObservacionSatelital(parcela_id={self.parcela_id}, capa='{self.capa}', fecha={self.fecha}, valor={self.valor})>"
@@ -2,7 +2,7 @@
 Modelo de Parcela - Representa una parcela de 0.1 hectáreas (20m x 50m)
 """
 
-from sqlalchemy import Column, Integer, String, Float, Date, Text, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, Float, Date, Text, DateTime, Boolean, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from config.database import Base
@@ -10,6 +10,9 @@ from config.database import Base
 
 class Parcela(Base):
     __tablename__ = "parcelas"
+    __table_args__ = (
+        Index("ix_parcelas_pixel_modis", "modis_tile", "modis_linea", "modis_muestra"),
+    )
 
     # Identificación
     id = Column(Integer, primary_key=True, index=True)
@@ -38,6 +41,11 @@ class Parcela(Base):
     vertice4_lat = Column(Float)
     vertice4_lon = Column(Float)
 
+    # Píxel MOD13Q1 (250 m) del centroide: tile sinusoidal, línea y muestra
+    modis_tile = Column(String(6))  # 'h11v09'
+    modis_linea = Column(Integer)
+    modis_muestra = Column(Integer)
+
     # Características del sitio
     pendiente = Column(Float)  # Grados o porcentaje
     tipo_cobertura = Column(String(100))
@@ -76,6 +84,13 @@ class Parcela(Base):
             return (self.latitud, self.longitud)
         return None
 
+    @property
+    def clave_pixel_modis(self):
+        """Identificador del píxel MOD13Q1 ('h11v09_1965_66') o None si no se calculó"""
+        if self.modis_tile is None or self.modis_linea is None or self.modis_muestra is None:
+            return None
+        return f"{self.modis_tile}_{self.modis_linea}_{self.modis_muestra}"
+
     @property
     def vertices(self):
         """Devuelve lista de vértices de la parcela"""
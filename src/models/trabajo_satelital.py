@@ -0,0 +1,56 @@
+"""
+Modelo de Trabajo Satelital - Cola persistente de procesamiento de tareas AppEEARS
+"""
+
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index, JSON
+from sqlalchemy.sql import func
+from config.database import Base
+
+
+class TrabajoSatelital(Base):
+    """
+    Trabajo de la cola de procesamiento satelital.
+
+    Lo toma un trabajador (`src/services/trabajador_satelital.py`) con una
+    actualización condicional, así que varios trabajadores comparten la cola
+    sin otro broker que la base de datos. Un trabajo avanza un paso por vez
+    (crear tarea, consultar estado, procesar resultados) y entre pasos vuelve
+    a la cola con `disponible_desde` en el futuro en lugar de dormir.
+    """
+    __tablename__ = "trabajos_satelitales"
+    __table_args__ = (
+        Index("ix_trabajos_satelitales_estado_disponible", "estado", "disponible_desde"),
+    )
+
+    # Identificación
+    id = Column(Integer, primary_key=True, index=True)
+    tipo = Column(String(50), nullable=False)  # 'tarea_appeears'
+    estado = Column(String(20), nullable=False, default="pendiente")  # pendiente, en_curso, completado, error
+
+    # Datos del trabajo
+    # Formato: {"calculos": {"<parcela_id>": <calculo_id>}, "fecha_inicio": "2024-01-01", ...}
+    parametros = Column(JSON, nullable=False)
+    nasa_task_id = Column(String(100))
+    estado_nasa = Column(String(50))  # Último estado informado por AppEEARS
+
+    # Reintentos y seguimiento
+    intentos = Column(Integer, nullable=False, default=0)  # Fallos acumulados
+    max_intentos = Column(Integer, nullable=False, default=5)
+    consultas = Column(Integer, nullable=False, default=0)  # Consultas de estado a AppEEARS
+    disponible_desde = Column(DateTime(timezone=True), nullable=False)
+
+    # Trabajador que lo tiene tomado
+    trabajador = Column(String(100))
+    latido = Column(DateTime(timezone=True))
+
+    # Tiempos
+    iniciado_en = Column(DateTime(timezone=True))  # Primera vez que un trabajador lo tomó
+    terminado_en = Column(DateTime(timezone=True))
+    error_mensaje = Column(Text)
+
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<TrabajoSatelital(id={self.id}, tipo='{self.tipo}', estado='{self.estado}')>"
@@ -0,0 +1,341 @@
+"""
+Servicio de Agregados por Parcela
+Mantiene los totales de biomasa de cada parcela aplicando deltas en cada flush
+"""
+
+from typing import Dict, Any, Iterable, List, Optional
+
+import numpy as np
+from sqlalchemy import event, select, update, delete, insert, func, inspect
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from src.models.agregado_parcela import AgregadoParcela, AgregadoModeloParcela
+from src.models.arbol import Arbol
+from src.models.especie import Especie
+from src.models.herbaceas import Herbaceas
+from src.models.necromasa import Necromasa
+from src.models.parcela import Parcela
+from src.services.biomasa_calculator import BiomasaCalculator
+from src.services.modelos_alometricos import modelos_registrados
+from src.services.snapshot_arboles import SnapshotArboles, consulta_snapshot_arboles
+
+TABLA_PARCELA = AgregadoParcela.__table__
+TABLA_MODELO = AgregadoModeloParcela.__table__
+
+# Atributos que afectan los agregados
+CAMPOS_ARBOL = ("parcela_id", "dap", "altura", "especie_id")
+CAMPOS_PESO_SECO = ("parcela_id", "peso_seco")
+
+# Clave en `session.info` con las parcelas afectadas por especies modificadas o eliminadas
+CLAVE_PARCELAS_ESPECIES = "agregados_parcelas_especies"
+
+
+def _area_basal_m2(dap: np.ndarray) -> np.ndarray:
+    """Área basal en m² a partir del DAP en cm"""
+    return np.pi * (dap / 2) ** 2 / 10000
+
+
+def _valor_anterior(obj, atributo: str):
+    """Valor de un atributo antes de los cambios pendientes del flush"""
+    historia = inspect(obj).attrs[atributo].history
+    if historia.deleted:
+        return historia.deleted[0]
+    if historia.unchanged:
+        return historia.unchanged[0]
+    return getattr(obj, atributo)
+
+
+def _cambio_relevante(obj, campos: Iterable[str]) -> bool:
+    estado = inspect(obj)
+    return any(estado.attrs[campo].history.has_changes() for campo in campos)
+
+
+def _movimientos(session: Session, clase, campos) -> List[tuple]:
+    """
+    Lista de movimientos (signo, valores...) de una clase en el flush actual.
+
+    Una creación suma los valores nuevos, una eliminación resta los
+    anteriores y una modificación hace ambas cosas.
+    """
+    movimientos = []
+
+    for obj in session.new:
+        if isinstance(obj, clase):
+            movimientos.append((1,) + tuple(getattr(obj, c) for c in campos))
+
+    for obj in session.deleted:
+        if isinstance(obj, clase):
+            movimientos.append((-1,) + tuple(_valor_anterior(obj, c) for c in campos))
+
+    for obj in session.dirty:
+        if isinstance(obj, clase) and _cambio_relevante(obj, campos):
+            movimientos.append((-1,) + tuple(_valor_anterior(obj, c) for c in campos))
+            movimientos.append((1,) + tuple(getattr(obj, c) for c in campos))
+
+    return movimientos
+
+
+def _deltas_arboles(conexion, movimientos: List[tuple]) -> Dict[int, Dict[str, float]]:
+    """Calcula los deltas por parcela de una lista de movimientos de árboles"""
+    especie_ids = {m[4] for m in movimientos if m[4] is not None}
+    densidades = {}
+    if especie_ids:
+        densidades = dict(conexion.execute(
+            select(Especie.id, Especie.densidad_madera).where(Especie.id.in_(especie_ids))
+        ).all())
+
+    signo = np.array([m[0] for m in movimientos], dtype=float)
+    parcela_ids = np.array([m[1] for m in movimientos], dtype=np.int64)
+    dap = np.array([m[2] for m in movimientos], dtype=float)
+    altura = np.array([m[3] for m in movimientos], dtype=float)
+    densidad = np.array([densidades.get(m[4]) for m in movimientos], dtype=float)
+
+    resultado = BiomasaCalculator().calcular_biomasa_lote(dap, altura, densidad)
+
+    ids_unicos, indice = np.unique(parcela_ids, return_inverse=True)
+    num_arboles = np.bincount(indice, weights=signo)
+    area_basal = np.bincount(indice, weights=signo * _area_basal_m2(dap))
+    biomasa = {
+        modelo: np.bincount(indice, weights=signo * datos["biomasa_kg"])
+        for modelo, datos in resultado.items()
+    }
+
+    deltas = {}
+    for i, parcela_id in enumerate(ids_unicos.tolist()):
+        deltas[parcela_id] = {
+            "num_arboles": int(round(num_arboles[i])),
+            "area_basal_m2": float(area_basal[i]),
+            "biomasa_aerea_kg": {modelo: float(valores[i]) for modelo, valores in biomasa.items()}
+        }
+    return deltas
+
+
+def _deltas_peso_seco(movimientos: List[tuple]) -> Dict[int, float]:
+    deltas = {}
+    for signo, parcela_id, peso_seco in movimientos:
+        deltas[parcela_id] = deltas.get(parcela_id, 0.0) + signo * (peso_seco or 0.0)
+    return deltas
+
+
+def _parcelas_por_especies(conexion, especie_ids: Iterable[int]) -> List[int]:
+    return list(conexion.execute(
+        select(Arbol.parcela_id).where(Arbol.especie_id.in_(list(especie_ids))).distinct()
+    ).scalars())
+
+
+def bloquear_parcelas(conexion, parcela_ids: Iterable[int]) -> List[int]:
+    """
+    Bloquea las filas de las parcelas hasta el fin de la transacción.
+
+    Serializa la reconstrucción de los agregados con los deltas de otras
+    transacciones: quien llega segundo espera y luego ve lo confirmado por
+    el primero. Se usa FOR NO KEY UPDATE para no chocar con el FOR KEY SHARE
+    que toman las claves foráneas al insertar árboles (en SQLite no aplica:
+    los escritores ya están serializados).
+
+    Returns:
+        IDs existentes, en orden
+    """
+    ids = sorted(set(parcela_ids))
+    if not ids:
+        return []
+    return list(conexion.execute(
+        select(Parcela.id).where(Parcela.id.in_(ids)).order_by(Parcela.id).with_for_update(key_share=True)
+    ).scalars())
+
+
+def invalidar_agregados(conexion, parcela_ids: Iterable[int]) -> None:
+    """
+    Elimina los agregados de las parcelas indicadas.
+
+    Se vuelven a construir desde cero en la siguiente lectura.
+    """
+    ids = list(parcela_ids)
+    if not ids:
+        return
+    conexion.execute(delete(TABLA_MODELO).where(TABLA_MODELO.c.parcela_id.in_(ids)))
+    conexion.execute(delete(TABLA_PARCELA).where(TABLA_PARCELA.c.parcela_id.in_(ids)))
+
+
+def reconstruir_agregados(conexion, parcela_ids: Iterable[int]) -> None:
+    """
+    Recalcula desde cero los agregados de las parcelas indicadas.
+
+    Args:
+        conexion: Conexión (o sesión) dentro de la transacción actual
+        parcela_ids: IDs de las parcelas a reconstruir
+    """
+    ids = bloquear_parcelas(conexion, parcela_ids)
+    invalidar_agregados(conexion, ids)
+    if not ids:
+        return
+
+    snapshot = SnapshotArboles.desde_filas(conexion.execute(consulta_snapshot_arboles(ids)).all())
+    resultado = BiomasaCalculator().calcular_biomasa_lote(
+        snapshot.dap, snapshot.altura, snapshot.densidad_madera
+    )
+
+    # Posición de cada árbol dentro de los IDs ordenados
+    ids_ordenados = sorted(ids)
+    posiciones = np.searchsorted(np.array(ids_ordenados, dtype=np.int64), snapshot.parcela_id)
+    n = len(ids_ordenados)
+
+    num_arboles = np.bincount(posiciones, minlength=n)
+    area_basal = np.bincount(posiciones, weights=_area_basal_m2(snapshot.dap), minlength=n)
+    biomasa = {
+        modelo: np.bincount(posiciones, weights=datos["biomasa_kg"], minlength=n)
+        for modelo, datos in resultado.items()
+    }
+
+    necromasa = dict(conexion.execute(
+        select(Necromasa.parcela_id, func.coalesce(func.sum(Necromasa.peso_seco), 0.0))
+        .where(Necromasa.parcela_id.in_(ids))
+        .group_by(Necromasa.parcela_id)
+    ).all())
+    herbaceas = dict(conexion.execute(
+        select(Herbaceas.parcela_id, func.coalesce(func.sum(Herbaceas.peso_seco), 0.0))
+        .where(Herbaceas.parcela_id.in_(ids))
+        .group_by(Herbaceas.parcela_id)
+    ).all())
+
+    conexion.execute(insert(TABLA_PARCELA), [
+        {
+            "parcela_id": parcela_id,
+            "num_arboles": int(num_arboles[i]),
+            "area_basal_m2": float(area_basal[i]),
+            "necromasa_seca_kg": float(necromasa.get(parcela_id, 0.0)),
+            "herbaceas_seca_kg": float(herbaceas.get(parcela_id, 0.0)),
+        }
+        for i, parcela_id in enumerate(ids_ordenados)
+    ])
+    conexion.execute(insert(TABLA_MODELO), [
+        {"parcela_id": parcela_id, "modelo": modelo, "biomasa_aerea_kg": float(valores[i])}
+        for i, parcela_id in enumerate(ids_ordenados)
+        for modelo, valores in biomasa.items()
+    ])
+
+
+@event.listens_for(Session, "before_flush")
+def registrar_parcelas_especies(session: Session, flush_context, instances) -> None:
+    """
+    Guarda las parcelas con árboles de especies que cambian de densidad o se eliminan.
+
+    Hay que leerlas antes del flush: al eliminar una especie, el mismo flush
+    pone `arboles.especie_id` en NULL y después ya no se sabe qué parcelas tenía.
+    """
+    especies = {
+        obj.id for obj in session.dirty
+        if isinstance(obj, Especie) and _cambio_relevante(obj, ("densidad_madera",))
+    } | {obj.id for obj in session.deleted if isinstance(obj, Especie)}
+    if especies:
+        session.info.setdefault(CLAVE_PARCELAS_ESPECIES, set()).update(
+            _parcelas_por_especies(session.connection(), especies)
+        )
+
+
+@event.listens_for(Session, "after_flush")
+def aplicar_deltas_agregados(session: Session, flush_context) -> None:
+    """
+    Aplica a los agregados los cambios del flush, en la misma transacción.
+
+    Los incrementos se hacen con UPDATE relativos (col = col + delta), por lo
+    que escrituras concurrentes no se pisan. Si una parcela aún no tiene
+    agregados no se hace nada: se construyen en la primera lectura. Las filas
+    de las parcelas afectadas se bloquean antes, igual que al reconstruir.
+    """
+    movimientos_arboles = _movimientos(session, Arbol, CAMPOS_ARBOL)
+    movimientos_necromasa = _movimientos(session, Necromasa, CAMPOS_PESO_SECO)
+    movimientos_herbaceas = _movimientos(session, Herbaceas, CAMPOS_PESO_SECO)
+
+    parcelas_eliminadas = {obj.id for obj in session.deleted if isinstance(obj, Parcela)}
+
+    # Cambios de densidad invalidan todas las parcelas con árboles de esa especie
+    parcelas_especies = session.info.pop(CLAVE_PARCELAS_ESPECIES, set())
+
+    if not (movimientos_arboles or movimientos_necromasa or movimientos_herbaceas
+            or parcelas_eliminadas or parcelas_especies):
+        return
+
+    conexion = session.connection()
+
+    deltas_arboles = _deltas_arboles(conexion, movimientos_arboles) if movimientos_arboles else {}
+    deltas_necromasa = _deltas_peso_seco(movimientos_necromasa)
+    deltas_herbaceas = _deltas_peso_seco(movimientos_herbaceas)
+
+    por_invalidar = set(parcelas_especies)
+    parcelas = (set(deltas_arboles) | set(deltas_necromasa) | set(deltas_herbaceas)) - parcelas_eliminadas
+    bloquear_parcelas(conexion, parcelas | por_invalidar)
+
+    for parcela_id in parcelas:
+        delta = deltas_arboles.get(parcela_id)
+        valores = {
+            "necromasa_seca_kg": TABLA_PARCELA.c.necromasa_seca_kg + deltas_necromasa.get(parcela_id, 0.0),
+            "herbaceas_seca_kg": TABLA_PARCELA.c.herbaceas_seca_kg + deltas_herbaceas.get(parcela_id, 0.0),
+        }
+        if delta:
+            valores["num_arboles"] = TABLA_PARCELA.c.num_arboles + delta["num_arboles"]
+            valores["area_basal_m2"] = TABLA_PARCELA.c.area_basal_m2 + delta["area_basal_m2"]
+
+        actualizadas = conexion.execute(
+            update(TABLA_PARCELA).where(TABLA_PARCELA.c.parcela_id == parcela_id).values(**valores)
+        ).rowcount
+        if not actualizadas or not delta:
+            continue
+
+        for modelo, biomasa_kg in delta["biomasa_aerea_kg"].items():
+            actualizadas = conexion.execute(
+                update(TABLA_MODELO)
+                .where(TABLA_MODELO.c.parcela_id == parcela_id, TABLA_MODELO.c.modelo == modelo)
+                .values(biomasa_aerea_kg=TABLA_MODELO.c.biomasa_aerea_kg + biomasa_kg)
+            ).rowcount
+            if not actualizadas:
+                # Modelo nuevo sin fila: reconstruir en la próxima lectura
+                por_invalidar.add(parcela_id)
+
+    invalidar_agregados(conexion, por_invalidar | parcelas_eliminadas)
+
+
+def obtener_agregados(db: Session, parcela_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Lee los agregados de una parcela, construyéndolos si aún no existen.
+
+    Args:
+        db: Sesión de base de datos
+        parcela_id: ID de la parcela
+
+    Returns:
+        Diccionario con totales o None si la parcela no existe
+    """
+    def leer():
+        fila = db.execute(
+            select(TABLA_PARCELA).where(TABLA_PARCELA.c.parcela_id == parcela_id)
+        ).mappings().first()
+        modelos = dict(db.execute(
+            select(TABLA_MODELO.c.modelo, TABLA_MODELO.c.biomasa_aerea_kg)
+            .where(TABLA_MODELO.c.parcela_id == parcela_id)
+        ).all())
+        return fila, modelos
+
+    fila, modelos = leer()
+    # Un modelo registrado después de construir los agregados obliga a reconstruirlos
+    if fila is None or set(modelos) != set(modelos_registrados("arbol")):
+        if db.get(Parcela, parcela_id) is None:
+            return None
+        try:
+            reconstruir_agregados(db.connection(), [parcela_id])
+            db.commit()
+        except IntegrityError:
+            # Otra transacción los construyó al mismo tiempo
+            db.rollback()
+        fila, modelos = leer()
+
+    return {
+        "parcela_id": parcela_id,
+        "num_arboles": fila["num_arboles"],
+        "area_basal_m2": fila["area_basal_m2"],
+        "biomasa_aerea_kg": modelos,
+        "necromasa_seca_kg": fila["necromasa_seca_kg"],
+        "herbaceas_seca_kg": fila["herbaceas_seca_kg"],
+        "actualizado": fila["updated_at"],
+    }
@@ -4,12 +4,15 @@ Implementa modelos alométricos para calcular biomasa aérea y carbono
 """
 
 import math
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Sequence, Tuple
 from datetime import date
 
+import numpy as np
+
 from src.models.arbol import Arbol
 from src.models.especie import Especie
-from src.utils.constants import FACTOR_CARBONO, AREA_PARCELA_HA
+from src.services.modelos_alometricos import ModeloAlometrico, obtener_modelo, modelos_registrados
+from src.utils.constants import FACTOR_CARBONO, AREA_PARCELA_HA, DENSIDAD_MADERA_PROMEDIO
 
 
 class BiomasaCalculator:
@@ -20,6 +23,10 @@ class BiomasaCalculator:
     - Modelo Chave et al. 2014 (pantropical)
     - Modelo IPCC 2006
     - Modelo IDEAM (Colombia)
+
+    Los cálculos por árbol y en lote usan el registro de
+    `src/services/modelos_alometricos.py`, donde se agregan modelos
+    locales o de palmas y lianas.
     """
 
     def __init__(self):
@@ -180,7 +187,7 @@ class BiomasaCalculator:
 
         Args:
             arbol: Objeto Arbol con mediciones
-            modelo: Modelo alométrico a usar ('chave_2014', 'ipcc_2006', 'ideam')
+            modelo: Nombre o alias de un modelo registrado ('chave_2014', 'ipcc_2006', 'ideam', ...)
 
         Returns:
             Diccionario con biomasa y carbono
@@ -188,15 +195,16 @@ class BiomasaCalculator:
         # Obtener densidad de la especie
         densidad = arbol.especie.densidad_madera if arbol.especie else 0.6
 
-        # Calcular biomasa según modelo
-        if modelo == "chave_2014":
-            biomasa_kg = self.chave_2014(arbol.dap, arbol.altura, densidad)
-        elif modelo == "ipcc_2006":
-            biomasa_kg = self.ipcc_2006(arbol.dap, densidad)
-        elif modelo == "ideam":
-            biomasa_kg = self.ideam_colombia(arbol.dap, arbol.altura, densidad)
-        else:
-            raise ValueError(f"Modelo '{modelo}' no reconocido")
+        # Calcular biomasa según el modelo registrado
+        modelo_alometrico = obtener_modelo(modelo)
+        dap_arr, altura_arr, densidad_arr, densidad_acotada = self.preparar_entradas_lote(
+            [arbol.dap],
+            [arbol.altura if arbol.altura is not None else np.nan],
+            [densidad if densidad is not None else np.nan]
+        )
+        entradas = self.entradas_modelo(dap_arr, altura_arr, densidad_arr, densidad_acotada)
+        biomasa_kg = float(modelo_alometrico.calcular(entradas)[0])
+        modelo = modelo_alometrico.nombre
 
         # Calcular carbono
         carbono_kg = biomasa_kg * self.factor_carbono
@@ -211,22 +219,191 @@ class BiomasaCalculator:
             "modelo_usado": modelo
         }
 
-    def calcular_biomasa_parcela(
+    def _estimar_altura_chave_lote(self, dap: np.ndarray) -> np.ndarray:
+        """
+        Versión vectorizada de `_estimar_altura_chave`.
+
+        Args:
+            dap: Arreglo de DAP (cm)
+
+        Returns:
+            Arreglo de alturas estimadas (m)
+        """
+        E = 0.0
+        ln_dap = np.log(dap)
+        return np.exp(0.893 - E + 0.760 * ln_dap - 0.0340 * ln_dap ** 2)
+
+    def preparar_entradas_lote(
         self,
-        arboles: List[Arbol],
-        modelo: str = "chave_2014"
-    ) -> Dict[str, Any]:
+        dap: Sequence[float],
+        altura: Optional[Sequence[Optional[float]]] = None,
+        densidad_madera: Optional[Sequence[Optional[float]]] = None
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
         """
-        Calcula la biomasa total de una parcela.
+        Normaliza las entradas del cálculo en lote.
+
+        Aplica las mismas reglas que los modelos individuales: imputa la
+        altura con `_estimar_altura_chave` cuando falta o es ≤ 0 y reemplaza
+        densidades ausentes por la densidad promedio.
 
         Args:
-            arboles: Lista de árboles de la parcela
-            modelo: Modelo alométrico a usar
+            dap: DAP por árbol (cm)
+            altura: Altura por árbol (m); None o NaN si no se midió
+            densidad_madera: Densidad por árbol (g/cm³); None o NaN si se desconoce
 
         Returns:
-            Diccionario con estadísticas de biomasa
+            Tupla (dap, altura_usada, densidad, densidad_acotada) donde
+            `densidad_acotada` aplica además el rango válido (0, 1.5]
         """
-        if not arboles:
+        dap_arr = np.asarray(dap, dtype=float)
+        n = dap_arr.shape[0]
+
+        if altura is None:
+            altura_arr = np.full(n, np.nan)
+        else:
+            altura_arr = np.asarray(altura, dtype=float)
+
+        if densidad_madera is None:
+            densidad_arr = np.full(n, DENSIDAD_MADERA_PROMEDIO)
+        else:
+            densidad_arr = np.asarray(densidad_madera, dtype=float)
+            densidad_arr = np.where(np.isnan(densidad_arr), DENSIDAD_MADERA_PROMEDIO, densidad_arr)
+
+        # Imputar altura donde falta (misma regla que chave_2014 / ideam_colombia)
+        sin_altura = ~(altura_arr > 0)
+        if sin_altura.any():
+            altura_arr = altura_arr.copy()
+            altura_arr[sin_altura] = self._estimar_altura_chave_lote(dap_arr[sin_altura])
+
+        # Chave e IDEAM descartan densidades fuera de rango
+        densidad_acotada = np.where(
+            (densidad_arr <= 0) | (densidad_arr > 1.5), 0.6, densidad_arr
+        )
+
+        return dap_arr, altura_arr, densidad_arr, densidad_acotada
+
+    def calcular_biomasa_lote(
+        self,
+        dap: Sequence[float],
+        altura: Optional[Sequence[Optional[float]]] = None,
+        densidad_madera: Optional[Sequence[Optional[float]]] = None,
+        modelos: Optional[Sequence[str]] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Calcula biomasa para muchos árboles en una sola pasada vectorizada.
+
+        Equivale a llamar `calcular_biomasa_arbol` por cada árbol y modelo,
+        pero opera sobre arreglos NumPy completos. Los modelos se resuelven
+        en el registro una sola vez por lote y comparten las entradas ya
+        preparadas (altura imputada, densidad acotada).
+
+        Args:
+            dap: DAP por árbol (cm)
+            altura: Altura por árbol (m); None o NaN si no se midió
+            densidad_madera: Densidad por árbol (g/cm³)
+            modelos: Nombres o alias de modelos (default: todos los del grupo 'arbol')
+
+        Returns:
+            Diccionario por nombre canónico del modelo con arreglos por árbol
+            ('biomasa_kg', 'carbono_kg', 'co2_equivalente_kg') y el resumen
+            de la parcela en 'parcela' (mismo formato que `calcular_biomasa_parcela`)
+        """
+        modelos_alometricos = self.resolver_modelos(modelos)
+
+        dap_arr, altura_arr, densidad_arr, densidad_acotada = self.preparar_entradas_lote(
+            dap, altura, densidad_madera
+        )
+        entradas = self.entradas_modelo(dap_arr, altura_arr, densidad_arr, densidad_acotada)
+
+        resultados = {}
+        for modelo in modelos_alometricos:
+            biomasa_kg = modelo.calcular(entradas)
+            carbono_kg = biomasa_kg * self.factor_carbono
+            co2_equivalente_kg = carbono_kg * (44 / 12)
+
+            resultados[modelo.nombre] = {
+                "biomasa_kg": biomasa_kg,
+                "carbono_kg": carbono_kg,
+                "co2_equivalente_kg": co2_equivalente_kg,
+                "altura_usada": altura_arr,
+                "parcela": self._resumen_parcela(
+                    modelo.nombre,
+                    len(dap_arr),
+                    float(biomasa_kg.sum()),
+                    float(carbono_kg.sum()),
+                    float(co2_equivalente_kg.sum())
+                )
+            }
+
+        return resultados
+
+    def resolver_modelos(
+        self,
+        modelos: Optional[Sequence[str]] = None
+    ) -> List[ModeloAlometrico]:
+        """
+        Resuelve nombres o alias contra el registro de modelos.
+
+        Args:
+            modelos: Nombres o alias (default: todos los del grupo 'arbol')
+
+        Returns:
+            Lista de modelos sin repetidos, en el orden pedido
+
+        Raises:
+            ValueError: Si algún modelo no está registrado
+        """
+        if modelos is None:
+            modelos = modelos_registrados("arbol")
+
+        resueltos = {}
+        for nombre in modelos:
+            modelo = obtener_modelo(nombre)
+            resueltos.setdefault(modelo.nombre, modelo)
+        return list(resueltos.values())
+
+    def entradas_modelo(
+        self,
+        dap: np.ndarray,
+        altura: np.ndarray,
+        densidad: np.ndarray,
+        densidad_acotada: np.ndarray
+    ) -> Dict[str, np.ndarray]:
+        """
+        Arma el diccionario de entradas que reciben los kernels del registro.
+
+        Los arreglos pueden tener cualquier forma (árboles o árboles × simulaciones).
+        """
+        return {
+            "dap": dap,
+            "altura": altura,
+            "densidad": densidad,
+            "densidad_acotada": densidad_acotada,
+        }
+
+    def _arreglos_desde_arboles(
+        self,
+        arboles: List[Arbol]
+    ) -> Tuple[List[float], List[Optional[float]], List[Optional[float]]]:
+        """Extrae DAP, altura y densidad de una lista de objetos Arbol"""
+        dap = [arbol.dap for arbol in arboles]
+        altura = [arbol.altura if arbol.altura is not None else np.nan for arbol in arboles]
+        densidad = [
+            (arbol.especie.densidad_madera if arbol.especie else None) or np.nan
+            for arbol in arboles
+        ]
+        return dap, altura, densidad
+
+    def _resumen_parcela(
+        self,
+        modelo: str,
+        num_arboles: int,
+        biomasa_total: float,
+        carbono_total: float,
+        co2_total: float
+    ) -> Dict[str, Any]:
+        """Arma el diccionario de resultados a nivel de parcela"""
+        if num_arboles == 0:
             return {
                 "num_arboles": 0,
                 "biomasa_total_kg": 0,
@@ -240,17 +417,6 @@ class BiomasaCalculator:
                 "modelo_usado": modelo
             }
 
-        # Calcular biomasa de cada árbol
-        biomasa_total = 0
-        carbono_total = 0
-        co2_total = 0
-
-        for arbol in arboles:
-            resultado = self.calcular_biomasa_arbol(arbol, modelo)
-            biomasa_total += resultado["biomasa_kg"]
-            carbono_total += resultado["carbono_kg"]
-            co2_total += resultado["co2_equivalente_kg"]
-
         # Convertir a megagramos (Mg = 1000 kg)
         biomasa_total_mg = biomasa_total / 1000
         carbono_total_mg = carbono_total / 1000
@@ -262,7 +428,7 @@ class BiomasaCalculator:
         co2_por_ha_mg = co2_total_mg / self.area_parcela_ha
 
         return {
-            "num_arboles": len(arboles),
+            "num_arboles": num_arboles,
             "biomasa_total_kg": biomasa_total,
             "biomasa_total_mg": biomasa_total_mg,
             "biomasa_por_hectarea_mg": biomasa_por_ha_mg,
@@ -276,6 +442,31 @@ class BiomasaCalculator:
             "area_parcela_ha": self.area_parcela_ha
         }
 
+    def calcular_biomasa_parcela(
+        self,
+        arboles: List[Arbol],
+        modelo: str = "chave_2014"
+    ) -> Dict[str, Any]:
+        """
+        Calcula la biomasa total de una parcela.
+
+        Args:
+            arboles: Lista de árboles de la parcela
+            modelo: Modelo alométrico a usar
+
+        Returns:
+            Diccionario con estadísticas de biomasa
+        """
+        modelo = obtener_modelo(modelo).nombre
+
+        if not arboles:
+            return self._resumen_parcela(modelo, 0, 0, 0, 0)
+
+        dap, altura, densidad = self._arreglos_desde_arboles(arboles)
+        resultado = self.calcular_biomasa_lote(dap, altura, densidad, modelos=[modelo])
+
+        return resultado[modelo]["parcela"]
+
     def calcular_biomasa_necromasa(
         self,
         volumen_total_m3: float,
@@ -450,16 +641,60 @@ class BiomasaCalculator:
         """
         Compara los resultados de diferentes modelos alométricos.
 
+        Todos los modelos registrados para árboles se calculan en una sola
+        pasada sobre los datos.
+
         Args:
             arboles: Lista de árboles
 
         Returns:
             Diccionario con resultados por modelo
         """
-        modelos = ["chave_2014", "ipcc_2006", "ideam"]
-        resultados = {}
+        if not arboles:
+            return {
+                modelo: self._resumen_parcela(modelo, 0, 0, 0, 0)
+                for modelo in modelos_registrados("arbol")
+            }
 
-        for modelo in modelos:
-            resultados[modelo] = self.calcular_biomasa_parcela(arboles, modelo)
+        dap, altura, densidad = self._arreglos_desde_arboles(arboles)
+        resultado = self.calcular_biomasa_lote(dap, altura, densidad)
 
-        return resultados
+        return {modelo: datos["parcela"] for modelo, datos in resultado.items()}
+
+    def calcular_incertidumbre_parcela(
+        self,
+        arboles: List[Arbol],
+        modelo: str = "chave_2014",
+        n_simulaciones: int = 1000,
+        biomasa_fija_kg: float = 0.0,
+        semilla: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Calcula intervalos de confianza de la biomasa de una parcela
+        mediante simulación Monte Carlo.
+
+        Args:
+            arboles: Lista de árboles de la parcela
+            modelo: Modelo alométrico a usar
+            n_simulaciones: Número de realizaciones
+            biomasa_fija_kg: Biomasa de necromasa y herbáceas (kg)
+            semilla: Semilla para resultados reproducibles
+
+        Returns:
+            Diccionario con media, desviación e intervalo por componente
+        """
+        from src.services.incertidumbre_biomasa import simular_biomasa_parcela
+
+        dap, altura, densidad = self._arreglos_desde_arboles(arboles)
+
+        return simular_biomasa_parcela(
+            dap,
+            altura,
+            densidad,
+            modelo=modelo,
+            n_simulaciones=n_simulaciones,
+            factor_carbono=self.factor_carbono,
+            area_parcela_ha=self.area_parcela_ha,
+            biomasa_fija_kg=biomasa_fija_kg,
+            semilla=semilla
+        )
@@ -0,0 +1,298 @@
+"""
+Caché de Archivos de AppEEARS
+Guarda en disco los archivos de los bundles para reprocesar sin volver a descargar
+"""
+
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional
+
+from config.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+TAMANO_BLOQUE_HASH = 1024 * 1024
+
+# Descargas parciales sin tocar por más de un día se descartan al desalojar
+PARTES_VENCIDAS_SEGUNDOS = 24 * 3600
+
+
+def sha256_archivo(ruta: str) -> str:
+    """Hash SHA-256 del contenido de un archivo, leído por bloques"""
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(TAMANO_BLOQUE_HASH), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def _nombre_seguro(texto: str) -> str:
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in str(texto))
+
+
+class CacheBundlesAppEEARS:
+    """
+    Caché direccionada por contenido de los bundles de AppEEARS.
+
+    Estructura del directorio:
+        objetos/ab/abcdef...   contenido de cada archivo, nombrado por su SHA-256
+        claves/<task_id>/<file_id>.json   referencia (task, file) → hash
+        claves/<task_id>/_bundle.json     listado de archivos del bundle
+        descargas/<task_id>__<file_id>.part   descargas en curso o cortadas
+        descargas/<task_id>__<file_id>.lock   candado de la descarga
+
+    Los archivos con el mismo contenido se guardan una sola vez. Cada
+    lectura actualiza la fecha de modificación del objeto; al superar el
+    tamaño máximo se borran primero los objetos usados hace más tiempo
+    (LRU). Las escrituras usan un archivo temporal y `os.replace`, así que
+    varios procesos pueden compartir el directorio. Cada descarga toma un
+    candado exclusivo (flock) sobre su '.lock', de modo que dos procesos
+    no escriben el mismo '.part' a la vez.
+    """
+
+    def __init__(self, directorio: str, tamano_maximo_bytes: int):
+        self.directorio = directorio
+        self.tamano_maximo_bytes = tamano_maximo_bytes
+        self._dir_objetos = os.path.join(directorio, "objetos")
+        self._dir_claves = os.path.join(directorio, "claves")
+        self._dir_descargas = os.path.join(directorio, "descargas")
+        self._lock = threading.Lock()
+        for ruta in (self._dir_objetos, self._dir_claves, self._dir_descargas):
+            os.makedirs(ruta, exist_ok=True)
+
+    # --- rutas ---
+
+    def _ruta_objeto(self, sha256: str) -> str:
+        return os.path.join(self._dir_objetos, sha256[:2], sha256)
+
+    def _ruta_clave(self, task_id: str, file_id: str) -> str:
+        return os.path.join(self._dir_claves, _nombre_seguro(task_id), f"{_nombre_seguro(file_id)}.json")
+
+    def _ruta_bundle(self, task_id: str) -> str:
+        return os.path.join(self._dir_claves, _nombre_seguro(task_id), "_bundle.json")
+
+    def _escribir_json(self, ruta: str, datos: Dict) -> None:
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        fd, temporal = tempfile.mkstemp(dir=os.path.dirname(ruta), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(datos, f)
+        os.replace(temporal, ruta)
+
+    @staticmethod
+    def _leer_json(ruta: str) -> Optional[Dict]:
+        try:
+            with open(ruta, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    @contextmanager
+    def _bloqueo_descarga(self, destino: str):
+        """Candado exclusivo entre hilos y procesos para descargar `destino`"""
+        fd = os.open(destino + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            # Marca el candado como en uso para que desalojar() no lo borre
+            os.utime(fd)
+            yield
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    def _descarga_en_uso(destino: str) -> bool:
+        """True si otro hilo o proceso tiene tomado el candado de `destino`"""
+        try:
+            fd = os.open(destino + ".lock", os.O_RDWR)
+        except FileNotFoundError:
+            return False
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return True
+        finally:
+            os.close(fd)
+        return False
+
+    # --- bundle ---
+
+    def obtener_bundle(self, task_id: str) -> Optional[Dict]:
+        """Listado de archivos del bundle guardado (respuesta de GET /bundle/{task_id})"""
+        return self._leer_json(self._ruta_bundle(task_id))
+
+    def guardar_bundle(self, task_id: str, bundle: Dict) -> None:
+        self._escribir_json(self._ruta_bundle(task_id), bundle)
+
+    # --- archivos ---
+
+    def obtener(self, task_id: str, file_id: str) -> Optional[str]:
+        """
+        Ruta del archivo en caché o None si no está.
+
+        Marca el objeto como usado recientemente.
+        """
+        referencia = self._leer_json(self._ruta_clave(task_id, file_id))
+        if not referencia:
+            return None
+        ruta = self._ruta_objeto(referencia["sha256"])
+        try:
+            os.utime(ruta)
+        except FileNotFoundError:
+            # El objeto fue desalojado; la referencia queda huérfana
+            return None
+        return ruta
+
+    def guardar(self, task_id: str, file_id: str, origen: str, sha256: Optional[str] = None) -> str:
+        """
+        Mueve un archivo descargado a la caché.
+
+        Args:
+            origen: Archivo descargado (se mueve, no se copia)
+            sha256: Hash esperado según el bundle; si no coincide se descarta
+
+        Returns:
+            Ruta del objeto en caché
+
+        Raises:
+            ValueError: Si el contenido no coincide con el hash esperado
+        """
+        calculado = sha256_archivo(origen)
+        if sha256 and calculado != sha256.lower():
+            os.remove(origen)
+            raise ValueError(f"El archivo {file_id} de la tarea {task_id} no coincide con su SHA-256")
+
+        ruta = self._ruta_objeto(calculado)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        if os.path.exists(ruta):
+            os.remove(origen)
+            os.utime(ruta)
+        else:
+            os.replace(origen, ruta)
+
+        self._escribir_json(
+            self._ruta_clave(task_id, file_id),
+            {"task_id": task_id, "file_id": file_id, "sha256": calculado, "tamano": os.path.getsize(ruta)}
+        )
+        self.desalojar()
+        return ruta
+
+    def obtener_o_descargar(
+        self,
+        task_id: str,
+        file_id: str,
+        descargar: Callable[[str], bool],
+        sha256: Optional[str] = None
+    ) -> str:
+        """
+        Ruta del archivo en caché; si falta, lo descarga con `descargar(destino)`
+        y verifica el SHA-256 del bundle.
+
+        Raises:
+            Exception: Si la descarga falla
+        """
+        ruta = self.obtener(task_id, file_id)
+        if ruta is not None:
+            return ruta
+
+        # Ruta fija por (tarea, archivo): una descarga cortada deja su '.part' para reanudarla
+        destino = os.path.join(self._dir_descargas, f"{_nombre_seguro(task_id)}__{_nombre_seguro(file_id)}")
+        with self._bloqueo_descarga(destino):
+            # Otro proceso pudo terminar la misma descarga mientras se esperaba el candado
+            ruta = self.obtener(task_id, file_id)
+            if ruta is not None:
+                return ruta
+            if not descargar(destino):
+                raise Exception(f"No se pudo descargar el archivo {file_id} de la tarea {task_id}")
+            return self.guardar(task_id, file_id, destino, sha256)
+
+    def contiene_bundle(self, task_id: str, file_ids: Optional[List[str]] = None) -> bool:
+        """True si el listado del bundle y sus archivos (o los indicados) están en caché"""
+        bundle = self.obtener_bundle(task_id)
+        if bundle is None:
+            return False
+        if file_ids is None:
+            file_ids = [archivo.get("file_id") for archivo in bundle.get("files", [])]
+        return all(
+            (referencia := self._leer_json(self._ruta_clave(task_id, file_id)))
+            and os.path.exists(self._ruta_objeto(referencia["sha256"]))
+            for file_id in file_ids
+        )
+
+    # --- tamaño y desalojo ---
+
+    def _objetos(self) -> List[os.DirEntry]:
+        objetos = []
+        for prefijo in os.scandir(self._dir_objetos):
+            if prefijo.is_dir():
+                objetos.extend(e for e in os.scandir(prefijo.path) if e.is_file())
+        return objetos
+
+    def desalojar(self) -> int:
+        """
+        Borra los objetos menos usados hasta quedar bajo el tamaño máximo.
+
+        Returns:
+            Cantidad de objetos borrados
+        """
+        with self._lock:
+            objetos = []
+            for entrada in self._objetos():
+                try:
+                    estado = entrada.stat()
+                except FileNotFoundError:
+                    continue
+                objetos.append((estado.st_mtime, estado.st_size, entrada.path))
+
+            total = sum(tamano for _, tamano, _ in objetos)
+            borrados = 0
+            for _, tamano, ruta in sorted(objetos):
+                if total <= self.tamano_maximo_bytes:
+                    break
+                try:
+                    os.remove(ruta)
+                except FileNotFoundError:
+                    pass
+                total -= tamano
+                borrados += 1
+
+            # Partes y candados de descargas abandonadas, salvo las que siguen en curso
+            limite = time.time() - PARTES_VENCIDAS_SEGUNDOS
+            for entrada in os.scandir(self._dir_descargas):
+                try:
+                    if entrada.stat().st_mtime >= limite:
+                        continue
+                    if self._descarga_en_uso(os.path.splitext(entrada.path)[0]):
+                        continue
+                    os.remove(entrada.path)
+                except FileNotFoundError:
+                    pass
+
+            if borrados:
+                logger.info(f"Caché AppEEARS: {borrados} archivos desalojados")
+            return borrados
+
+    def estado(self) -> Dict:
+        objetos = self._objetos()
+        return {
+            "directorio": self.directorio,
+            "archivos": len(objetos),
+            "tamano_bytes": sum(e.stat().st_size for e in objetos),
+            "tamano_maximo_bytes": self.tamano_maximo_bytes,
+        }
+
+
+@lru_cache
+def get_cache_appeears() -> CacheBundlesAppEEARS:
+    """Caché compartida del proceso según la configuración"""
+    settings = get_settings()
+    return CacheBundlesAppEEARS(
+        settings.APPEEARS_CACHE_DIR,
+        settings.APPEEARS_CACHE_MAX_MB * 1024 * 1024
+    )
@@ -0,0 +1,177 @@
+"""
+Calidad MODIS VI_Quality
+Decodifica en bloque la máscara de bits de MOD13Q1 y pondera las observaciones
+"""
+
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+
+# Clases de calidad (el código de cada observación es su posición en la tupla)
+CLASES_CALIDAD = ("buena", "aceptable", "nubosidad", "pobre")
+CODIGO_BUENA, CODIGO_ACEPTABLE, CODIGO_NUBOSIDAD, CODIGO_POBRE = range(len(CLASES_CALIDAD))
+
+# Peso de cada clase en las estadísticas (0 = enmascarada)
+PESOS_CALIDAD = np.array([1.0, 0.5, 0.0, 0.0])
+PESO_POR_CALIDAD = dict(zip(CLASES_CALIDAD, PESOS_CALIDAD.tolist()))
+
+# Máscara tierra/agua (bits 11-13): océano, agua continental somera/profunda
+CLASES_AGUA = (0, 3, 5, 6, 7)
+
+
+def decodificar_vi_quality(qa: Iterable[int]) -> Dict[str, np.ndarray]:
+    """
+    Separa los campos de bits de VI_Quality (MOD13Q1/MYD13Q1).
+
+    Bits 0-1 MODLAND, 2-5 utilidad, 6-7 aerosoles, 8 nube adyacente,
+    9 corrección BRDF, 10 nubes mezcladas, 11-13 tierra/agua,
+    14 nieve/hielo, 15 sombra.
+    """
+    qa = np.asarray(qa, dtype=np.uint16)
+    return {
+        "modland": qa & 0b11,
+        "utilidad": (qa >> 2) & 0b1111,
+        "aerosoles": (qa >> 6) & 0b11,
+        "nube_adyacente": (qa >> 8) & 1,
+        "correccion_brdf": (qa >> 9) & 1,
+        "nubes_mezcladas": (qa >> 10) & 1,
+        "tierra_agua": (qa >> 11) & 0b111,
+        "nieve_hielo": (qa >> 14) & 1,
+        "sombra": (qa >> 15) & 1,
+    }
+
+
+def clasificar_vi_quality(qa: Iterable[int]) -> np.ndarray:
+    """
+    Clasifica cada VI_Quality en un código de `CLASES_CALIDAD`.
+
+    - nubosidad: MODLAND "probablemente nublado", nubes mezcladas o sombra
+    - pobre: píxel no producido, utilidad 12 o peor, nieve/hielo o agua
+    - buena: MODLAND bueno, utilidad 0-3, sin nube adyacente ni aerosol alto
+    - aceptable: el resto
+    """
+    campos = decodificar_vi_quality(qa)
+    nubosidad = (campos["modland"] == 2) | (campos["nubes_mezcladas"] == 1) | (campos["sombra"] == 1)
+    pobre = (
+        (campos["modland"] == 3)
+        | (campos["utilidad"] >= 12)
+        | (campos["nieve_hielo"] == 1)
+        | np.isin(campos["tierra_agua"], CLASES_AGUA)
+    )
+    buena = (
+        (campos["modland"] == 0)
+        & (campos["utilidad"] <= 3)
+        & (campos["nube_adyacente"] == 0)
+        & (campos["aerosoles"] != 3)
+    )
+    return np.select(
+        [nubosidad, pobre, buena],
+        [CODIGO_NUBOSIDAD, CODIGO_POBRE, CODIGO_BUENA],
+        default=CODIGO_ACEPTABLE
+    ).astype(np.int8)
+
+
+class EstadisticaPonderada:
+    """Estadísticas de un índice ponderadas por calidad (misma interfaz que EstadisticaIncremental)"""
+
+    def __init__(self, n: int, media: float, desviacion: Optional[float], minimo: float, maximo: float):
+        self.n = n
+        self.media = media
+        self.desviacion = desviacion
+        self.minimo = minimo
+        self.maximo = maximo
+
+    def como_dict(self) -> Dict:
+        return {
+            "n": self.n,
+            "promedio": self.media,
+            "minimo": self.minimo,
+            "maximo": self.maximo,
+            "desviacion": self.desviacion,
+        }
+
+
+def _estadisticas_por_grupo(grupos: np.ndarray, valores: np.ndarray, pesos: np.ndarray, total: int) -> List[Optional[EstadisticaPonderada]]:
+    """Media, desviación, mínimo y máximo ponderados de cada grupo en una pasada vectorizada"""
+    usar = ~np.isnan(valores) & (pesos > 0)
+    grupos, valores, pesos = grupos[usar], valores[usar], pesos[usar]
+
+    n = np.bincount(grupos, minlength=total)
+    suma_pesos = np.bincount(grupos, pesos, minlength=total)
+    suma_pesos2 = np.bincount(grupos, pesos ** 2, minlength=total)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        media = np.bincount(grupos, pesos * valores, minlength=total) / suma_pesos
+        dispersion = np.bincount(grupos, pesos * (valores - media[grupos]) ** 2, minlength=total)
+        # Varianza ponderada insesgada con pesos de confiabilidad
+        varianza = dispersion / (suma_pesos - suma_pesos2 / suma_pesos)
+
+    minimo = np.full(total, np.inf)
+    maximo = np.full(total, -np.inf)
+    np.minimum.at(minimo, grupos, valores)
+    np.maximum.at(maximo, grupos, valores)
+
+    resultado: List[Optional[EstadisticaPonderada]] = []
+    for i in range(total):
+        if n[i] == 0:
+            resultado.append(None)
+            continue
+        desviacion = float(np.sqrt(varianza[i])) if n[i] >= 2 and np.isfinite(varianza[i]) else None
+        resultado.append(EstadisticaPonderada(
+            int(n[i]), float(media[i]), desviacion, float(minimo[i]), float(maximo[i])
+        ))
+    return resultado
+
+
+def aplicar_calidad_vi(series: Dict) -> None:
+    """
+    Clasifica y pondera por VI_Quality todas las observaciones leídas.
+
+    Junta los puntos de todas las series (pueden ser miles de parcelas y
+    años) en arreglos, decodifica la máscara de bits de una vez, marca la
+    calidad de cada punto y recalcula las estadísticas de cada serie con
+    los pesos: las observaciones nubladas o de agua/nieve quedan fuera y
+    las aceptables cuentan la mitad. Los puntos sin VI_Quality (por ejemplo
+    del CSV Statistics o de estadísticas zonales) conservan la calidad que
+    ya traen.
+
+    Si todas las observaciones de una serie quedan enmascaradas se
+    conservan sus estadísticas sin ponderar.
+
+    Args:
+        series: identificador → SerieIndices (se modifica en el lugar)
+    """
+    lista = [serie for serie in series.values() if len(serie)]
+    if not lista:
+        return
+
+    puntos = [punto for serie in lista for punto in serie.puntos.values()]
+    grupos = np.repeat(np.arange(len(lista)), [len(serie) for serie in lista])
+    qa = np.array([punto.get("qa", -1) for punto in puntos], dtype=np.int32)
+
+    con_qa = qa >= 0
+    codigo_por_clase = {clase: codigo for codigo, clase in enumerate(CLASES_CALIDAD)}
+    codigos = np.array(
+        [codigo_por_clase.get(punto.get("calidad"), CODIGO_BUENA) for punto in puntos],
+        dtype=np.int8
+    )
+    if con_qa.any():
+        codigos[con_qa] = clasificar_vi_quality(qa[con_qa])
+    pesos = PESOS_CALIDAD[codigos]
+
+    for punto, codigo in zip(puntos, codigos.tolist()):
+        punto["calidad"] = CLASES_CALIDAD[codigo]
+
+    for indice in lista[0].estadisticas:
+        valores = np.array([punto.get(indice, np.nan) for punto in puntos], dtype=float)
+        for serie, estadistica in zip(lista, _estadisticas_por_grupo(grupos, valores, pesos, len(lista))):
+            if estadistica is not None:
+                serie.estadisticas[indice] = estadistica
+
+
+def porcentaje_nubosidad(serie_temporal: List[Dict]) -> float:
+    """Porcentaje de fechas clasificadas como nubosidad"""
+    if not serie_temporal:
+        return 0.0
+    nubladas = sum(1 for punto in serie_temporal if punto.get("calidad") == "nubosidad")
+    return nubladas / len(serie_temporal) * 100
@@ -0,0 +1,331 @@
+"""
+Servicio de Censos
+Registra campañas de remedición y calcula la dinámica de las parcelas entre campañas
+"""
+
+from datetime import date
+from typing import Dict, Any, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import select, insert, func, literal
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from src.models.arbol import Arbol
+from src.models.especie import Especie
+from src.models.medicion_censo import MedicionCenso
+from src.services.biomasa_calculator import BiomasaCalculator
+from src.services.modelos_alometricos import obtener_modelo
+from src.utils.constants import AREA_PARCELA_HA
+
+# Días promedio por año para convertir intervalos entre fechas de medición
+DIAS_POR_ANIO = 365.25
+
+
+def _clave_fuste(parcela_id: np.ndarray, numero_arbol: np.ndarray) -> np.ndarray:
+    """Combina (parcela_id, numero_arbol) en una sola clave entera por fuste"""
+    return (parcela_id.astype(np.int64) << 32) | numero_arbol.astype(np.int64)
+
+
+def _anios_entre_campanas(campana_inicial: str, campana_final: str) -> float:
+    """Intervalo por defecto cuando no hay fechas: diferencia de las etiquetas numéricas ('2024' → '2025')"""
+    try:
+        return float(int(campana_final[:4]) - int(campana_inicial[:4]))
+    except ValueError:
+        return np.nan
+
+
+class CampanaCenso:
+    """
+    Vista columnar de las mediciones de una campaña.
+
+    Cada atributo es un arreglo con un elemento por fuste; `fecha` está en
+    días ordinales (NaN si no se registró).
+    """
+
+    def __init__(self, filas: Sequence[tuple]):
+        n = len(filas)
+        self.parcela_id = np.fromiter((f[0] for f in filas), dtype=np.int64, count=n)
+        self.numero_arbol = np.fromiter((f[1] for f in filas), dtype=np.int64, count=n)
+        self.dap = np.array([f[2] for f in filas], dtype=float)
+        self.altura = np.array([f[3] for f in filas], dtype=float)
+        self.densidad_madera = np.array([f[4] for f in filas], dtype=float)
+        self.vivo = np.fromiter((bool(f[5]) for f in filas), dtype=bool, count=n)
+        self.fecha = np.array(
+            [f[6].toordinal() if f[6] is not None else np.nan for f in filas], dtype=float
+        )
+        self.clave = _clave_fuste(self.parcela_id, self.numero_arbol)
+
+    def __len__(self) -> int:
+        return self.dap.shape[0]
+
+
+class CensoService:
+    """Servicio para campañas de remedición y dinámica de parcelas"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def registrar_campana(
+        self,
+        campana: str,
+        parcela_ids: Optional[List[int]] = None,
+        fecha_medicion: Optional[date] = None
+    ) -> Dict[str, Any]:
+        """
+        Cierra una campaña copiando el estado actual de los árboles.
+
+        La copia se hace en la base de datos con un solo INSERT ... SELECT.
+        Los árboles con estado sanitario 'muerto' se registran como no vivos.
+
+        Args:
+            campana: Etiqueta de la campaña (ej: '2025')
+            parcela_ids: Parcelas a incluir (default: todas)
+            fecha_medicion: Fecha para árboles sin fecha de medición
+
+        Returns:
+            Diccionario con la campaña y el número de mediciones registradas
+
+        Raises:
+            ValueError: Si la campaña ya existe para alguna de las parcelas
+        """
+        campana = campana.strip()
+        if not campana:
+            raise ValueError("La campaña no puede estar vacía")
+
+        existente = select(MedicionCenso.parcela_id).where(MedicionCenso.campana == campana)
+        origen = select(
+            Arbol.parcela_id,
+            literal(campana),
+            Arbol.numero_arbol,
+            Arbol.especie_id,
+            Arbol.dap,
+            Arbol.altura,
+            func.coalesce(func.lower(Arbol.estado_sanitario), "").notlike("%muert%"),
+            func.coalesce(Arbol.fecha_medicion, fecha_medicion)
+        )
+        if parcela_ids is not None:
+            existente = existente.where(MedicionCenso.parcela_id.in_(parcela_ids))
+            origen = origen.where(Arbol.parcela_id.in_(parcela_ids))
+
+        if self.db.execute(existente.limit(1)).first() is not None:
+            raise ValueError(f"La campaña '{campana}' ya fue registrada para estas parcelas")
+
+        columnas = [
+            "parcela_id", "campana", "numero_arbol", "especie_id",
+            "dap", "altura", "vivo", "fecha_medicion"
+        ]
+        try:
+            resultado = self.db.execute(
+                insert(MedicionCenso).from_select(columnas, origen)
+            )
+            self.db.commit()
+        except IntegrityError:
+            self.db.rollback()
+            raise ValueError(
+                f"No se pudo registrar la campaña '{campana}': hay números de árbol repetidos en una parcela"
+            )
+
+        return {"campana": campana, "num_mediciones": resultado.rowcount}
+
+    def listar_campanas(self) -> List[Dict[str, Any]]:
+        """Campañas registradas con número de parcelas y mediciones"""
+        filas = self.db.execute(
+            select(
+                MedicionCenso.campana,
+                func.count(func.distinct(MedicionCenso.parcela_id)),
+                func.count(MedicionCenso.id),
+                func.min(MedicionCenso.fecha_medicion),
+                func.max(MedicionCenso.fecha_medicion)
+            )
+            .group_by(MedicionCenso.campana)
+            .order_by(MedicionCenso.campana)
+        ).all()
+
+        return [
+            {
+                "campana": campana,
+                "num_parcelas": num_parcelas,
+                "num_mediciones": num_mediciones,
+                "fecha_inicio": fecha_inicio,
+                "fecha_fin": fecha_fin
+            }
+            for campana, num_parcelas, num_mediciones, fecha_inicio, fecha_fin in filas
+        ]
+
+    def cargar_campana(
+        self,
+        campana: str,
+        parcela_ids: Optional[List[int]] = None
+    ) -> CampanaCenso:
+        """Carga una campaña como arreglos en una sola consulta (con la densidad de la especie)"""
+        stmt = (
+            select(
+                MedicionCenso.parcela_id,
+                MedicionCenso.numero_arbol,
+                MedicionCenso.dap,
+                MedicionCenso.altura,
+                Especie.densidad_madera,
+                MedicionCenso.vivo,
+                MedicionCenso.fecha_medicion
+            )
+            .select_from(MedicionCenso)
+            .outerjoin(Especie, MedicionCenso.especie_id == Especie.id)
+            .where(MedicionCenso.campana == campana)
+        )
+        if parcela_ids is not None:
+            stmt = stmt.where(MedicionCenso.parcela_id.in_(parcela_ids))
+
+        return CampanaCenso(self.db.execute(stmt).all())
+
+    def calcular_dinamica(
+        self,
+        campana_inicial: str,
+        campana_final: str,
+        parcela_ids: Optional[List[int]] = None,
+        modelo: str = "chave_2014"
+    ) -> Dict[str, Any]:
+        """
+        Calcula crecimiento, reclutamiento, mortalidad y cambio de biomasa
+        entre dos campañas para todas las parcelas a la vez.
+
+        Los fustes se emparejan por (parcela_id, numero_arbol):
+        - Sobreviviente: vivo en ambas campañas
+        - Muerto: vivo en la inicial, ausente o muerto en la final
+        - Recluta: vivo en la final y ausente en la inicial
+
+        Las tasas anuales siguen Sheil et al. 1995:
+        m = 1 - (N_s / N_0)^(1/t) y r = 1 - (N_s / N_t)^(1/t).
+
+        Args:
+            campana_inicial: Etiqueta de la primera campaña
+            campana_final: Etiqueta de la segunda campaña
+            parcela_ids: Parcelas a incluir (default: todas)
+            modelo: Modelo alométrico para la biomasa aérea
+
+        Returns:
+            Diccionario con resultados por parcela y totales del proyecto
+        """
+        modelo = obtener_modelo(modelo).nombre
+
+        inicial = self.cargar_campana(campana_inicial, parcela_ids)
+        final = self.cargar_campana(campana_final, parcela_ids)
+        if len(inicial) == 0 or len(final) == 0:
+            raise ValueError("Ambas campañas deben tener mediciones para las parcelas indicadas")
+
+        # Solo cuentan los fustes vivos de cada campaña
+        vivos_0 = np.flatnonzero(inicial.vivo)
+        vivos_1 = np.flatnonzero(final.vivo)
+        clave_0 = inicial.clave[vivos_0]
+        clave_1 = final.clave[vivos_1]
+
+        # Emparejamiento vectorizado por clave de fuste
+        _, i0, i1 = np.intersect1d(clave_0, clave_1, assume_unique=True, return_indices=True)
+        muertos = np.isin(clave_0, clave_1, invert=True)
+        reclutas = np.isin(clave_1, inicial.clave, invert=True)
+
+        # Biomasa aérea de cada campaña en una pasada
+        calculator = BiomasaCalculator()
+        biomasa_0 = calculator.calcular_biomasa_lote(
+            inicial.dap[vivos_0], inicial.altura[vivos_0], inicial.densidad_madera[vivos_0], modelos=[modelo]
+        )[modelo]["biomasa_kg"]
+        biomasa_1 = calculator.calcular_biomasa_lote(
+            final.dap[vivos_1], final.altura[vivos_1], final.densidad_madera[vivos_1], modelos=[modelo]
+        )[modelo]["biomasa_kg"]
+
+        parcela_0 = inicial.parcela_id[vivos_0]
+        parcela_1 = final.parcela_id[vivos_1]
+        ids = np.union1d(np.unique(inicial.parcela_id), np.unique(final.parcela_id))
+        n = ids.shape[0]
+        pos_0 = np.searchsorted(ids, parcela_0)
+        pos_1 = np.searchsorted(ids, parcela_1)
+        pos_s = pos_0[i0]
+
+        def sumar(posiciones, pesos=None):
+            return np.bincount(posiciones, weights=pesos, minlength=n)
+
+        n_inicial = sumar(pos_0)
+        n_final = sumar(pos_1)
+        n_sobrevivientes = sumar(pos_s)
+        n_muertos = sumar(pos_0[muertos])
+        n_reclutas = sumar(pos_1[reclutas])
+
+        incremento_dap = final.dap[vivos_1][i1] - inicial.dap[vivos_0][i0]
+        suma_incremento_dap = sumar(pos_s, incremento_dap)
+
+        agb_inicial = sumar(pos_0, biomasa_0)
+        agb_final = sumar(pos_1, biomasa_1)
+        agb_crecimiento = sumar(pos_s, biomasa_1[i1] - biomasa_0[i0])
+        agb_reclutas = sumar(pos_1[reclutas], biomasa_1[reclutas])
+        agb_mortalidad = sumar(pos_0[muertos], biomasa_0[muertos])
+
+        # Intervalo por parcela: promedio de los días entre mediciones de los sobrevivientes
+        dias = final.fecha[vivos_1][i1] - inicial.fecha[vivos_0][i0]
+        con_fecha = np.isfinite(dias)
+        n_con_fecha = sumar(pos_s[con_fecha])
+        suma_dias = sumar(pos_s[con_fecha], dias[con_fecha])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            anios = np.where(
+                n_con_fecha > 0,
+                suma_dias / n_con_fecha / DIAS_POR_ANIO,
+                _anios_entre_campanas(campana_inicial, campana_final)
+            )
+            anios = np.where(anios > 0, anios, np.nan)
+
+            incremento_dap_medio = suma_incremento_dap / n_sobrevivientes
+            tasa_mortalidad = 1 - (n_sobrevivientes / n_inicial) ** (1 / anios)
+            tasa_reclutamiento = 1 - (n_sobrevivientes / n_final) ** (1 / anios)
+            # Productividad leñosa aérea: crecimiento de sobrevivientes + reclutas
+            productividad = (agb_crecimiento + agb_reclutas) / 1000 / AREA_PARCELA_HA / anios
+
+        def valor(arreglo, i):
+            return float(arreglo[i]) if np.isfinite(arreglo[i]) else None
+
+        parcelas = [
+            {
+                "parcela_id": int(parcela_id),
+                "intervalo_anios": valor(anios, i),
+                "num_arboles_inicial": int(n_inicial[i]),
+                "num_arboles_final": int(n_final[i]),
+                "sobrevivientes": int(n_sobrevivientes[i]),
+                "muertos": int(n_muertos[i]),
+                "reclutas": int(n_reclutas[i]),
+                "incremento_dap_medio_cm": valor(incremento_dap_medio, i),
+                "incremento_dap_anual_cm": valor(incremento_dap_medio / anios, i),
+                "tasa_mortalidad_anual": valor(tasa_mortalidad, i),
+                "tasa_reclutamiento_anual": valor(tasa_reclutamiento, i),
+                "biomasa_inicial_kg": float(agb_inicial[i]),
+                "biomasa_final_kg": float(agb_final[i]),
+                "cambio_biomasa_kg": float(agb_final[i] - agb_inicial[i]),
+                "biomasa_crecimiento_kg": float(agb_crecimiento[i]),
+                "biomasa_reclutas_kg": float(agb_reclutas[i]),
+                "biomasa_mortalidad_kg": float(agb_mortalidad[i]),
+                "productividad_mg_ha_anio": valor(productividad, i)
+            }
+            for i, parcela_id in enumerate(ids)
+        ]
+
+        # Totales del proyecto (productividad ponderada por el intervalo de cada parcela)
+        con_intervalo = np.isfinite(anios)
+        area_total_ha = AREA_PARCELA_HA * int(con_intervalo.sum())
+        proyecto = {
+            "num_parcelas": n,
+            "sobrevivientes": int(n_sobrevivientes.sum()),
+            "muertos": int(n_muertos.sum()),
+            "reclutas": int(n_reclutas.sum()),
+            "biomasa_inicial_kg": float(agb_inicial.sum()),
+            "biomasa_final_kg": float(agb_final.sum()),
+            "cambio_biomasa_kg": float(agb_final.sum() - agb_inicial.sum()),
+            "productividad_mg_ha_anio": (
+                float(np.sum(productividad[con_intervalo]) * AREA_PARCELA_HA / area_total_ha)
+                if area_total_ha > 0 else None
+            )
+        }
+
+        return {
+            "campana_inicial": campana_inicial,
+            "campana_final": campana_final,
+            "modelo_usado": modelo,
+            "parcelas": parcelas,
+            "proyecto": proyecto
+        }
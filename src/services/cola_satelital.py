@@ -0,0 +1,290 @@
+"""
+Cola de Trabajos Satelitales
+Cola persistente en la base de datos (SQLite o PostgreSQL) sin broker externo
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import and_, case, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from src.models.trabajo_satelital import TrabajoSatelital
+
+
+# Cada cuánto renueva el trabajador el latido de su trabajo (segundos)
+INTERVALO_LATIDO = 30
+
+# Sin latido durante este tiempo, el trabajo se considera abandonado y otro lo retoma
+LATIDO_VENCIDO = timedelta(minutes=3)
+
+# Espera antes de reintentar un paso fallido: BACKOFF_FALLO * 2^(intentos - 1)
+BACKOFF_FALLO = timedelta(minutes=1)
+
+# Fallos permitidos antes de marcar el trabajo como error
+MAX_INTENTOS_DEFECTO = 5
+
+ESTADOS_TRABAJO = ("pendiente", "en_curso", "completado", "error")
+
+
+def ahora_utc() -> datetime:
+    """Hora actual en UTC (todas las columnas de la cola se guardan en UTC)"""
+    return datetime.now(timezone.utc)
+
+
+def como_utc(valor: Optional[datetime]) -> Optional[datetime]:
+    """SQLite devuelve fechas sin zona horaria; se interpretan como UTC"""
+    if valor is not None and valor.tzinfo is None:
+        return valor.replace(tzinfo=timezone.utc)
+    return valor
+
+
+def _segundos(desde: Optional[datetime], hasta: Optional[datetime]) -> Optional[float]:
+    if desde is None or hasta is None:
+        return None
+    return round((como_utc(hasta) - como_utc(desde)).total_seconds(), 1)
+
+
+class ColaSatelitalService:
+    """
+    Operaciones sobre la cola de trabajos satelitales.
+
+    Un trabajo se toma con un UPDATE condicional: solo un trabajador logra
+    cambiarlo de 'pendiente' a 'en_curso', sin importar cuántos lo intenten
+    a la vez. Los trabajos 'en_curso' sin latido reciente (trabajador caído
+    o reiniciado) vuelven a estar disponibles.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def encolar(
+        self,
+        tipo: str,
+        parametros: Dict,
+        nasa_task_id: Optional[str] = None,
+        disponible_desde: Optional[datetime] = None,
+        max_intentos: int = MAX_INTENTOS_DEFECTO
+    ) -> TrabajoSatelital:
+        """
+        Agrega un trabajo a la cola (hace commit).
+
+        Args:
+            tipo: Tipo de trabajo (ver `trabajador_satelital.MANEJADORES`)
+            parametros: Datos del trabajo (JSON)
+            nasa_task_id: Tarea de AppEEARS ya creada, si la hay
+            disponible_desde: Primer momento en que puede ejecutarse (default: ahora)
+            max_intentos: Fallos permitidos antes de marcarlo como error
+        """
+        trabajo = TrabajoSatelital(
+            tipo=tipo,
+            estado="pendiente",
+            parametros=parametros,
+            nasa_task_id=nasa_task_id,
+            intentos=0,
+            max_intentos=max_intentos,
+            consultas=0,
+            disponible_desde=disponible_desde or ahora_utc()
+        )
+        self.db.add(trabajo)
+        self.db.commit()
+        self.db.refresh(trabajo)
+        return trabajo
+
+    @staticmethod
+    def _condicion_disponible(momento: datetime):
+        """Pendiente y vencido su turno, o en curso con el latido vencido"""
+        return or_(
+            and_(TrabajoSatelital.estado == "pendiente", TrabajoSatelital.disponible_desde <= momento),
+            and_(TrabajoSatelital.estado == "en_curso", TrabajoSatelital.latido < momento - LATIDO_VENCIDO)
+        )
+
+    def reclamar(self, trabajador: str, tipos: Optional[List[str]] = None) -> Optional[TrabajoSatelital]:
+        """
+        Toma el siguiente trabajo disponible para `trabajador`.
+
+        Si otro trabajador gana la carrera por el mismo candidato, se prueba
+        con el siguiente. Retomar un trabajo abandonado cuenta como un fallo.
+
+        Returns:
+            El trabajo tomado o None si la cola no tiene trabajos disponibles
+        """
+        for _ in range(5):
+            momento = ahora_utc()
+            candidato = select(TrabajoSatelital.id).where(self._condicion_disponible(momento))
+            if tipos:
+                candidato = candidato.where(TrabajoSatelital.tipo.in_(tipos))
+            # En PostgreSQL evita que dos trabajadores esperen por la misma fila
+            candidato = candidato.order_by(
+                TrabajoSatelital.disponible_desde, TrabajoSatelital.id
+            ).limit(1).with_for_update(skip_locked=True)
+
+            trabajo_id = self.db.execute(candidato).scalar()
+            if trabajo_id is None:
+                self.db.rollback()
+                return None
+
+            resultado = self.db.execute(
+                update(TrabajoSatelital)
+                .where(TrabajoSatelital.id == trabajo_id, self._condicion_disponible(momento))
+                .values(
+                    estado="en_curso",
+                    trabajador=trabajador,
+                    latido=momento,
+                    iniciado_en=func.coalesce(TrabajoSatelital.iniciado_en, momento),
+                    intentos=TrabajoSatelital.intentos + case(
+                        (TrabajoSatelital.estado == "en_curso", 1), else_=0
+                    )
+                )
+                .execution_options(synchronize_session=False)
+            )
+            self.db.commit()
+
+            if resultado.rowcount == 1:
+                return self.db.get(TrabajoSatelital, trabajo_id, populate_existing=True)
+
+        return None
+
+    def latir(self, trabajo_id: int, trabajador: str) -> bool:
+        """
+        Renueva el latido del trabajo (hace commit).
+
+        Returns:
+            False si el trabajo ya no pertenece a este trabajador
+        """
+        resultado = self.db.execute(
+            update(TrabajoSatelital)
+            .where(
+                TrabajoSatelital.id == trabajo_id,
+                TrabajoSatelital.trabajador == trabajador,
+                TrabajoSatelital.estado == "en_curso"
+            )
+            .values(latido=ahora_utc())
+            .execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+        return resultado.rowcount == 1
+
+    def reprogramar(self, trabajo: TrabajoSatelital, espera_segundos: float) -> None:
+        """Devuelve el trabajo a la cola para su próximo paso (no cuenta como fallo)"""
+        trabajo.estado = "pendiente"
+        trabajo.trabajador = None
+        trabajo.latido = None
+        trabajo.disponible_desde = ahora_utc() + timedelta(seconds=espera_segundos)
+        self.db.commit()
+
+    def completar(self, trabajo: TrabajoSatelital) -> None:
+        """Marca el trabajo como completado"""
+        trabajo.estado = "completado"
+        trabajo.trabajador = None
+        trabajo.latido = None
+        trabajo.terminado_en = ahora_utc()
+        trabajo.error_mensaje = None
+        self.db.commit()
+
+    def fallar(self, trabajo: TrabajoSatelital, mensaje: str, definitivo: bool = False) -> bool:
+        """
+        Registra un fallo del trabajo.
+
+        Reintenta con espera exponencial hasta agotar `max_intentos`, salvo
+        que el fallo sea `definitivo` (por ejemplo, la tarea falló en AppEEARS).
+
+        Returns:
+            True si el trabajo quedó en estado 'error' (no se reintentará)
+        """
+        trabajo.intentos = (trabajo.intentos or 0) + 1
+        trabajo.error_mensaje = mensaje
+        trabajo.trabajador = None
+        trabajo.latido = None
+
+        if definitivo or trabajo.intentos >= trabajo.max_intentos:
+            trabajo.estado = "error"
+            trabajo.terminado_en = ahora_utc()
+        else:
+            trabajo.estado = "pendiente"
+            trabajo.disponible_desde = ahora_utc() + BACKOFF_FALLO * 2 ** (trabajo.intentos - 1)
+
+        self.db.commit()
+        return trabajo.estado == "error"
+
+    def estado_cola(self) -> Dict:
+        """
+        Profundidad de la cola y tiempos por tipo de trabajo.
+
+        Returns:
+            Diccionario con conteos por estado, trabajos listos para ejecutarse,
+            antigüedad del más viejo en espera y duraciones promedio
+        """
+        momento = ahora_utc()
+
+        conteos = dict(
+            self.db.query(TrabajoSatelital.estado, func.count(TrabajoSatelital.id))
+            .group_by(TrabajoSatelital.estado)
+            .all()
+        )
+        listos = self.db.query(func.count(TrabajoSatelital.id)).filter(
+            self._condicion_disponible(momento)
+        ).scalar()
+        mas_antiguo = self.db.query(func.min(TrabajoSatelital.created_at)).filter(
+            TrabajoSatelital.estado.in_(("pendiente", "en_curso"))
+        ).scalar()
+
+        # Tiempos de los trabajos terminados (se calculan en Python: SQLite y
+        # PostgreSQL restan fechas de forma distinta)
+        terminados = self.db.query(
+            TrabajoSatelital.tipo,
+            TrabajoSatelital.created_at,
+            TrabajoSatelital.iniciado_en,
+            TrabajoSatelital.terminado_en
+        ).filter(TrabajoSatelital.terminado_en.isnot(None)).all()
+
+        tiempos: Dict[str, Dict] = {}
+        for tipo, creado, iniciado, terminado in terminados:
+            acumulado = tiempos.setdefault(tipo, {"trabajos": 0, "espera": 0.0, "duracion": 0.0})
+            acumulado["trabajos"] += 1
+            acumulado["espera"] += _segundos(creado, iniciado) or 0.0
+            acumulado["duracion"] += _segundos(iniciado, terminado) or 0.0
+
+        return {
+            "por_estado": {estado: conteos.get(estado, 0) for estado in ESTADOS_TRABAJO},
+            "profundidad": conteos.get("pendiente", 0) + conteos.get("en_curso", 0),
+            "listos": listos,
+            "antiguedad_max_segundos": _segundos(mas_antiguo, momento),
+            "tiempos_por_tipo": {
+                tipo: {
+                    "trabajos_terminados": t["trabajos"],
+                    "espera_promedio_segundos": round(t["espera"] / t["trabajos"], 1),
+                    "duracion_promedio_segundos": round(t["duracion"] / t["trabajos"], 1),
+                }
+                for tipo, t in tiempos.items()
+            }
+        }
+
+    def listar(self, estado: Optional[str] = None, limite: int = 50) -> List[Dict]:
+        """Trabajos más recientes con sus tiempos"""
+        query = self.db.query(TrabajoSatelital)
+        if estado:
+            query = query.filter(TrabajoSatelital.estado == estado)
+        trabajos = query.order_by(TrabajoSatelital.id.desc()).limit(limite).all()
+        momento = ahora_utc()
+
+        return [
+            {
+                "id": t.id,
+                "tipo": t.tipo,
+                "estado": t.estado,
+                "nasa_task_id": t.nasa_task_id,
+                "estado_nasa": t.estado_nasa,
+                "intentos": t.intentos,
+                "consultas": t.consultas,
+                "trabajador": t.trabajador,
+                "disponible_desde": t.disponible_desde,
+                "created_at": t.created_at,
+                "iniciado_en": t.iniciado_en,
+                "terminado_en": t.terminado_en,
+                "espera_segundos": _segundos(t.created_at, t.iniciado_en),
+                "duracion_segundos": _segundos(t.iniciado_en, t.terminado_en or momento),
+                "error_mensaje": t.error_mensaje,
+            }
+            for t in trabajos
+        ]
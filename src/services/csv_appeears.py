@@ -0,0 +1,399 @@
+"""
+Lectura de CSV de NASA AppEEARS
+Procesa en streaming los archivos Statistics (área) y Results (Point Sample)
+"""
+
+import csv
+import io
+import math
+import re
+from contextlib import contextmanager
+from datetime import date
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Set, TextIO, Tuple
+
+from src.services.nasa_appeears_service import id_coordenada, parcela_id_desde_coordenada
+from src.services.pixel_modis import pixel_desde_csv
+
+
+FORMATO_STATISTICS = "statistics"  # File Name, Dataset, aid, Date, Mean, ...
+FORMATO_RESULTS = "results"  # Category, ID, Date, <producto>__250m_16_days_NDVI, ...
+
+# Índices que se extraen y sufijo de la capa MODIS correspondiente
+INDICES = {"ndvi": "_NDVI", "evi": "_EVI"}
+
+# Rango válido de NDVI/EVI en MOD13Q1 (-2000..10000 sin escalar); fuera de él son valores de relleno
+RANGO_VALIDO = (-0.2, 1.0)
+
+# Los valores MODIS sin escalar vienen multiplicados por 10000
+FACTOR_ESCALA_MODIS = 10000.0
+
+# Columna con el entero de calidad de MOD13Q1 (no las columnas _bitmask ni _Description)
+SUFIJO_CALIDAD = "_VI_Quality"
+
+# Polígono de una tarea area en la columna 'aid' del Statistics ('aid0001' es el primero de la tarea)
+PATRON_AID = re.compile(r"^aid0*(\d+)$")
+
+# Píxel muestreado en Results: 'MODIS_Tile', '<producto>_Line_Y_250m', '<producto>_Sample_X_250m'
+COLUMNA_TILE = "MODIS_Tile"
+PARTE_COLUMNA_LINEA = "Line_Y"
+PARTE_COLUMNA_MUESTRA = "Sample_X"
+
+
+class EstadisticaIncremental:
+    """
+    Media, desviación estándar, mínimo y máximo en una sola pasada (Welford).
+
+    Usa memoria constante sin importar la cantidad de valores. Permite
+    quitar un valor para reemplazar una observación repetida.
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.media = 0.0
+        self._m2 = 0.0
+        self.minimo: Optional[float] = None
+        self.maximo: Optional[float] = None
+
+    def agregar(self, valor: float) -> None:
+        self.n += 1
+        delta = valor - self.media
+        self.media += delta / self.n
+        self._m2 += delta * (valor - self.media)
+        self.minimo = valor if self.minimo is None else min(self.minimo, valor)
+        self.maximo = valor if self.maximo is None else max(self.maximo, valor)
+
+    def quitar(self, valor: float) -> None:
+        """Quita un valor agregado antes (mínimo y máximo se conservan)"""
+        if self.n <= 1:
+            self.n, self.media, self._m2 = 0, 0.0, 0.0
+            return
+        self.n -= 1
+        delta = valor - self.media
+        self.media -= delta / self.n
+        self._m2 = max(self._m2 - delta * (valor - self.media), 0.0)
+
+    @property
+    def desviacion(self) -> Optional[float]:
+        """Desviación estándar muestral (None con menos de dos valores)"""
+        if self.n < 2:
+            return None
+        return math.sqrt(self._m2 / (self.n - 1))
+
+    def como_dict(self) -> Dict:
+        return {
+            "n": self.n,
+            "promedio": self.media if self.n else None,
+            "minimo": self.minimo,
+            "maximo": self.maximo,
+            "desviacion": self.desviacion,
+        }
+
+
+class SerieIndices:
+    """
+    Serie temporal de NDVI/EVI de un punto o área.
+
+    Las observaciones se combinan por fecha en un diccionario (un punto por
+    fecha) y las estadísticas de cada índice se actualizan al agregarlas.
+    """
+
+    def __init__(
+        self,
+        identificador: str = "",
+        pixel: Optional[str] = None,
+        coordenadas: Optional[Tuple[float, float]] = None
+    ):
+        self.identificador = identificador
+        self.pixel = pixel  # Clave del píxel MOD13Q1 ('h11v09_1965_66') si el CSV la trae
+        self.coordenadas = coordenadas  # (lat, lon) del punto muestreado (Results)
+        self.puntos: Dict[str, Dict] = {}
+        self.estadisticas = {indice: EstadisticaIncremental() for indice in INDICES}
+        # Fechas de compuesto que trajo el archivo, incluidas las de NDVI de relleno o NA
+        self.fechas_recibidas: Set[str] = set()
+
+    def agregar(self, fecha: str, indice: str, valor: float) -> None:
+        self.fechas_recibidas.add(fecha)
+        punto = self.puntos.get(fecha)
+        if punto is None:
+            punto = self.puntos[fecha] = {"fecha": fecha, "calidad": "buena"}
+
+        estadistica = self.estadisticas[indice]
+        anterior = punto.get(indice)
+        if anterior is not None:
+            estadistica.quitar(anterior)
+
+        valor = round(valor, 4)
+        punto[indice] = valor
+        estadistica.agregar(valor)
+
+    def marcar_qa(self, fecha: str, qa: int) -> None:
+        """Guarda el VI_Quality sin decodificar; `aplicar_calidad_vi` lo clasifica en bloque"""
+        punto = self.puntos.get(fecha)
+        if punto is not None:
+            punto["qa"] = qa
+
+    def __len__(self) -> int:
+        return len(self.puntos)
+
+    @property
+    def fecha_inicio(self) -> Optional[date]:
+        return date.fromisoformat(min(self.puntos)) if self.puntos else None
+
+    @property
+    def fecha_fin(self) -> Optional[date]:
+        return date.fromisoformat(max(self.puntos)) if self.puntos else None
+
+    def serie(self) -> List[Dict]:
+        """Puntos ordenados por fecha"""
+        return [self.puntos[fecha] for fecha in sorted(self.puntos)]
+
+
+def valor_indice(texto: Optional[str]) -> Optional[float]:
+    """
+    Convierte el texto de una celda en un valor de índice.
+
+    Detecta la escala: valores mayores que 1 en valor absoluto vienen sin
+    escalar (enteros MODIS) y se dividen por 10000. Devuelve None para
+    celdas vacías, 'NA' y valores de relleno fuera del rango válido.
+    """
+    if not texto or texto == "NA":
+        return None
+    try:
+        valor = float(texto)
+    except ValueError:
+        return None
+    if math.isnan(valor):
+        return None
+    if abs(valor) > 1.0:
+        valor /= FACTOR_ESCALA_MODIS
+    if not RANGO_VALIDO[0] <= valor <= RANGO_VALIDO[1]:
+        return None
+    return valor
+
+
+def valor_qa(texto: Optional[str]) -> Optional[int]:
+    """Entero de VI_Quality de una celda ('4168.0' → 4168); None si está vacía"""
+    if not texto or texto == "NA":
+        return None
+    try:
+        return int(float(texto))
+    except ValueError:
+        return None
+
+
+def _indice_de_capa(nombre: str) -> Optional[str]:
+    """'MOD13Q1_061__250m_16_days_NDVI' → 'ndvi' (las columnas de calidad no cuentan)"""
+    for indice, sufijo in INDICES.items():
+        if nombre.endswith(sufijo) or f"{sufijo}_doy" in nombre:
+            return indice
+    return None
+
+
+def detectar_formato(encabezados: Optional[List[str]]) -> str:
+    """
+    Identifica el formato del CSV por sus encabezados.
+
+    Raises:
+        ValueError: Si no es un CSV Statistics ni Results de AppEEARS
+    """
+    if not encabezados:
+        raise ValueError("El archivo CSV está vacío")
+    if "Date" in encabezados and "Mean" in encabezados and ("File Name" in encabezados or "Dataset" in encabezados):
+        return FORMATO_STATISTICS
+    if "Date" in encabezados and any(_indice_de_capa(columna) for columna in encabezados):
+        return FORMATO_RESULTS
+    raise ValueError("Formato de CSV no reconocido. Use el archivo Statistics o Results de NASA AppEEARS")
+
+
+def _fecha(texto: Optional[str]) -> Optional[str]:
+    if not texto:
+        return None
+    try:
+        return date.fromisoformat(texto.strip()[:10]).isoformat()
+    except ValueError:
+        return None
+
+
+def _coordenadas(lat: Optional[str], lon: Optional[str]) -> Optional[Tuple[float, float]]:
+    try:
+        return float(lat), float(lon)
+    except (TypeError, ValueError):
+        return None
+
+
+def leer_csv_appeears(
+    lineas: Iterable[str],
+    series: Optional[Dict[str, SerieIndices]] = None
+) -> Dict[str, SerieIndices]:
+    """
+    Lee un CSV de AppEEARS fila por fila.
+
+    Agrupa por la columna 'ID' (o las coordenadas del punto si falta) en
+    Results y por 'aid' en Statistics; así un CSV de una tarea con muchas
+    parcelas se separa en una serie por parcela.
+    Pasar `series` permite acumular varios archivos en el mismo resultado.
+    En Results se guarda el VI_Quality de cada punto sin decodificar; después
+    de leer todos los archivos, `aplicar_calidad_vi` clasifica y pondera.
+
+    Args:
+        lineas: Archivo de texto abierto o cualquier iterable de líneas
+        series: Resultado previo al que se agregan las observaciones
+
+    Returns:
+        Diccionario identificador → SerieIndices
+
+    Raises:
+        ValueError: Si el formato no se reconoce
+    """
+    series = {} if series is None else series
+    reader = csv.DictReader(lineas)
+    formato = detectar_formato(reader.fieldnames)
+
+    if formato == FORMATO_RESULTS:
+        columnas = {
+            columna: _indice_de_capa(columna)
+            for columna in reader.fieldnames
+            if _indice_de_capa(columna)
+        }
+        columna_qa = next((c for c in reader.fieldnames if c.endswith(SUFIJO_CALIDAD)), None)
+        columna_linea = next((c for c in reader.fieldnames if PARTE_COLUMNA_LINEA in c), None)
+        columna_muestra = next((c for c in reader.fieldnames if PARTE_COLUMNA_MUESTRA in c), None)
+        for row in reader:
+            fecha = _fecha(row.get("Date"))
+            if fecha is None:
+                continue
+            # Sin ID, cada punto se separa por sus coordenadas
+            identificador = row.get("ID") or ",".join(filter(None, (row.get("Latitude"), row.get("Longitude"))))
+            serie = series.get(identificador)
+            if serie is None:
+                pixel = pixel_desde_csv(row.get(COLUMNA_TILE), row.get(columna_linea), row.get(columna_muestra))
+                serie = series[identificador] = SerieIndices(
+                    identificador,
+                    pixel.clave if pixel else None,
+                    _coordenadas(row.get("Latitude"), row.get("Longitude"))
+                )
+            # El compuesto cuenta como recibido aunque todos sus valores sean de relleno
+            serie.fechas_recibidas.add(fecha)
+            for columna, indice in columnas.items():
+                valor = valor_indice(row.get(columna))
+                if valor is None:
+                    continue
+                serie.agregar(fecha, indice, valor)
+            if columna_qa:
+                qa = valor_qa(row.get(columna_qa))
+                if qa is not None:
+                    serie.marcar_qa(fecha, qa)
+    else:
+        for row in reader:
+            fecha = _fecha(row.get("Date"))
+            indice = _indice_de_capa(row.get("Dataset") or "") or _indice_de_capa(row.get("File Name") or "")
+            valor = valor_indice(row.get("Mean"))
+            if fecha is None or indice is None:
+                continue
+            identificador = row.get("aid") or ""
+            serie = series.get(identificador)
+            if serie is None:
+                serie = series[identificador] = SerieIndices(identificador)
+            serie.fechas_recibidas.add(fecha)
+            if valor is not None:
+                serie.agregar(fecha, indice, valor)
+
+    return series
+
+
+def series_por_parcela(series: Dict[str, SerieIndices]) -> Dict[int, SerieIndices]:
+    """Series de un CSV Point Sample por ID de parcela ('parcela_4' → 4)"""
+    resultado = {}
+    for identificador, serie in series.items():
+        parcela_id = parcela_id_desde_coordenada(identificador)
+        if parcela_id is not None:
+            resultado[parcela_id] = serie
+    return resultado
+
+
+def numero_aid(identificador: str) -> Optional[int]:
+    """'aid0003' → 3; None si el identificador no es un polígono del Statistics"""
+    coincidencia = PATRON_AID.match(identificador or "")
+    return int(coincidencia.group(1)) if coincidencia else None
+
+
+def series_por_aid(series: Dict[str, SerieIndices], orden: List[int]) -> Dict[str, SerieIndices]:
+    """
+    Renombra las series de un CSV Statistics con el ID de su parcela.
+
+    Args:
+        series: Series por 'aid' (`leer_csv_appeears` de un Statistics)
+        orden: IDs de parcela en el orden de la tarea area
+
+    Returns:
+        Diccionario 'parcela_{id}' → SerieIndices (los 'aid' fuera del orden se conservan)
+    """
+    resultado = {}
+    for identificador, serie in series.items():
+        numero = numero_aid(identificador)
+        if numero is not None and 1 <= numero <= len(orden):
+            identificador = serie.identificador = id_coordenada(orden[numero - 1])
+        resultado[identificador] = serie
+    return resultado
+
+
+def repartir_por_pixel(
+    series: Dict[int, SerieIndices],
+    pixeles: Dict[int, Optional[str]]
+) -> Dict[int, SerieIndices]:
+    """
+    Completa las parcelas sin serie propia con la serie de su píxel MOD13Q1.
+
+    Las tareas point piden una coordenada por píxel, con el ID de la primera
+    parcela del píxel; las demás parcelas del píxel reciben esa misma serie.
+
+    Args:
+        series: parcela_id → serie (`series_por_parcela`)
+        pixeles: parcela_id → clave del píxel de cada parcela esperada
+    """
+    por_pixel: Dict[str, SerieIndices] = {}
+    for parcela_id, serie in series.items():
+        clave = serie.pixel or pixeles.get(parcela_id)
+        if clave:
+            por_pixel.setdefault(clave, serie)
+
+    resultado = dict(series)
+    for parcela_id, clave in pixeles.items():
+        if parcela_id not in resultado and clave in por_pixel:
+            resultado[parcela_id] = por_pixel[clave]
+    return resultado
+
+
+def serie_para_parcela(
+    series: Dict[str, SerieIndices],
+    parcela_id: int,
+    pixel: Optional[str] = None
+) -> Optional[SerieIndices]:
+    """
+    Serie de una parcela dentro de un CSV subido.
+
+    Usa la coordenada 'parcela_{id}' si está; si no, la serie del mismo
+    píxel MOD13Q1 (columnas MODIS_Tile, Line_Y y Sample_X). Si el archivo
+    trae una sola serie (Statistics o un punto sin ID de parcela), esa es
+    la de la parcela.
+    """
+    serie = series_por_parcela(series).get(parcela_id)
+    if serie is None and pixel:
+        serie = next((s for s in series.values() if s.pixel == pixel), None)
+    if serie is None and len(series) == 1:
+        serie = next(iter(series.values()))
+    return serie
+
+
+@contextmanager
+def abrir_texto(binario: BinaryIO) -> Iterator[TextIO]:
+    """
+    Envuelve un archivo binario (por ejemplo `UploadFile.file`) para leerlo
+    como texto línea por línea, sin cargarlo completo en memoria.
+    """
+    texto = io.TextIOWrapper(binario, encoding="utf-8-sig", newline="")
+    try:
+        yield texto
+    finally:
+        # No cerrar el archivo subyacente: lo administra quien lo abrió
+        texto.detach()
@@ -0,0 +1,331 @@
+"""
+Detección de Cambios Satelitales
+Prueba de quiebre vectorizada sobre las series NDVI de todas las parcelas
+
+Uso (pasada nocturna):
+    python -m src.services.deteccion_cambios
+"""
+
+import argparse
+import logging
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+
+from src.models.calculo_satelital import CalculoSatelital
+from src.models.estado_satelital_parcela import EstadoSatelitalParcela
+from src.models.observacion_satelital import ObservacionSatelital
+from src.services.observaciones_service import CAPAS_MOD13Q1, PRODUCTO_MOD13Q1
+from src.services.suavizado_series import matriz_desde_puntos
+
+logger = logging.getLogger(__name__)
+
+# Compuestos válidos mínimos a cada lado del quiebre (4 × 16 días ≈ 2 meses)
+MIN_SEGMENTO = 4
+
+# Umbrales del quiebre: significancia (t) y diferencia de medias de NDVI
+T_MINIMO = 4.0
+CAMBIO_MINIMO = 0.10
+
+# Caída que se informa como deforestación si además el NDVI queda bajo el de un bosque
+CAIDA_DEFORESTACION = 0.20
+NDVI_SIN_BOSQUE = 0.5
+
+# Piso del ruido entre compuestos: evita t enormes en series casi constantes
+RUIDO_MINIMO = 0.02
+
+SIN_CAMBIOS = "Sin cambios"
+DEFORESTACION = "Deforestación detectada"
+DEGRADACION = "Degradación de la vegetación"
+RECUPERACION = "Recuperación de la vegetación"
+DATOS_INSUFICIENTES = "Datos insuficientes"
+
+
+def detectar_quiebres(valores: np.ndarray, min_segmento: int = MIN_SEGMENTO) -> Dict[str, np.ndarray]:
+    """
+    Quiebre de media más significativo de cada fila de una matriz parcelas × fechas.
+
+    Para cada fila y cada corte posible compara la media antes y después
+    con un estadístico t (varianza combinada de los dos tramos). Todas las
+    filas y cortes se evalúan a la vez con sumas acumuladas.
+
+    Args:
+        valores: Matriz (parcelas, fechas) con NaN en las observaciones no utilizables
+        min_segmento: Observaciones válidas mínimas a cada lado del corte
+
+    Returns:
+        Arreglos por fila: columna (primera fecha después del quiebre, -1 si
+        no hay corte posible), antes, despues, t y n (observaciones válidas)
+    """
+    filas, columnas = valores.shape
+    validos = ~np.isnan(valores)
+    n_total = validos.sum(axis=1)
+    resultado = {
+        "columna": np.full(filas, -1),
+        "antes": np.full(filas, np.nan),
+        "despues": np.full(filas, np.nan),
+        "t": np.zeros(filas),
+        "n": n_total,
+    }
+    if columnas < 2:
+        return resultado
+
+    x = np.where(validos, valores, 0.0)
+    n = np.cumsum(validos, axis=1)[:, :-1]
+    suma = np.cumsum(x, axis=1)
+    suma2 = np.cumsum(x * x, axis=1)
+
+    # Corte después de la columna j: antes = [0..j], después = [j+1..]
+    n1, n2 = n, n_total[:, None] - n
+    with np.errstate(invalid="ignore", divide="ignore"):
+        antes = suma[:, :-1] / n1
+        despues = (suma[:, -1:] - suma[:, :-1]) / n2
+        dentro = suma2[:, -1:] - n1 * antes ** 2 - n2 * despues ** 2
+        varianza = np.maximum(dentro / (n_total[:, None] - 2), RUIDO_MINIMO ** 2)
+        t = (despues - antes) / np.sqrt(varianza * (1 / n1 + 1 / n2))
+
+    # Solo cortes con tramos suficientes y justo antes de una observación válida
+    posibles = (n1 >= min_segmento) & (n2 >= min_segmento) & validos[:, 1:]
+    t = np.where(posibles, t, 0.0)
+
+    j = np.argmax(np.abs(t), axis=1)
+    fila = np.arange(filas)
+    hay = posibles[fila, j]
+    resultado["columna"] = np.where(hay, j + 1, -1)
+    resultado["antes"] = np.where(hay, antes[fila, j], np.nan)
+    resultado["despues"] = np.where(hay, despues[fila, j], np.nan)
+    resultado["t"] = np.where(hay, t[fila, j], 0.0)
+    return resultado
+
+
+def clasificar_cambio(antes: float, despues: float, t: float, fecha: Optional[str]) -> Tuple[str, Optional[str]]:
+    """
+    Etiqueta y texto de alerta de un quiebre.
+
+    Returns:
+        (cambio_detectado, alerta); la alerta es None si no hay pérdida de vegetación
+    """
+    if fecha is None:
+        return DATOS_INSUFICIENTES, None
+
+    diferencia = despues - antes
+    if abs(t) < T_MINIMO or abs(diferencia) < CAMBIO_MINIMO:
+        return SIN_CAMBIOS, None
+    if diferencia > 0:
+        return RECUPERACION, None
+
+    cambio = DEGRADACION
+    if -diferencia >= CAIDA_DEFORESTACION and despues < NDVI_SIN_BOSQUE:
+        cambio = DEFORESTACION
+    porcentaje = diferencia / antes * 100 if antes else 0.0
+    alerta = (
+        f"{cambio}: el NDVI bajó de {antes:.2f} a {despues:.2f} ({porcentaje:.0f} %) "
+        f"a partir del compuesto del {fecha} (t = {abs(t):.1f})"
+    )
+    return cambio, alerta
+
+
+class DeteccionCambiosService:
+    """
+    Detección de cambios sobre las observaciones NDVI guardadas.
+
+    Cada pasada evalúa solo las parcelas con compuestos nuevos desde la
+    última evaluación (según `estado_satelital_parcela`), con una consulta
+    para saber cuáles son, una para leer sus series y la prueba de quiebre
+    en bloque sobre la matriz parcelas × fechas.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _resumen_observaciones(self, parcela_ids: Optional[List[int]], producto: str) -> Dict[int, Tuple[date, int]]:
+        """parcela_id → (fecha del último compuesto NDVI, cantidad de compuestos)"""
+        query = self.db.query(
+            ObservacionSatelital.parcela_id,
+            func.max(ObservacionSatelital.fecha),
+            func.count()
+        ).filter(
+            ObservacionSatelital.producto == producto,
+            ObservacionSatelital.capa == CAPAS_MOD13Q1["ndvi"]
+        )
+        if parcela_ids:
+            query = query.filter(ObservacionSatelital.parcela_id.in_(parcela_ids))
+        return {
+            parcela_id: (ultima, cantidad)
+            for parcela_id, ultima, cantidad in query.group_by(ObservacionSatelital.parcela_id)
+        }
+
+    def _series(self, parcela_ids: Optional[List[int]], producto: str) -> Dict[int, List[Dict]]:
+        query = self.db.query(
+            ObservacionSatelital.parcela_id,
+            ObservacionSatelital.fecha,
+            ObservacionSatelital.valor,
+            ObservacionSatelital.calidad
+        ).filter(
+            ObservacionSatelital.producto == producto,
+            ObservacionSatelital.capa == CAPAS_MOD13Q1["ndvi"]
+        )
+        if parcela_ids is not None:
+            query = query.filter(ObservacionSatelital.parcela_id.in_(parcela_ids))
+
+        series: Dict[int, List[Dict]] = {}
+        for parcela_id, fecha, valor, calidad in query.order_by(
+            ObservacionSatelital.parcela_id, ObservacionSatelital.fecha
+        ):
+            series.setdefault(parcela_id, []).append(
+                {"fecha": fecha.isoformat(), "valor": valor, "calidad": calidad}
+            )
+        return series
+
+    def evaluar(
+        self,
+        parcela_ids: Optional[List[int]] = None,
+        forzar: bool = False,
+        producto: str = PRODUCTO_MOD13Q1
+    ) -> Dict:
+        """
+        Evalúa las parcelas con compuestos nuevos y escribe el resultado en
+        `estado_satelital_parcela` y en el último cálculo completado de cada
+        parcela (`cambio_detectado`, `alerta_generada`). No hace commit.
+
+        Args:
+            parcela_ids: Parcelas a considerar (default: todas las que tienen observaciones)
+            forzar: Reevaluar aunque no haya compuestos nuevos
+            producto: Observaciones a evaluar (muestras point o medias zonales area)
+
+        Returns:
+            {"parcelas_evaluadas": ..., "con_cambios": ..., "alertas": [...]}
+        """
+        resumen = self._resumen_observaciones(parcela_ids, producto)
+        estados = {
+            estado.parcela_id: estado
+            for estado in self.db.query(EstadoSatelitalParcela).filter(
+                EstadoSatelitalParcela.parcela_id.in_(list(resumen))
+            )
+        }
+
+        pendientes = [
+            parcela_id
+            for parcela_id, (ultima, cantidad) in resumen.items()
+            if forzar
+            or parcela_id not in estados
+            or estados[parcela_id].ultima_fecha_evaluada != ultima
+            or estados[parcela_id].observaciones_evaluadas != cantidad
+        ]
+        resultado = {"parcelas_evaluadas": len(pendientes), "con_cambios": 0, "alertas": []}
+        if not pendientes:
+            return resultado
+
+        # Sin filtro cuando se evalúa todo el proyecto (evita un IN con miles de IDs)
+        todas = parcela_ids is None and len(pendientes) == len(resumen)
+        series = self._series(None if todas else pendientes, producto)
+
+        claves, fechas, valores, pesos = matriz_desde_puntos(series, "valor")
+        valores[pesos == 0] = np.nan  # nubosidad, agua y nieve no cuentan
+        quiebres = detectar_quiebres(valores)
+
+        ultimos_calculos = self._ultimos_calculos(claves, producto)
+        for i, parcela_id in enumerate(claves):
+            columna = int(quiebres["columna"][i])
+            fecha = fechas[columna] if columna >= 0 else None
+            antes = float(quiebres["antes"][i])
+            despues = float(quiebres["despues"][i])
+            t = float(quiebres["t"][i])
+            cambio, alerta = clasificar_cambio(antes, despues, t, fecha)
+
+            estado = estados.get(parcela_id)
+            if estado is None:
+                estado = EstadoSatelitalParcela(parcela_id=parcela_id)
+                self.db.add(estado)
+            estado.ultima_fecha_evaluada, estado.observaciones_evaluadas = resumen[parcela_id]
+            estado.cambio_detectado = cambio
+            estado.alerta = alerta
+            estado.fecha_cambio = date.fromisoformat(fecha) if fecha else None
+            estado.ndvi_antes = round(antes, 4) if fecha else None
+            estado.ndvi_despues = round(despues, 4) if fecha else None
+            estado.estadistico_cambio = round(t, 2) if fecha else None
+            estado.evaluado_en = func.now()
+
+            calculo = ultimos_calculos.get(parcela_id)
+            if calculo is not None:
+                calculo.cambio_detectado = cambio
+                calculo.alerta_generada = alerta
+
+            if alerta:
+                resultado["con_cambios"] += 1
+                resultado["alertas"].append({
+                    "parcela_id": parcela_id,
+                    "cambio_detectado": cambio,
+                    "fecha_cambio": fecha,
+                    "alerta": alerta,
+                })
+        return resultado
+
+    def _ultimos_calculos(self, parcela_ids: List[int], producto: str) -> Dict[int, CalculoSatelital]:
+        """Último cálculo completado de cada parcela con ese producto, en una consulta"""
+        mismo_producto = CalculoSatelital.producto == producto
+        if producto == PRODUCTO_MOD13Q1:
+            # Los cálculos sin producto son de muestras point
+            mismo_producto = or_(mismo_producto, CalculoSatelital.producto.is_(None))
+        ultimos = self.db.query(func.max(CalculoSatelital.id)).filter(
+            CalculoSatelital.parcela_id.in_(parcela_ids),
+            CalculoSatelital.estado_procesamiento == "completado",
+            mismo_producto
+        ).group_by(CalculoSatelital.parcela_id)
+        return {
+            calculo.parcela_id: calculo
+            for calculo in self.db.query(CalculoSatelital).filter(CalculoSatelital.id.in_(ultimos.scalar_subquery()))
+        }
+
+    def listar(self, solo_cambios: bool = True) -> List[Dict]:
+        """Estado de la detección por parcela (por defecto solo las que tienen alerta)"""
+        query = self.db.query(EstadoSatelitalParcela)
+        if solo_cambios:
+            query = query.filter(EstadoSatelitalParcela.alerta.isnot(None))
+        return [
+            {
+                "parcela_id": estado.parcela_id,
+                "cambio_detectado": estado.cambio_detectado,
+                "alerta": estado.alerta,
+                "fecha_cambio": estado.fecha_cambio,
+                "ndvi_antes": estado.ndvi_antes,
+                "ndvi_despues": estado.ndvi_despues,
+                "estadistico_cambio": estado.estadistico_cambio,
+                "ultima_fecha_evaluada": estado.ultima_fecha_evaluada,
+                "evaluado_en": estado.evaluado_en,
+            }
+            for estado in query.order_by(EstadoSatelitalParcela.parcela_id)
+        ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Detección de cambios sobre las series NDVI de todas las parcelas")
+    parser.add_argument("--forzar", action="store_true", help="Reevaluar también las parcelas sin compuestos nuevos")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    # Importación diferida: registra todos los modelos antes de consultar
+    from config.database import SessionLocal
+    import src.models  # noqa: F401
+
+    db = SessionLocal()
+    try:
+        resultado = DeteccionCambiosService(db).evaluar(forzar=args.forzar)
+        db.commit()
+    finally:
+        db.close()
+
+    logger.info(
+        f"Detección de cambios: {resultado['parcelas_evaluadas']} parcelas evaluadas, "
+        f"{resultado['con_cambios']} con alertas"
+    )
+    for alerta in resultado["alertas"]:
+        logger.info(f"Parcela {alerta['parcela_id']}: {alerta['alerta']}")
+
+
+if __name__ == "__main__":
+    main()
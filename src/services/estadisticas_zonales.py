@@ -0,0 +1,284 @@
+"""
+Estadísticas Zonales sobre GeoTIFF de AppEEARS
+Lee por ventanas los rásters de las tareas area y resume cada polígono por fecha
+"""
+
+import math
+import re
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import shapely
+from shapely.geometry import Polygon
+
+from src.services.calidad_modis import PESOS_CALIDAD, clasificar_vi_quality
+from src.services.csv_appeears import FACTOR_ESCALA_MODIS, RANGO_VALIDO, SerieIndices
+from src.services.nasa_appeears_service import id_coordenada
+
+# Fracción del polígono con píxeles válidos para considerar la fecha buena o aceptable
+FRACCION_BUENA = 0.8
+FRACCION_ACEPTABLE = 0.5
+
+# Capa del nombre del GeoTIFF → índice ('qa' es la capa VI_Quality)
+CAPAS_RASTER = {
+    "_250m_16_days_NDVI": "ndvi",
+    "_250m_16_days_EVI": "evi",
+    "_250m_16_days_VI_Quality": "qa",
+}
+
+# MOD13Q1.061__250m_16_days_NDVI_doy2024001000000_aid0001.tif
+PATRON_ARCHIVO = re.compile(
+    r"(?P<capa>_250m_16_days_[A-Za-z_]+?)_doy(?P<anio>\d{4})(?P<dia>\d{3})\d*(?:_aid(?P<aid>\d+))?\.tif$"
+)
+
+
+def _rasterio():
+    try:
+        import rasterio
+        from rasterio.windows import Window
+    except ImportError:
+        raise ImportError(
+            "rasterio no está instalado. Instálalo con: pip install rasterio"
+        )
+    return rasterio, Window
+
+
+def describir_archivo(nombre: str) -> Optional[Dict]:
+    """
+    Capa, fecha y número de polígono de un GeoTIFF de AppEEARS.
+
+    Returns:
+        {'indice': 'ndvi', 'fecha': '2024-01-01', 'aid': 1} o None si no es una capa conocida
+    """
+    coincidencia = PATRON_ARCHIVO.search(nombre)
+    if not coincidencia:
+        return None
+    indice = CAPAS_RASTER.get(coincidencia["capa"])
+    if indice is None:
+        return None
+    fecha = date(int(coincidencia["anio"]), 1, 1) + timedelta(days=int(coincidencia["dia"]) - 1)
+    return {
+        "indice": indice,
+        "fecha": fecha.isoformat(),
+        "aid": int(coincidencia["aid"]) if coincidencia["aid"] else None,
+    }
+
+
+class MascaraParcela:
+    """
+    Polígono de una parcela rasterizado sobre la grilla de un GeoTIFF.
+
+    Guarda la ventana (caja envolvente en píxeles) y el peso de cada píxel:
+    la fracción de su superficie dentro del polígono. Las parcelas suelen
+    ser más chicas que un píxel MODIS de 250 m, así que se usa el área de
+    intersección exacta y no el centro del píxel. Se calcula una vez por
+    grilla y se reutiliza para todas las fechas y capas.
+    """
+
+    def __init__(self, col: int, fila: int, pesos: np.ndarray):
+        self.col = col
+        self.fila = fila
+        self.pesos = pesos
+
+    @property
+    def alto(self) -> int:
+        return self.pesos.shape[0]
+
+    @property
+    def ancho(self) -> int:
+        return self.pesos.shape[1]
+
+
+def rasterizar_parcela(
+    vertices: List[List[float]],
+    transform,
+    alto_raster: int,
+    ancho_raster: int
+) -> Optional[MascaraParcela]:
+    """
+    Rasteriza los vértices [[lat, lon], ...] sobre una grilla geográfica.
+
+    Args:
+        transform: Transformación afín del ráster (a, b, c, d, e, f)
+
+    Returns:
+        La máscara o None si el polígono no cae dentro del ráster
+    """
+    a, _, c, _, e, f = tuple(transform)[:6]
+    poligono = Polygon([(lon, lat) for lat, lon in vertices])
+    minx, miny, maxx, maxy = poligono.bounds
+
+    col0 = max(int(math.floor((minx - c) / a)), 0)
+    col1 = min(int(math.ceil((maxx - c) / a)), ancho_raster)
+    fila0 = max(int(math.floor((maxy - f) / e)), 0)
+    fila1 = min(int(math.ceil((miny - f) / e)), alto_raster)
+    if col1 <= col0 or fila1 <= fila0:
+        return None
+
+    # Un rectángulo por píxel de la ventana, intersectado con el polígono en una sola llamada
+    xs = c + np.arange(col0, col1 + 1) * a
+    ys = f + np.arange(fila0, fila1 + 1) * e
+    izquierda, arriba = np.meshgrid(xs[:-1], ys[:-1])
+    derecha, abajo = np.meshgrid(xs[1:], ys[1:])
+    pixeles = shapely.box(izquierda, abajo, derecha, arriba)
+    pesos = (shapely.area(shapely.intersection(pixeles, poligono)) / abs(a * e)).astype(np.float32)
+    if not pesos.any():
+        return None
+    return MascaraParcela(col0, fila0, pesos)
+
+
+def _valores_indice(datos: np.ndarray, nodata) -> np.ndarray:
+    """Enteros MODIS → índice escalado, NaN en relleno y fuera de rango (vectorizado)"""
+    valores = datos.astype(np.float32)
+    if nodata is not None:
+        valores[datos == nodata] = np.nan
+    valores = np.where(np.abs(valores) > 1.0, valores / FACTOR_ESCALA_MODIS, valores)
+    valores[(valores < RANGO_VALIDO[0]) | (valores > RANGO_VALIDO[1])] = np.nan
+    return valores
+
+
+def estadisticas_pila(valores: np.ndarray, pesos: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Estadísticas ponderadas de una pila (fechas, alto, ancho) en bloque.
+
+    Args:
+        valores: Índice por píxel, NaN donde no es válido
+        pesos: Peso por píxel (cobertura del polígono × calidad), misma forma
+
+    Returns:
+        Arreglos por fecha: n (píxeles válidos), peso (suma de pesos
+        válidos), media, desviacion, minimo y maximo
+    """
+    usar = ~np.isnan(valores) & (pesos > 0)
+    w = np.where(usar, pesos, 0.0)
+    x = np.where(usar, valores, 0.0)
+
+    suma_pesos = w.sum(axis=(1, 2))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        media = (w * x).sum(axis=(1, 2)) / suma_pesos
+        varianza = (w * (x - media[:, None, None]) ** 2).sum(axis=(1, 2)) / suma_pesos
+    return {
+        "n": usar.sum(axis=(1, 2)),
+        "peso": suma_pesos,
+        "media": media,
+        "desviacion": np.sqrt(varianza),
+        "minimo": np.where(usar, valores, np.inf).min(axis=(1, 2)),
+        "maximo": np.where(usar, valores, -np.inf).max(axis=(1, 2)),
+    }
+
+
+def calidad_por_fraccion(fraccion: float) -> str:
+    """Calidad de una fecha según la fracción del polígono con píxeles utilizables"""
+    if fraccion >= FRACCION_BUENA:
+        return "buena"
+    if fraccion >= FRACCION_ACEPTABLE:
+        return "aceptable"
+    return "nubosidad"
+
+
+class EstadisticasZonales:
+    """
+    Resume los GeoTIFF de una tarea area por parcela y fecha.
+
+    Cada archivo se abre una vez y solo se leen las ventanas de las
+    parcelas (lectura por bloques de GDAL, sin cargar el ráster completo).
+    Las ventanas de un mismo polígono se apilan por fecha y se resumen en
+    una sola operación vectorizada; la capa VI_Quality, si viene, pondera
+    cada píxel por su calidad.
+    """
+
+    def __init__(self, parcelas: Dict[int, List[List[float]]], orden: Optional[List[int]] = None):
+        """
+        Args:
+            parcelas: parcela_id → vértices [[lat, lon], ...]
+            orden: IDs en el orden de la tarea (aid0001 es el primero)
+        """
+        self.parcelas = parcelas
+        self.orden = orden or list(parcelas)
+        self._mascaras: Dict[Tuple, Optional[MascaraParcela]] = {}
+
+    def _mascara(self, parcela_id: int, transform, alto: int, ancho: int) -> Optional[MascaraParcela]:
+        clave = (parcela_id, tuple(transform)[:6], alto, ancho)
+        if clave not in self._mascaras:
+            self._mascaras[clave] = rasterizar_parcela(self.parcelas[parcela_id], transform, alto, ancho)
+        return self._mascaras[clave]
+
+    def _parcelas_de_archivo(self, aid: Optional[int]) -> List[int]:
+        if aid is None:
+            return list(self.parcelas)
+        if 1 <= aid <= len(self.orden) and self.orden[aid - 1] in self.parcelas:
+            return [self.orden[aid - 1]]
+        return []
+
+    def leer(self, archivos: Iterable[Tuple[str, str]]) -> Dict[str, SerieIndices]:
+        """
+        Lee los GeoTIFF y arma una serie por parcela.
+
+        Args:
+            archivos: Pares (nombre en el bundle, ruta local); la capa, la
+                fecha y el polígono salen del nombre
+
+        Returns:
+            Diccionario 'parcela_{id}' → SerieIndices (misma forma que el CSV Point Sample)
+        """
+        rasterio, Window = _rasterio()
+
+        # (parcela, índice) → fecha → ventana leída; la pila se arma por parcela
+        ventanas: Dict[Tuple[int, str], Dict[str, np.ndarray]] = defaultdict(dict)
+        mascaras: Dict[int, MascaraParcela] = {}
+
+        for nombre, ruta in archivos:
+            info = describir_archivo(nombre)
+            if info is None:
+                continue
+            with rasterio.open(ruta) as raster:
+                for parcela_id in self._parcelas_de_archivo(info["aid"]):
+                    mascara = self._mascara(parcela_id, raster.transform, raster.height, raster.width)
+                    if mascara is None:
+                        continue
+                    datos = raster.read(1, window=Window(mascara.col, mascara.fila, mascara.ancho, mascara.alto))
+                    if info["indice"] == "qa":
+                        ventanas[(parcela_id, "qa")][info["fecha"]] = datos
+                    else:
+                        ventanas[(parcela_id, info["indice"])][info["fecha"]] = _valores_indice(datos, raster.nodata)
+                    mascaras[parcela_id] = mascara
+
+        series: Dict[str, SerieIndices] = {}
+        for parcela_id, mascara in mascaras.items():
+            serie = series[id_coordenada(parcela_id)] = SerieIndices(id_coordenada(parcela_id))
+            calidad_qa = ventanas.get((parcela_id, "qa"), {})
+
+            for indice in ("ndvi", "evi"):
+                por_fecha = ventanas.get((parcela_id, indice))
+                if not por_fecha:
+                    continue
+                fechas = sorted(por_fecha)
+                serie.fechas_recibidas.update(fechas)
+                valores = np.stack([por_fecha[fecha] for fecha in fechas])
+                cobertura = np.broadcast_to(mascara.pesos, valores.shape)
+                pesos = cobertura.copy()
+                for k, fecha in enumerate(fechas):
+                    if fecha in calidad_qa:
+                        pesos[k] *= PESOS_CALIDAD[clasificar_vi_quality(calidad_qa[fecha])]
+
+                resumen = estadisticas_pila(valores, pesos)
+                fraccion = resumen["peso"] / float(mascara.pesos.sum())
+                # Las fechas sin ningún píxel utilizable se guardan sin ponderar
+                # y marcadas como nubosidad, igual que los puntos nublados del CSV
+                sin_ponderar = estadisticas_pila(valores, cobertura) if (resumen["n"] == 0).any() else resumen
+
+                for k, fecha in enumerate(fechas):
+                    origen = resumen if resumen["n"][k] else sin_ponderar
+                    if origen["n"][k] == 0:
+                        continue
+                    serie.agregar(fecha, indice, float(origen["media"][k]))
+                    punto = serie.puntos[fecha]
+                    punto[f"{indice}_std"] = round(float(origen["desviacion"][k]), 4)
+                    punto[f"{indice}_min"] = round(float(origen["minimo"][k]), 4)
+                    punto[f"{indice}_max"] = round(float(origen["maximo"][k]), 4)
+                    punto[f"{indice}_pixeles"] = int(resumen["n"][k])
+                    if indice == "ndvi":
+                        punto["calidad"] = calidad_por_fraccion(float(fraccion[k]))
+        return series
@@ -0,0 +1,164 @@
+"""
+Huella de Entradas de Cálculo
+Resume en una consulta el estado de las mediciones de una parcela para reutilizar resultados
+"""
+
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from sqlalchemy import Float, cast, func, literal, null, select, union_all
+from sqlalchemy.orm import Session
+
+from src.models.arbol import Arbol
+from src.models.calculo import CalculoBiomasa
+from src.models.especie import Especie
+from src.models.herbaceas import Herbaceas
+from src.models.necromasa import Necromasa
+from src.models.parcela import Parcela
+from src.services.modelos_alometricos import obtener_modelo
+from src.utils.constants import FACTOR_RAICES
+
+
+# Columnas de cada fila del resumen (una fila por componente)
+COLUMNAS_RESUMEN = ("componente", "cantidad", "suma_id", "version", "suma_1", "suma_2", "suma_3")
+
+
+def _fila_componente(nombre: str, modelo, parcela_id: int, *sumas):
+    """
+    Fila del resumen para una tabla de mediciones.
+
+    Combina conteo, suma de IDs (detecta altas y bajas), última versión
+    (detecta ediciones) y la suma de los valores medidos (detecta ediciones
+    dentro del mismo segundo que no mueven el timestamp).
+    """
+    columnas_suma = [cast(func.sum(suma), Float) for suma in sumas]
+    columnas_suma += [cast(null(), Float)] * (3 - len(columnas_suma))
+    return select(
+        literal(nombre).label("componente"),
+        func.count(modelo.id).label("cantidad"),
+        func.coalesce(func.sum(modelo.id), 0).label("suma_id"),
+        func.max(func.coalesce(modelo.updated_at, modelo.created_at)).label("version"),
+        *(columna.label(f"suma_{i}") for i, columna in enumerate(columnas_suma, start=1))
+    ).where(modelo.parcela_id == parcela_id)
+
+
+def consulta_resumen_componentes(parcela_id: int):
+    """
+    Resumen de todas las entradas del cálculo en una sola consulta (UNION ALL).
+
+    Filas:
+    - parcela: cantidad = 1 si la parcela existe
+    - arboles: sumas de DAP, altura y especie_id
+    - especies: última versión y suma de densidades de las especies de los árboles
+    - necromasa / herbaceas: suma_1 = peso seco total (kg)
+    """
+    parcela = select(
+        literal("parcela").label("componente"),
+        func.count(Parcela.id).label("cantidad"),
+        func.coalesce(func.sum(Parcela.id), 0).label("suma_id"),
+        func.max(func.coalesce(Parcela.updated_at, Parcela.created_at)).label("version"),
+        cast(null(), Float).label("suma_1"),
+        cast(null(), Float).label("suma_2"),
+        cast(null(), Float).label("suma_3")
+    ).where(Parcela.id == parcela_id)
+
+    especies = select(
+        literal("especies").label("componente"),
+        func.count(Especie.id).label("cantidad"),
+        func.coalesce(func.sum(Especie.id), 0).label("suma_id"),
+        func.max(func.coalesce(Especie.updated_at, Especie.created_at)).label("version"),
+        cast(func.sum(func.coalesce(Especie.densidad_madera, 0.0)), Float).label("suma_1"),
+        cast(null(), Float).label("suma_2"),
+        cast(null(), Float).label("suma_3")
+    ).select_from(Arbol).join(Especie, Arbol.especie_id == Especie.id).where(
+        Arbol.parcela_id == parcela_id
+    )
+
+    return union_all(
+        parcela,
+        _fila_componente(
+            "arboles", Arbol, parcela_id,
+            Arbol.dap, func.coalesce(Arbol.altura, 0.0), func.coalesce(Arbol.especie_id, 0)
+        ),
+        especies,
+        _fila_componente("necromasa", Necromasa, parcela_id, func.coalesce(Necromasa.peso_seco, 0.0)),
+        _fila_componente("herbaceas", Herbaceas, parcela_id, func.coalesce(Herbaceas.peso_seco, 0.0)),
+    )
+
+
+def cargar_resumen_componentes(db: Session, parcela_id: int) -> Dict[str, Dict]:
+    """
+    Ejecuta el resumen de componentes (una consulta).
+
+    Returns:
+        Diccionario componente → fila (como diccionario)
+    """
+    filas = db.execute(consulta_resumen_componentes(parcela_id)).mappings().all()
+    return {fila["componente"]: dict(fila) for fila in filas}
+
+
+def calcular_huella(resumen: Dict[str, Dict], modelo: str, factor_carbono: float) -> str:
+    """
+    Huella SHA-256 de las entradas de un cálculo.
+
+    Incluye los coeficientes del modelo y el factor de raíces, así que un
+    cambio en la definición del modelo también invalida los resultados.
+
+    Args:
+        resumen: Resultado de `cargar_resumen_componentes`
+        modelo: Nombre o alias del modelo alométrico
+        factor_carbono: Factor de carbono solicitado
+
+    Returns:
+        Huella hexadecimal de 64 caracteres
+    """
+    modelo_alometrico = obtener_modelo(modelo)
+    partes = (
+        tuple(
+            tuple(str(resumen[componente][columna]) for columna in COLUMNAS_RESUMEN)
+            for componente in sorted(resumen)
+        ),
+        modelo_alometrico.nombre,
+        tuple(sorted(modelo_alometrico.coeficientes.items())),
+        repr(float(factor_carbono)),
+        repr(FACTOR_RAICES),
+    )
+    return hashlib.sha256(repr(partes).encode("utf-8")).hexdigest()
+
+
+def buscar_calculo(db: Session, parcela_id: int, huella: str) -> Optional[CalculoBiomasa]:
+    """Resultado ya guardado para la misma huella, si existe"""
+    return db.query(CalculoBiomasa).filter(
+        CalculoBiomasa.parcela_id == parcela_id,
+        CalculoBiomasa.huella_entrada == huella
+    ).first()
+
+
+# Un candado por solicitud idéntica en curso dentro del proceso
+_candados: Dict[tuple, list] = {}
+_candados_guardia = threading.Lock()
+
+
+@contextmanager
+def calculo_exclusivo(*clave):
+    """
+    Serializa las solicitudes idénticas dentro del proceso.
+
+    La primera calcula y guarda; las demás esperan y encuentran el
+    resultado ya guardado. Entre procesos distintos la unicidad de
+    (parcela_id, huella_entrada) cumple el mismo papel.
+    """
+    with _candados_guardia:
+        entrada = _candados.setdefault(clave, [threading.Lock(), 0])
+        entrada[1] += 1
+
+    try:
+        with entrada[0]:
+            yield
+    finally:
+        with _candados_guardia:
+            entrada[1] -= 1
+            if entrada[1] == 0:
+                del _candados[clave]
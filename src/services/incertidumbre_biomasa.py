@@ -0,0 +1,239 @@
+"""
+Propagación de incertidumbre para biomasa y carbono
+Simulación Monte Carlo vectorizada sobre matrices (árboles × simulaciones)
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Optional, Sequence, List
+
+import numpy as np
+
+from src.services.biomasa_calculator import BiomasaCalculator
+from src.services.modelos_alometricos import obtener_modelo
+from src.utils.constants import (
+    FACTOR_CARBONO,
+    AREA_PARCELA_HA,
+    FACTOR_RAICES,
+    N_SIMULACIONES_DEFECTO,
+    NIVEL_CONFIANZA_DEFECTO,
+    ERROR_DAP_PENDIENTE,
+    ERROR_DAP_INTERCEPTO,
+    ERROR_ALTURA_RELATIVO,
+    ERROR_ALTURA_ESTIMADA_RSE,
+    ERROR_DENSIDAD_RELATIVO,
+    ERROR_DENSIDAD_DESCONOCIDA_RELATIVO,
+)
+
+# Tamaño máximo de cada bloque (árboles × simulaciones) para acotar memoria
+ELEMENTOS_POR_BLOQUE = 2_000_000
+
+# Por debajo de este tamaño no vale la pena repartir entre procesos
+MIN_ELEMENTOS_PARALELO = 8_000_000
+
+
+def _simular_bloque(
+    dap: np.ndarray,
+    altura: np.ndarray,
+    densidad: np.ndarray,
+    densidad_acotada: np.ndarray,
+    altura_medida: np.ndarray,
+    densidad_conocida: np.ndarray,
+    modelo: str,
+    n_simulaciones: int,
+    semilla: np.random.SeedSequence
+) -> np.ndarray:
+    """
+    Simula un bloque de realizaciones y retorna la biomasa total por simulación.
+
+    Se ejecuta en un proceso del pool, por eso es una función de módulo.
+
+    Returns:
+        Arreglo (n_simulaciones,) con la biomasa aérea total de la parcela (kg)
+    """
+    rng = np.random.default_rng(semilla)
+    calculadora = BiomasaCalculator()
+    forma = (dap.shape[0], n_simulaciones)
+
+    # Error de medición del DAP (Chave et al. 2004)
+    dap_col = dap[:, None]
+    sd_dap = ERROR_DAP_PENDIENTE * dap_col + ERROR_DAP_INTERCEPTO
+    dap_sim = np.maximum(dap_col + sd_dap * rng.standard_normal(forma), 0.1)
+
+    # Altura: error de medición si se midió, error del modelo DAP-Altura si se estimó
+    altura_sim = np.empty(forma)
+    n_medidas = int(altura_medida.sum())
+    if n_medidas:
+        altura_sim[altura_medida] = altura[altura_medida, None] * (
+            1 + ERROR_ALTURA_RELATIVO * rng.standard_normal((n_medidas, n_simulaciones))
+        )
+    n_estimadas = forma[0] - n_medidas
+    if n_estimadas:
+        estimadas = ~altura_medida
+        altura_sim[estimadas] = calculadora._estimar_altura_chave_lote(dap_sim[estimadas]) * np.exp(
+            ERROR_ALTURA_ESTIMADA_RSE * rng.standard_normal((n_estimadas, n_simulaciones))
+        )
+    altura_sim = np.maximum(altura_sim, 0.1)
+
+    # Densidad de madera: el mismo factor relativo afecta ambas versiones
+    sd_densidad = np.where(
+        densidad_conocida, ERROR_DENSIDAD_RELATIVO, ERROR_DENSIDAD_DESCONOCIDA_RELATIVO
+    )[:, None]
+    factor_densidad = np.maximum(1 + sd_densidad * rng.standard_normal(forma), 0.05)
+    densidad_sim = densidad[:, None] * factor_densidad
+    densidad_acotada_sim = np.clip(densidad_acotada[:, None] * factor_densidad, 0.05, 1.5)
+
+    modelo_alometrico = obtener_modelo(modelo)
+    biomasa_kg = modelo_alometrico.calcular(
+        calculadora.entradas_modelo(dap_sim, altura_sim, densidad_sim, densidad_acotada_sim)
+    )
+
+    # Error residual del modelo alométrico (escala logarítmica)
+    sigma_residual = modelo_alometrico.error_residual
+    if sigma_residual:
+        biomasa_kg = biomasa_kg * np.exp(sigma_residual * rng.standard_normal(forma))
+
+    return biomasa_kg.sum(axis=0)
+
+
+def _resumir(
+    valores_mg: np.ndarray,
+    area_parcela_ha: float,
+    nivel_confianza: float
+) -> Dict[str, float]:
+    """Media, desviación e intervalo percentil de un componente"""
+    alfa = (1 - nivel_confianza) / 2
+    media = float(valores_mg.mean())
+    desviacion = float(valores_mg.std(ddof=1)) if valores_mg.size > 1 else 0.0
+    inferior, superior = (float(v) for v in np.quantile(valores_mg, [alfa, 1 - alfa]))
+
+    return {
+        "media_mg": media,
+        "desviacion_estandar_mg": desviacion,
+        "coeficiente_variacion_pct": (desviacion / media * 100) if media > 0 else 0.0,
+        "intervalo_inferior_mg": inferior,
+        "intervalo_superior_mg": superior,
+        "media_por_hectarea_mg": media / area_parcela_ha,
+        "intervalo_inferior_por_hectarea_mg": inferior / area_parcela_ha,
+        "intervalo_superior_por_hectarea_mg": superior / area_parcela_ha,
+    }
+
+
+def _tamanos_bloque(n_arboles: int, n_simulaciones: int) -> List[int]:
+    """Reparte las simulaciones en bloques de tamaño acotado"""
+    por_bloque = max(1, ELEMENTOS_POR_BLOQUE // max(n_arboles, 1))
+    completos, resto = divmod(n_simulaciones, por_bloque)
+    return [por_bloque] * completos + ([resto] if resto else [])
+
+
+def simular_biomasa_parcela(
+    dap: Sequence[float],
+    altura: Optional[Sequence[Optional[float]]] = None,
+    densidad_madera: Optional[Sequence[Optional[float]]] = None,
+    modelo: str = "chave_2014",
+    n_simulaciones: int = N_SIMULACIONES_DEFECTO,
+    factor_carbono: float = FACTOR_CARBONO,
+    area_parcela_ha: float = AREA_PARCELA_HA,
+    biomasa_fija_kg: float = 0.0,
+    nivel_confianza: float = NIVEL_CONFIANZA_DEFECTO,
+    semilla: Optional[int] = None,
+    max_procesos: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Propaga la incertidumbre de medición y del modelo hasta la parcela.
+
+    Fuentes de error consideradas:
+    - Medición del DAP (σ = 0.0062 × DAP + 0.0904, Chave et al. 2004)
+    - Medición de la altura, o error del modelo DAP-Altura si se estimó
+    - Densidad de la madera (mayor si se usa la densidad promedio)
+    - Error residual del modelo alométrico (Chave 2014: RSE = 0.357)
+
+    Las simulaciones se reparten en bloques; si la parcela es grande los
+    bloques se ejecutan en un pool de procesos.
+
+    Args:
+        dap: DAP por árbol (cm)
+        altura: Altura por árbol (m); None o NaN si no se midió
+        densidad_madera: Densidad por árbol (g/cm³); None o NaN si se desconoce
+        modelo: Modelo alométrico a usar
+        n_simulaciones: Número de realizaciones Monte Carlo
+        factor_carbono: Factor de conversión biomasa → carbono
+        area_parcela_ha: Área de la parcela en hectáreas
+        biomasa_fija_kg: Biomasa sin incertidumbre modelada (necromasa + herbáceas)
+        nivel_confianza: Nivel del intervalo percentil (ej: 0.95)
+        semilla: Semilla para resultados reproducibles
+        max_procesos: Límite de procesos del pool (default: CPUs disponibles)
+
+    Returns:
+        Diccionario con media, desviación e intervalo por componente
+    """
+    modelo = obtener_modelo(modelo).nombre
+    if n_simulaciones < 2:
+        raise ValueError("Se requieren al menos 2 simulaciones")
+    if not 0 < nivel_confianza < 1:
+        raise ValueError("El nivel de confianza debe estar entre 0 y 1")
+
+    calculadora = BiomasaCalculator()
+    dap_arr, altura_arr, densidad_arr, densidad_acotada = calculadora.preparar_entradas_lote(
+        dap, altura, densidad_madera
+    )
+    n_arboles = dap_arr.shape[0]
+
+    # Qué alturas y densidades vienen de campo y cuáles fueron imputadas
+    if altura is None:
+        altura_medida = np.zeros(n_arboles, dtype=bool)
+    else:
+        altura_medida = np.asarray(altura, dtype=float) > 0
+    if densidad_madera is None:
+        densidad_conocida = np.zeros(n_arboles, dtype=bool)
+    else:
+        densidad_original = np.asarray(densidad_madera, dtype=float)
+        densidad_conocida = (densidad_original > 0) & (densidad_original <= 1.5)
+
+    if n_arboles == 0:
+        biomasa_aerea_kg = np.zeros(n_simulaciones)
+    else:
+        tamanos = _tamanos_bloque(n_arboles, n_simulaciones)
+        semillas = np.random.SeedSequence(semilla).spawn(len(tamanos))
+        argumentos = [
+            (dap_arr, altura_arr, densidad_arr, densidad_acotada, altura_medida,
+             densidad_conocida, modelo, tamano, semilla_bloque)
+            for tamano, semilla_bloque in zip(tamanos, semillas)
+        ]
+
+        usar_pool = len(tamanos) > 1 and n_arboles * n_simulaciones >= MIN_ELEMENTOS_PARALELO
+        if usar_pool:
+            procesos = min(len(tamanos), max_procesos or os.cpu_count() or 1)
+            with ProcessPoolExecutor(max_workers=procesos) as pool:
+                futuros = [pool.submit(_simular_bloque, *args) for args in argumentos]
+                bloques = [futuro.result() for futuro in futuros]
+        else:
+            bloques = [_simular_bloque(*args) for args in argumentos]
+
+        biomasa_aerea_kg = np.concatenate(bloques)
+
+    # Componentes derivados de cada realización
+    biomasa_aerea = biomasa_aerea_kg / 1000
+    biomasa_subterranea = biomasa_aerea * FACTOR_RAICES
+    biomasa_total = biomasa_aerea + biomasa_subterranea + biomasa_fija_kg / 1000
+    carbono_total = biomasa_total * factor_carbono
+    co2_equivalente = carbono_total * (44 / 12)
+
+    componentes = {
+        "biomasa_aerea": biomasa_aerea,
+        "biomasa_subterranea": biomasa_subterranea,
+        "biomasa_total": biomasa_total,
+        "carbono_total": carbono_total,
+        "co2_equivalente": co2_equivalente,
+    }
+
+    return {
+        "modelo_usado": modelo,
+        "num_arboles": n_arboles,
+        "n_simulaciones": n_simulaciones,
+        "nivel_confianza": nivel_confianza,
+        "componentes": {
+            nombre: _resumir(valores, area_parcela_ha, nivel_confianza)
+            for nombre, valores in componentes.items()
+        }
+    }
@@ -0,0 +1,246 @@
+"""
+Registro de Modelos Alométricos
+Cada modelo declara sus coeficientes, las entradas que necesita y un kernel vectorizado
+"""
+
+import re
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Entradas que el calculador puede proveer a los kernels:
+# - dap: Diámetro a la altura del pecho (cm)
+# - altura: Altura total (m), imputada con Chave 2014 si no se midió
+# - densidad: Densidad de la especie (g/cm³), promedio si se desconoce
+# - densidad_acotada: Densidad limitada al rango válido (0, 1.5]
+ENTRADAS_DISPONIBLES = ("dap", "altura", "densidad", "densidad_acotada")
+
+# Grupos de crecimiento a los que aplica un modelo
+GRUPOS = ("arbol", "palma", "liana")
+
+
+class ModeloAlometrico:
+    """
+    Definición de un modelo alométrico.
+
+    El kernel recibe el diccionario de coeficientes y los arreglos de
+    entrada declarados (como argumentos con nombre) y retorna la biomasa
+    aérea en kg con la misma forma que las entradas.
+    """
+
+    def __init__(
+        self,
+        nombre: str,
+        descripcion: str,
+        coeficientes: Dict[str, float],
+        entradas: Tuple[str, ...],
+        kernel: Callable[..., np.ndarray],
+        alias: Iterable[str] = (),
+        grupo: str = "arbol",
+        error_residual: Optional[float] = None,
+        referencia: Optional[str] = None
+    ):
+        for entrada in entradas:
+            if entrada not in ENTRADAS_DISPONIBLES:
+                raise ValueError(f"Entrada '{entrada}' no soportada por el calculador")
+        if grupo not in GRUPOS:
+            raise ValueError(f"Grupo '{grupo}' no reconocido")
+
+        self.nombre = nombre
+        self.descripcion = descripcion
+        self.coeficientes = dict(coeficientes)
+        self.entradas = tuple(entradas)
+        self.kernel = kernel
+        self.alias = tuple(alias)
+        self.grupo = grupo
+        self.error_residual = error_residual  # RSE en escala logarítmica
+        self.referencia = referencia
+
+    def __repr__(self):
+        return f"<ModeloAlometrico(nombre='{self.nombre}', grupo='{self.grupo}')>"
+
+    def calcular(self, entradas: Dict[str, np.ndarray]) -> np.ndarray:
+        """
+        Evalúa el kernel con las entradas que el modelo declara.
+
+        Args:
+            entradas: Diccionario con al menos las entradas requeridas
+
+        Returns:
+            Biomasa aérea en kg
+        """
+        return self.kernel(self.coeficientes, **{e: entradas[e] for e in self.entradas})
+
+    def como_dict(self) -> Dict:
+        """Descripción serializable del modelo"""
+        return {
+            "nombre": self.nombre,
+            "descripcion": self.descripcion,
+            "coeficientes": self.coeficientes,
+            "entradas": list(self.entradas),
+            "alias": list(self.alias),
+            "grupo": self.grupo,
+            "error_residual": self.error_residual,
+            "referencia": self.referencia,
+        }
+
+
+_REGISTRO: Dict[str, ModeloAlometrico] = {}
+_ALIAS: Dict[str, str] = {}
+
+
+def _clave(nombre: str) -> str:
+    """Normaliza un nombre: 'Chave 2014', 'chave_2014' y 'Chave2014' → 'chave2014'"""
+    return re.sub(r"[\s_\-\.]", "", nombre.lower())
+
+
+def registrar_modelo(modelo: ModeloAlometrico, reemplazar: bool = False) -> ModeloAlometrico:
+    """
+    Agrega un modelo al registro.
+
+    Args:
+        modelo: Modelo a registrar
+        reemplazar: Permite sobrescribir un modelo con el mismo nombre
+
+    Returns:
+        El mismo modelo (permite usarlo al definir módulos de modelos locales)
+    """
+    if modelo.nombre in _REGISTRO and not reemplazar:
+        raise ValueError(f"El modelo '{modelo.nombre}' ya está registrado")
+
+    claves = [_clave(modelo.nombre)] + [_clave(a) for a in modelo.alias]
+    for clave in claves:
+        existente = _ALIAS.get(clave)
+        if existente and existente != modelo.nombre:
+            raise ValueError(f"El alias '{clave}' ya pertenece al modelo '{existente}'")
+
+    _REGISTRO[modelo.nombre] = modelo
+    for clave in claves:
+        _ALIAS[clave] = modelo.nombre
+    return modelo
+
+
+def obtener_modelo(nombre: str) -> ModeloAlometrico:
+    """
+    Resuelve un nombre o alias de modelo.
+
+    Raises:
+        ValueError: Si el modelo no está registrado
+    """
+    canonico = _ALIAS.get(_clave(nombre))
+    if canonico is None:
+        raise ValueError(f"Modelo '{nombre}' no reconocido")
+    return _REGISTRO[canonico]
+
+
+def modelos_registrados(grupo: Optional[str] = None) -> List[str]:
+    """
+    Nombres de los modelos registrados, en orden de registro.
+
+    Args:
+        grupo: Filtrar por grupo de crecimiento ('arbol', 'palma', 'liana')
+    """
+    return [
+        nombre for nombre, modelo in _REGISTRO.items()
+        if grupo is None or modelo.grupo == grupo
+    ]
+
+
+def entradas_requeridas(modelos: Iterable[ModeloAlometrico]) -> set:
+    """Unión de las entradas que necesitan los modelos indicados"""
+    requeridas = set()
+    for modelo in modelos:
+        requeridas.update(modelo.entradas)
+    return requeridas
+
+
+# Kernels
+
+def _kernel_chave_2014(c, dap, altura, densidad_acotada):
+    # AGB = a × (ρ × DAP² × H)^b
+    return c["a"] * (densidad_acotada * dap ** 2 * altura) ** c["b"]
+
+
+def _kernel_ipcc_2006(c, dap, densidad):
+    # AGB = a × DAP^b, ajustado por ρ / ρ_ref
+    biomasa = c["a"] * dap ** c["b"]
+    return np.where(densidad > 0, biomasa * (densidad / c["densidad_referencia"]), biomasa)
+
+
+def _kernel_ideam(c, dap, altura, densidad_acotada):
+    # AGB = exp(a + b × ln(ρ × DAP² × H))
+    base = densidad_acotada * dap ** 2 * altura
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(base > 0, np.exp(c["a"] + c["b"] * np.log(base)), 0.0)
+
+
+def _kernel_log_dap(c, dap):
+    # AGB = exp(a + b × ln(DAP))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(dap > 0, np.exp(c["a"] + c["b"] * np.log(dap)), 0.0)
+
+
+# Modelos incluidos
+
+registrar_modelo(ModeloAlometrico(
+    nombre="chave_2014",
+    descripcion="Pantropical con altura y densidad de madera",
+    coeficientes={"a": 0.0673, "b": 0.976},
+    entradas=("dap", "altura", "densidad_acotada"),
+    kernel=_kernel_chave_2014,
+    alias=("Chave2014", "chave"),
+    error_residual=0.357,
+    referencia="Chave et al. 2014, Global Change Biology 20: 3177-3190"
+))
+
+registrar_modelo(ModeloAlometrico(
+    nombre="ipcc_2006",
+    descripcion="Bosque tropical húmedo, solo DAP con ajuste por densidad",
+    coeficientes={"a": 0.11, "b": 2.62, "densidad_referencia": 0.6},
+    entradas=("dap", "densidad"),
+    kernel=_kernel_ipcc_2006,
+    alias=("IPCC2006", "ipcc"),
+    referencia="IPCC 2006, Guidelines for National Greenhouse Gas Inventories, Vol. 4"
+))
+
+registrar_modelo(ModeloAlometrico(
+    nombre="ideam",
+    descripcion="Bosques naturales de Colombia",
+    coeficientes={"a": -2.4090, "b": 0.9522},
+    entradas=("dap", "altura", "densidad_acotada"),
+    kernel=_kernel_ideam,
+    alias=("IDEAM", "ideam_colombia"),
+    referencia="Álvarez et al. 2012, Forest Ecology and Management 267: 297-308"
+))
+
+registrar_modelo(ModeloAlometrico(
+    nombre="brown_1997",
+    descripcion="Bosque tropical húmedo, solo DAP",
+    coeficientes={"a": -2.134, "b": 2.530},
+    entradas=("dap",),
+    kernel=_kernel_log_dap,
+    alias=("Brown1997", "brown"),
+    referencia="Brown 1997, FAO Forestry Paper 134"
+))
+
+registrar_modelo(ModeloAlometrico(
+    nombre="goodman_2013_palmas",
+    descripcion="Palmas amazónicas, solo DAP",
+    coeficientes={"a": -3.3488, "b": 2.7483},
+    entradas=("dap",),
+    kernel=_kernel_log_dap,
+    alias=("palmas",),
+    grupo="palma",
+    referencia="Goodman et al. 2013, Forest Ecology and Management 310: 994-1004"
+))
+
+registrar_modelo(ModeloAlometrico(
+    nombre="schnitzer_2006_lianas",
+    descripcion="Lianas tropicales, diámetro a 1.3 m",
+    coeficientes={"a": -1.484, "b": 2.657},
+    entradas=("dap",),
+    kernel=_kernel_log_dap,
+    alias=("lianas",),
+    grupo="liana",
+    referencia="Schnitzer et al. 2006, Biotropica 38: 581-591"
+))
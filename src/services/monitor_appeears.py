@@ -0,0 +1,151 @@
+"""
+Monitor de Tareas AppEEARS
+Sigue todas las tareas pendientes de la cola con un solo listado por ciclo
+"""
+
+import logging
+import threading
+from datetime import timedelta
+from typing import Callable, Dict, List
+
+from sqlalchemy import or_, update
+from sqlalchemy.orm import Session
+
+from config.database import SessionLocal
+from src.models.trabajo_satelital import TrabajoSatelital
+from src.services.cola_satelital import ahora_utc, como_utc
+from src.services.nasa_appeears_async import FACTOR_BACKOFF, INTERVALO_INICIAL, INTERVALO_MAXIMO
+from src.services.nasa_appeears_service import NASAAppEEARSService, estados_por_tarea
+from src.services.trabajador_satelital import (
+    TIEMPO_MAXIMO_TAREA,
+    TIPO_TAREA_APPEEARS,
+    marcar_calculos_error,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class MonitorTareasAppEEARS:
+    """
+    Consulta GET /task una vez por ciclo y actualiza todos los trabajos
+    que esperan una tarea de AppEEARS.
+
+    - Tarea terminada: el trabajo queda disponible de inmediato y el
+      trabajador pasa directo a descargar (sin volver a consultar).
+    - Tarea con error o vencida: el trabajo y sus cálculos quedan en error.
+    - Tarea en proceso: el trabajo se aplaza dos ciclos, así los
+      trabajadores no la consultan uno por uno. Si el monitor se detiene,
+      los trabajos vuelven a estar disponibles y cada trabajador consulta
+      su tarea como antes.
+
+    El intervalo vuelve al mínimo cuando alguna tarea termina y crece
+    mientras no haya cambios.
+    """
+
+    def __init__(self, servicio_nasa: Callable[[], NASAAppEEARSService]):
+        self._servicio_nasa = servicio_nasa
+        self.intervalo = float(INTERVALO_INICIAL)
+
+    def _trabajos_en_espera(self, db: Session) -> List[TrabajoSatelital]:
+        return db.query(TrabajoSatelital).filter(
+            TrabajoSatelital.tipo == TIPO_TAREA_APPEEARS,
+            TrabajoSatelital.estado == "pendiente",
+            TrabajoSatelital.nasa_task_id.isnot(None),
+            or_(TrabajoSatelital.estado_nasa.is_(None), TrabajoSatelital.estado_nasa != "done")
+        ).all()
+
+    def ciclo(self, db: Session) -> Dict[str, int]:
+        """
+        Un ciclo del monitor: una sola solicitud a AppEEARS para todos los trabajos.
+
+        Returns:
+            Conteo de trabajos seguidos, terminados, fallidos y en proceso
+        """
+        resumen = {"seguidos": 0, "terminados": 0, "fallidos": 0, "en_proceso": 0}
+        trabajos = self._trabajos_en_espera(db)
+        if not trabajos:
+            self.intervalo = min(self.intervalo * FACTOR_BACKOFF, INTERVALO_MAXIMO)
+            return resumen
+
+        tareas = estados_por_tarea(self._servicio_nasa().listar_tareas())
+        momento = ahora_utc()
+        resumen["seguidos"] = len(trabajos)
+
+        terminados: List[int] = []
+        en_proceso: Dict[str, List[int]] = {}
+        for trabajo in trabajos:
+            tarea = tareas.get(trabajo.nasa_task_id)
+            if tarea is None:
+                # No aparece en el listado: el trabajador la consulta por su cuenta
+                continue
+            status = tarea.get("status")
+
+            if status == "done":
+                terminados.append(trabajo.id)
+            elif status == "error":
+                self._fallar(db, trabajo, f"La tarea falló en AppEEARS: {tarea.get('message', 'Sin mensaje')}")
+                resumen["fallidos"] += 1
+            elif momento - como_utc(trabajo.created_at) > TIEMPO_MAXIMO_TAREA:
+                self._fallar(db, trabajo, "La tarea no se completó en el tiempo esperado")
+                resumen["fallidos"] += 1
+            else:
+                en_proceso.setdefault(status, []).append(trabajo.id)
+
+        resumen["terminados"] = len(terminados)
+        resumen["en_proceso"] = sum(len(ids) for ids in en_proceso.values())
+
+        if terminados or resumen["fallidos"]:
+            self.intervalo = float(INTERVALO_INICIAL)
+        else:
+            self.intervalo = min(self.intervalo * FACTOR_BACKOFF, INTERVALO_MAXIMO)
+
+        # Solo se tocan trabajos que siguen pendientes (un trabajador pudo tomarlos)
+        if terminados:
+            db.execute(
+                update(TrabajoSatelital)
+                .where(TrabajoSatelital.id.in_(terminados), TrabajoSatelital.estado == "pendiente")
+                .values(estado_nasa="done", disponible_desde=momento, consultas=TrabajoSatelital.consultas + 1)
+                .execution_options(synchronize_session=False)
+            )
+        aplazar_hasta = momento + timedelta(seconds=2 * self.intervalo)
+        for status, ids in en_proceso.items():
+            db.execute(
+                update(TrabajoSatelital)
+                .where(TrabajoSatelital.id.in_(ids), TrabajoSatelital.estado == "pendiente")
+                .values(estado_nasa=status, disponible_desde=aplazar_hasta, consultas=TrabajoSatelital.consultas + 1)
+                .execution_options(synchronize_session=False)
+            )
+        db.commit()
+
+        logger.info(
+            f"Monitor AppEEARS: {resumen['seguidos']} tareas, {resumen['terminados']} terminadas, "
+            f"{resumen['fallidos']} con error; próximo ciclo en {self.intervalo:.0f} s"
+        )
+        return resumen
+
+    def _fallar(self, db: Session, trabajo: TrabajoSatelital, mensaje: str) -> None:
+        resultado = db.execute(
+            update(TrabajoSatelital)
+            .where(TrabajoSatelital.id == trabajo.id, TrabajoSatelital.estado == "pendiente")
+            .values(estado="error", estado_nasa="error", error_mensaje=mensaje, terminado_en=ahora_utc())
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        if resultado.rowcount == 1:
+            marcar_calculos_error(db, trabajo, mensaje)
+
+    def ejecutar(self, detener: threading.Event) -> None:
+        """Ejecuta ciclos hasta que se active `detener`"""
+        logger.info("Monitor de tareas AppEEARS iniciado")
+        while not detener.is_set():
+            db = SessionLocal()
+            try:
+                self.ciclo(db)
+            except Exception:
+                # Error de red o de la base de datos: reintentar en el próximo ciclo
+                logger.exception("Error en el ciclo del monitor AppEEARS")
+                db.rollback()
+            finally:
+                db.close()
+            detener.wait(self.intervalo)
+        logger.info("Monitor de tareas AppEEARS detenido")
@@ -0,0 +1,436 @@
+"""
+Cliente asíncrono para NASA AppEEARS API
+Conexiones agrupadas, token renovado automáticamente y seguimiento de tareas sin bloquear hilos
+"""
+
+import asyncio
+import logging
+import random
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import httpx
+
+from src.services.nasa_appeears_service import (
+    NASAAppEEARSService,
+    construir_tarea_ndvi,
+    construir_tareas_lote,
+    estados_por_tarea,
+    guardar_token,
+    invalidar_token,
+    token_en_cache,
+)
+
+logger = logging.getLogger(__name__)
+
+# Parámetros de espera por defecto (segundos)
+INTERVALO_INICIAL = 15
+INTERVALO_MAXIMO = 300
+FACTOR_BACKOFF = 1.5
+TIEMPO_MAXIMO_ESPERA = 1800
+
+# Estados terminales de una tarea en AppEEARS
+ESTADOS_FINALES = ("done", "error")
+
+
+class TareasLoteIncompletas(Exception):
+    """
+    Algunas tareas de un lote se crearon y otras no.
+
+    Attributes:
+        creadas: Lista de (task_id, IDs de parcela) de las tareas creadas
+        fallidas: Lista de (excepción, IDs de parcela) de las que fallaron
+    """
+
+    def __init__(
+        self,
+        creadas: List[Tuple[str, List[int]]],
+        fallidas: List[Tuple[BaseException, List[int]]]
+    ):
+        self.creadas = creadas
+        self.fallidas = fallidas
+        super().__init__(
+            f"{len(fallidas)} de {len(creadas) + len(fallidas)} tareas no se crearon en AppEEARS: {fallidas[0][0]}"
+        )
+
+
+async def _cerrar_cliente(cliente: httpx.AsyncClient) -> None:
+    """
+    Cierra un cliente HTTP, aunque su event loop ya esté cerrado.
+
+    Con el loop cerrado, el transporte no puede avisarle del cierre y
+    `aclose` falla a mitad de camino; el cliente se suelta igual y sus
+    sockets se liberan con los transportes.
+    """
+    try:
+        await cliente.aclose()
+    except RuntimeError as e:
+        logger.debug(f"Cliente HTTP de un event loop cerrado: {e}")
+
+
+class NASAAppEEARSAsyncClient:
+    """
+    Cliente asíncrono de AppEEARS.
+
+    Usa un único `httpx.AsyncClient` (pool de conexiones) y comparte con
+    `NASAAppEEARSService` la caché de tokens por usuario. Un mismo cliente
+    puede seguir muchas tareas a la vez desde un solo event loop:
+
+        async with NASAAppEEARSAsyncClient(usuario, password) as cliente:
+            estados = await cliente.esperar_tareas(task_ids)
+    """
+
+    BASE_URL = NASAAppEEARSService.BASE_URL
+
+    def __init__(
+        self,
+        username: str,
+        password: Optional[str] = None,
+        token: Optional[str] = None,
+        max_conexiones: int = 10,
+        timeout_segundos: float = 60.0
+    ):
+        """
+        Args:
+            username: Usuario de NASA EarthData
+            password: Contraseña de NASA EarthData (permite renovar el token)
+            token: Token de AppEEARS fijo (solo si no hay password)
+            max_conexiones: Conexiones simultáneas del pool
+            timeout_segundos: Timeout de cada solicitud
+        """
+        if not password and not token:
+            raise ValueError("Debe proporcionar password para autenticarse con AppEEARS")
+
+        self.username = username
+        self.password = password
+        self._token_fijo = None if password else token
+        self._limites = httpx.Limits(
+            max_connections=max_conexiones,
+            max_keepalive_connections=max_conexiones
+        )
+        self._timeout = httpx.Timeout(timeout_segundos)
+        # Un cliente HTTP y un lock de autenticación por event loop: sus conexiones no sirven en otro
+        self._clientes: Dict[asyncio.AbstractEventLoop, Tuple[httpx.AsyncClient, asyncio.Lock]] = {}
+
+    async def __aenter__(self) -> "NASAAppEEARSAsyncClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.cerrar()
+
+    async def _http(self) -> Tuple[httpx.AsyncClient, asyncio.Lock]:
+        """
+        Cliente HTTP y lock de autenticación del event loop actual (se crean al primer uso).
+
+        Al cambiar de loop (varios `asyncio.run`, TestClient) se cierran los
+        clientes de los loops ya cerrados en lugar de abandonar sus conexiones.
+        """
+        loop = asyncio.get_running_loop()
+        actual = self._clientes.get(loop)
+        if actual is None:
+            # Registrar antes de esperar: otras corrutinas del loop reutilizan este cliente
+            actual = self._clientes[loop] = (
+                httpx.AsyncClient(base_url=self.BASE_URL, limits=self._limites, timeout=self._timeout),
+                asyncio.Lock()
+            )
+            for anterior in [otro for otro in self._clientes if otro.is_closed()]:
+                cliente, _ = self._clientes.pop(anterior)
+                await _cerrar_cliente(cliente)
+        return actual
+
+    async def cerrar(self) -> None:
+        """Cierra las conexiones del pool del loop actual y de los loops ya cerrados"""
+        loop = asyncio.get_running_loop()
+        for otro in [otro for otro in self._clientes if otro is loop or otro.is_closed()]:
+            cliente, _ = self._clientes.pop(otro)
+            await _cerrar_cliente(cliente)
+
+    async def _obtener_token(self, renovar: bool = False) -> str:
+        """Token vigente; inicia sesión solo si no hay uno en caché o se pide renovar"""
+        if self._token_fijo:
+            return self._token_fijo
+
+        if not renovar:
+            token = token_en_cache(self.username)
+            if token:
+                return token
+
+        http, auth_lock = await self._http()
+        async with auth_lock:
+            # Otra corrutina pudo renovarlo mientras esperábamos
+            token = token_en_cache(self.username)
+            if token and not renovar:
+                return token
+
+            try:
+                response = await http.post("/login", auth=(self.username, self.password))
+                response.raise_for_status()
+            except httpx.HTTPError as e:
+                logger.error(f"Error de autenticación: {e}")
+                raise Exception(f"No se pudo autenticar con NASA EarthData: {e}")
+
+            logger.info("Autenticación exitosa con NASA AppEEARS")
+            return guardar_token(self.username, response.json())
+
+    async def _solicitud(self, metodo: str, ruta: str, **kwargs) -> httpx.Response:
+        """
+        Ejecuta una solicitud autenticada.
+
+        Si AppEEARS responde 401 (token vencido o revocado) se renueva el
+        token y se reintenta una vez.
+        """
+        http, _ = await self._http()
+        for intento in range(2):
+            token = await self._obtener_token(renovar=intento > 0)
+            response = await http.request(
+                metodo, ruta, headers={"Authorization": f"Bearer {token}"}, **kwargs
+            )
+            if response.status_code == 401 and self.password and intento == 0:
+                invalidar_token(self.username)
+                continue
+            response.raise_for_status()
+            return response
+        return response
+
+    async def crear_tarea(self, tarea: Dict[str, Any]) -> str:
+        """
+        Envía una tarea ya armada a AppEEARS.
+
+        Returns:
+            task_id: ID de la tarea creada
+        """
+        try:
+            response = await self._solicitud("POST", "/task", json=tarea)
+        except httpx.HTTPError as e:
+            logger.error(f"Error al crear tarea: {e}")
+            raise Exception(f"Error al crear tarea en AppEEARS: {e}")
+
+        task_id = response.json()["task_id"]
+        logger.info(f"Tarea creada: {task_id}")
+        return task_id
+
+    async def crear_tarea_ndvi(
+        self,
+        parcela_id: int,
+        vertices: List[List[float]],
+        fecha_inicio: date,
+        fecha_fin: date,
+        productos: Optional[List[Dict]] = None,
+        codigo_parcela: str = None,
+        rangos: Optional[List[Tuple[date, date]]] = None
+    ) -> str:
+        """Crea una tarea point de NDVI/EVI en el centroide de la parcela (o solo para `rangos`)"""
+        return await self.crear_tarea(construir_tarea_ndvi(
+            parcela_id, vertices, fecha_inicio, fecha_fin,
+            productos=productos, codigo_parcela=codigo_parcela, rangos=rangos
+        ))
+
+    async def crear_tarea_ndvi_lote(
+        self,
+        parcelas: List[Dict],
+        fecha_inicio: date,
+        fecha_fin: date,
+        productos: Optional[List[Dict]] = None,
+        tipo_tarea: str = "point"
+    ) -> List[Tuple[str, List[int]]]:
+        """
+        Crea tareas point o area con muchas parcelas por tarea (se envían en paralelo).
+
+        Args:
+            parcelas: Lista de {'parcela_id': int, 'vertices': [[lat, lon], ...]}
+            tipo_tarea: 'point' (centroide) o 'area' (polígono)
+
+        Returns:
+            Lista de (task_id, IDs de parcela en el orden de la tarea)
+
+        Raises:
+            TareasLoteIncompletas: Si alguna tarea no se creó; trae las que sí
+                se crearon para no dejarlas huérfanas en AppEEARS
+        """
+        tareas = construir_tareas_lote(parcelas, fecha_inicio, fecha_fin, productos, tipo_tarea)
+        resultados = await asyncio.gather(
+            *(self.crear_tarea(task) for task, _ in tareas),
+            return_exceptions=True
+        )
+
+        creadas, fallidas = [], []
+        for resultado, (_, parcela_ids) in zip(resultados, tareas):
+            if isinstance(resultado, BaseException):
+                fallidas.append((resultado, parcela_ids))
+            else:
+                creadas.append((resultado, parcela_ids))
+        if fallidas:
+            raise TareasLoteIncompletas(creadas, fallidas)
+        return creadas
+
+    async def verificar_estado_tarea(self, task_id: str) -> Dict:
+        """Estado actual de una tarea"""
+        try:
+            response = await self._solicitud("GET", f"/task/{task_id}")
+        except httpx.HTTPError as e:
+            logger.error(f"Error al verificar estado: {e}")
+            raise Exception(f"Error al verificar estado de tarea: {e}")
+        return response.json()
+
+    async def esperar_completacion(
+        self,
+        task_id: str,
+        intervalo_inicial: float = INTERVALO_INICIAL,
+        intervalo_maximo: float = INTERVALO_MAXIMO,
+        factor: float = FACTOR_BACKOFF,
+        tiempo_maximo: float = TIEMPO_MAXIMO_ESPERA
+    ) -> bool:
+        """
+        Espera a que una tarea termine sin bloquear el hilo.
+
+        El intervalo entre consultas crece geométricamente (con un poco de
+        variación aleatoria para no sincronizar muchas tareas) hasta
+        `intervalo_maximo`.
+
+        Returns:
+            True si completó exitosamente, False si falló o se agotó el tiempo
+        """
+        loop = asyncio.get_running_loop()
+        limite = loop.time() + tiempo_maximo
+        intervalo = intervalo_inicial
+
+        while True:
+            try:
+                estado = await self.verificar_estado_tarea(task_id)
+            except Exception as e:
+                # Errores transitorios de red: seguir esperando
+                logger.warning(f"Tarea {task_id}: {e}")
+                estado = {}
+
+            status = estado.get("status")
+            if status == "done":
+                logger.info(f"Tarea {task_id} completada exitosamente")
+                return True
+            if status == "error":
+                logger.error(f"Tarea {task_id} falló: {estado.get('message', 'Sin mensaje')}")
+                return False
+
+            restante = limite - loop.time()
+            if restante <= 0:
+                logger.warning(f"Tarea {task_id} no completó en tiempo esperado")
+                return False
+
+            espera = min(intervalo * random.uniform(0.9, 1.1), restante)
+            await asyncio.sleep(espera)
+            intervalo = min(intervalo * factor, intervalo_maximo)
+
+    async def listar_tareas(self) -> List[Dict]:
+        """Todas las tareas del usuario con su estado (GET /task)"""
+        try:
+            response = await self._solicitud("GET", "/task")
+        except httpx.HTTPError as e:
+            logger.error(f"Error al listar tareas: {e}")
+            raise Exception(f"Error al listar tareas: {e}")
+        return response.json()
+
+    async def esperar_tareas(
+        self,
+        task_ids: Iterable[str],
+        intervalo_inicial: float = INTERVALO_INICIAL,
+        intervalo_maximo: float = INTERVALO_MAXIMO,
+        factor: float = FACTOR_BACKOFF,
+        tiempo_maximo: float = TIEMPO_MAXIMO_ESPERA
+    ) -> Dict[str, bool]:
+        """
+        Sigue varias tareas con una sola consulta del listado por ciclo.
+
+        En cada ciclo pide GET /task una vez y resuelve todas las tareas
+        que terminaron; la cantidad de solicitudes no depende de cuántas
+        tareas se sigan. El intervalo vuelve al inicial cuando alguna
+        termina y crece mientras no haya cambios.
+
+        Returns:
+            Diccionario task_id → True si completó exitosamente
+        """
+        pendientes = set(task_ids)
+        resultados: Dict[str, bool] = {}
+        loop = asyncio.get_running_loop()
+        limite = loop.time() + tiempo_maximo
+        intervalo = intervalo_inicial
+
+        while pendientes:
+            try:
+                estados = estados_por_tarea(await self.listar_tareas())
+            except Exception as e:
+                # Errores transitorios de red: seguir esperando
+                logger.warning(f"Listado de tareas: {e}")
+                estados = {}
+
+            terminadas = 0
+            for task_id in list(pendientes):
+                status = estados.get(task_id, {}).get("status")
+                if status in ESTADOS_FINALES:
+                    resultados[task_id] = status == "done"
+                    pendientes.discard(task_id)
+                    terminadas += 1
+            if not pendientes:
+                break
+
+            restante = limite - loop.time()
+            if restante <= 0:
+                logger.warning(f"{len(pendientes)} tareas no completaron en tiempo esperado")
+                break
+
+            intervalo = intervalo_inicial if terminadas else min(intervalo * factor, intervalo_maximo)
+            await asyncio.sleep(min(intervalo * random.uniform(0.9, 1.1), restante))
+
+        resultados.update({task_id: False for task_id in pendientes})
+        return resultados
+
+    async def obtener_resultados(self, task_id: str) -> Dict:
+        """Información de los archivos del bundle de una tarea completada"""
+        try:
+            response = await self._solicitud("GET", f"/bundle/{task_id}")
+        except httpx.HTTPError as e:
+            logger.error(f"Error al obtener resultados: {e}")
+            raise Exception(f"Error al obtener resultados: {e}")
+        return response.json()
+
+    async def descargar_archivo(self, task_id: str, file_id: str, destino: str) -> bool:
+        """
+        Descarga un archivo del bundle en streaming.
+
+        Returns:
+            True si descargó exitosamente
+        """
+        http, _ = await self._http()
+        try:
+            token = await self._obtener_token()
+            async with http.stream(
+                "GET",
+                f"/bundle/{task_id}/{file_id}",
+                headers={"Authorization": f"Bearer {token}"},
+                follow_redirects=True
+            ) as response:
+                response.raise_for_status()
+                with open(destino, "wb") as f:
+                    async for chunk in response.aiter_bytes(64 * 1024):
+                        f.write(chunk)
+        except Exception as e:
+            logger.error(f"Error al descargar archivo: {e}")
+            return False
+
+        logger.info(f"Archivo descargado: {destino}")
+        return True
+
+
+_clientes: Dict[str, NASAAppEEARSAsyncClient] = {}
+
+
+def obtener_cliente_async(username: str, password: str) -> NASAAppEEARSAsyncClient:
+    """
+    Cliente asíncrono compartido por usuario.
+
+    Todas las corrutinas del proceso reutilizan el mismo pool de conexiones
+    y el mismo token.
+    """
+    cliente = _clientes.get(username)
+    if cliente is None or cliente.password != password:
+        cliente = NASAAppEEARSAsyncClient(username, password=password)
+        _clientes[username] = cliente
+    return cliente
@@ -3,14 +3,331 @@ Servicio de integración con NASA AppEEARS API
 Documentación: https://appeears.earthdatacloud.nasa.gov/api/
 """
 
+import os
 import requests
+import requests.adapters
+import threading
 import time
 from typing import List, Tuple, Optional, Dict
-from datetime import datetime, date
+from datetime import datetime, date, timedelta, timezone
 import logging
 
+from src.services.pixel_modis import PixelModis, agrupar_por_pixel, centro_pixel, pixel_modis
+
 logger = logging.getLogger(__name__)
 
+# Margen antes del vencimiento del token para renovarlo
+MARGEN_RENOVACION_TOKEN = timedelta(minutes=5)
+
+# Duración asumida si AppEEARS no informa el vencimiento (el token dura 48 h)
+DURACION_TOKEN_DEFECTO = timedelta(hours=47)
+
+# Descargas del bundle: tamaño de bloque, reintentos con reanudación y archivos en paralelo
+TAMANO_BLOQUE_DESCARGA = 1024 * 1024
+REINTENTOS_DESCARGA = 3
+DESCARGAS_SIMULTANEAS = 4
+
+# Tokens de AppEEARS por usuario, compartidos por el cliente síncrono y el asíncrono
+_tokens: Dict[str, Tuple[str, datetime]] = {}
+_tokens_lock = threading.Lock()
+
+
+def token_en_cache(username: str) -> Optional[str]:
+    """Retorna el token vigente del usuario o None si no hay o está por vencer"""
+    with _tokens_lock:
+        entrada = _tokens.get(username)
+    if entrada and entrada[1] - MARGEN_RENOVACION_TOKEN > datetime.now(timezone.utc):
+        return entrada[0]
+    return None
+
+
+def guardar_token(username: str, respuesta_login: Dict) -> str:
+    """
+    Guarda el token de la respuesta de /login con su vencimiento.
+
+    Args:
+        username: Usuario de NASA EarthData
+        respuesta_login: JSON de /login ({'token': ..., 'expiration': '2024-05-25T17:31:20Z'})
+
+    Returns:
+        El token
+    """
+    token = respuesta_login['token']
+    try:
+        expira = datetime.fromisoformat(respuesta_login['expiration'].replace('Z', '+00:00'))
+    except (KeyError, AttributeError, ValueError):
+        expira = datetime.now(timezone.utc) + DURACION_TOKEN_DEFECTO
+    with _tokens_lock:
+        _tokens[username] = (token, expira)
+    return token
+
+
+def invalidar_token(username: str) -> None:
+    """Descarta el token del usuario (ej: tras un 401)"""
+    with _tokens_lock:
+        _tokens.pop(username, None)
+
+
+# Productos por defecto de las tareas NDVI/EVI
+PRODUCTOS_NDVI_DEFECTO = [
+    {
+        'product': 'MOD13Q1.061',  # MODIS Terra Vegetation Indices 16-Day
+        'layer': '_250m_16_days_NDVI'
+    },
+    {
+        'product': 'MOD13Q1.061',
+        'layer': '_250m_16_days_EVI'
+    }
+]
+
+# Tareas area: los índices más la capa de calidad para ponderar cada píxel
+PRODUCTOS_AREA_DEFECTO = PRODUCTOS_NDVI_DEFECTO + [
+    {
+        'product': 'MOD13Q1.061',
+        'layer': '_250m_16_days_VI_Quality'
+    }
+]
+
+# Coordenadas por tarea point al enviar parcelas en lote
+MAX_COORDENADAS_POR_TAREA = 500
+
+# Polígonos por tarea area (cada uno genera sus propios GeoTIFF por fecha y capa)
+MAX_POLIGONOS_POR_TAREA = 100
+
+# 'point': muestra en el centroide (CSV); 'area': polígono completo (GeoTIFF)
+TIPOS_TAREA = ('point', 'area')
+
+# Prefijo del ID de cada coordenada; AppEEARS lo devuelve en la columna 'ID' del CSV
+PREFIJO_ID_COORDENADA = 'parcela_'
+
+
+def id_coordenada(parcela_id: int) -> str:
+    """ID de la coordenada de una parcela en una tarea point ('parcela_4')"""
+    return f'{PREFIJO_ID_COORDENADA}{parcela_id}'
+
+
+def parcela_id_desde_coordenada(id_coordenada_csv: Optional[str]) -> Optional[int]:
+    """Recupera el ID de parcela desde la columna 'ID' del CSV ('parcela_4' → 4)"""
+    if not id_coordenada_csv or not id_coordenada_csv.startswith(PREFIJO_ID_COORDENADA):
+        return None
+    try:
+        return int(id_coordenada_csv[len(PREFIJO_ID_COORDENADA):])
+    except ValueError:
+        return None
+
+
+def centroide(vertices: List[List[float]]) -> Tuple[float, float]:
+    """Punto central (lat, lon) de los vértices de la parcela para Point Sample"""
+    return (
+        sum(v[0] for v in vertices) / len(vertices),
+        sum(v[1] for v in vertices) / len(vertices)
+    )
+
+
+def pixel_de_vertices(vertices: List[List[float]]) -> PixelModis:
+    """Píxel MOD13Q1 del centroide de la parcela (el punto que muestrean las tareas point)"""
+    return pixel_modis(*centroide(vertices))
+
+
+def fechas_tarea(
+    fecha_inicio: date,
+    fecha_fin: date,
+    rangos: Optional[List[Tuple[date, date]]] = None
+) -> List[Dict]:
+    """
+    Periodos de una tarea ('params.dates'): el rango completo o solo los
+    sub-rangos indicados (AppEEARS acepta varios en la misma tarea).
+    """
+    return [
+        {'startDate': inicio.strftime('%m-%d-%Y'), 'endDate': fin.strftime('%m-%d-%Y')}
+        for inicio, fin in (rangos or [(fecha_inicio, fecha_fin)])
+    ]
+
+
+def construir_tarea_ndvi_lote(
+    parcelas: List[Dict],
+    fecha_inicio: date,
+    fecha_fin: date,
+    productos: Optional[List[Dict]] = None,
+    task_name: Optional[str] = None,
+    rangos: Optional[List[Tuple[date, date]]] = None
+) -> Dict:
+    """
+    Arma el cuerpo de una tarea point de AppEEARS con una coordenada por
+    píxel MOD13Q1.
+
+    Las parcelas de 0.1 ha que caen en el mismo píxel de 250 m comparten una
+    coordenada en el centro del píxel, con el ID 'parcela_{id}' de la
+    primera; `repartir_por_pixel` copia después esa serie a las demás.
+
+    Args:
+        parcelas: Lista de {'parcela_id': int, 'vertices': [[lat, lon], ...]}
+        fecha_inicio: Fecha de inicio del periodo
+        fecha_fin: Fecha de fin del periodo
+        productos: Lista de productos a extraer (default: MODIS NDVI/EVI)
+        task_name: Nombre de la tarea
+        rangos: Sub-rangos a pedir en lugar del periodo completo
+
+    Returns:
+        Diccionario listo para POST /task
+    """
+    coordenadas = []
+    pixeles = set()
+    for parcela in parcelas:
+        pixel = pixel_de_vertices(parcela['vertices'])
+        if pixel in pixeles:
+            continue
+        pixeles.add(pixel)
+        lat, lon = centro_pixel(pixel)
+        coordenadas.append({
+            'id': id_coordenada(parcela['parcela_id']),
+            'latitude': lat,
+            'longitude': lon,
+            'category': 'parcela'
+        })
+
+    return {
+        'task_type': 'point',  # Cambio a point sample para áreas pequeñas
+        'task_name': task_name or f'parcelas_lote_{len(parcelas)}_{int(time.time())}',
+        'params': {
+            'dates': fechas_tarea(fecha_inicio, fecha_fin, rangos),
+            'layers': productos or PRODUCTOS_NDVI_DEFECTO,
+            'coordinates': coordenadas
+        }
+    }
+
+
+def construir_tarea_area_lote(
+    parcelas: List[Dict],
+    fecha_inicio: date,
+    fecha_fin: date,
+    productos: Optional[List[Dict]] = None,
+    task_name: Optional[str] = None,
+    rangos: Optional[List[Tuple[date, date]]] = None
+) -> Dict:
+    """
+    Arma el cuerpo de una tarea area de AppEEARS con un polígono por parcela.
+
+    AppEEARS numera los polígonos en el orden del FeatureCollection
+    ('aid0001' es la primera parcela de la lista) y entrega un GeoTIFF por
+    polígono, capa y fecha en proyección geográfica.
+
+    Args:
+        parcelas: Lista de {'parcela_id': int, 'vertices': [[lat, lon], ...]}
+
+    Returns:
+        Diccionario listo para POST /task
+    """
+    features = []
+    for parcela in parcelas:
+        anillo = [[lon, lat] for lat, lon in parcela['vertices']]
+        anillo.append(anillo[0])
+        features.append({
+            'type': 'Feature',
+            'properties': {'id': id_coordenada(parcela['parcela_id'])},
+            'geometry': {'type': 'Polygon', 'coordinates': [anillo]}
+        })
+
+    return {
+        'task_type': 'area',
+        'task_name': task_name or f'parcelas_area_{len(parcelas)}_{int(time.time())}',
+        'params': {
+            'dates': fechas_tarea(fecha_inicio, fecha_fin, rangos),
+            'layers': productos or PRODUCTOS_AREA_DEFECTO,
+            'output': {'format': {'type': 'geotiff'}, 'projection': 'geographic'},
+            'geo': {'type': 'FeatureCollection', 'features': features}
+        }
+    }
+
+
+def construir_tareas_lote(
+    parcelas: List[Dict],
+    fecha_inicio: date,
+    fecha_fin: date,
+    productos: Optional[List[Dict]] = None,
+    tipo_tarea: str = 'point'
+) -> List[Tuple[Dict, List[int]]]:
+    """
+    Cuerpos de las tareas para un lote de parcelas, partido según el tipo.
+
+    Returns:
+        Lista de (cuerpo de la tarea, IDs de parcela en el orden de la tarea)
+
+    Raises:
+        ValueError: Si el tipo de tarea no es válido
+    """
+    if tipo_tarea == 'point':
+        # El límite de coordenadas cuenta píxeles: las parcelas del mismo píxel van en la misma tarea
+        por_id = {p['parcela_id']: p for p in parcelas}
+        por_pixel = agrupar_por_pixel(
+            (p['parcela_id'], pixel_de_vertices(p['vertices']).clave) for p in parcelas
+        )
+        lotes = [
+            [por_id[parcela_id] for pixel in lote for parcela_id in pixel]
+            for lote in dividir_en_lotes(por_pixel, MAX_COORDENADAS_POR_TAREA)
+        ]
+        construir = construir_tarea_ndvi_lote
+    elif tipo_tarea == 'area':
+        lotes = dividir_en_lotes(parcelas, MAX_POLIGONOS_POR_TAREA)
+        construir = construir_tarea_area_lote
+    else:
+        raise ValueError(f"Tipo de tarea no válido: {tipo_tarea}. Use uno de {', '.join(TIPOS_TAREA)}")
+
+    return [
+        (construir(grupo, fecha_inicio, fecha_fin, productos=productos), [p['parcela_id'] for p in grupo])
+        for grupo in lotes
+    ]
+
+
+def estados_por_tarea(tareas: List[Dict]) -> Dict[str, Dict]:
+    """Listado de GET /task → task_id → tarea"""
+    return {tarea['task_id']: tarea for tarea in tareas if tarea.get('task_id')}
+
+
+def dividir_en_lotes(parcelas: List[Dict], tamano: int = MAX_COORDENADAS_POR_TAREA) -> List[List[Dict]]:
+    """Parte la lista de parcelas en grupos de a lo sumo `tamano` coordenadas"""
+    return [parcelas[i:i + tamano] for i in range(0, len(parcelas), tamano)]
+
+
+def construir_tarea_ndvi(
+    parcela_id: int,
+    vertices: List[List[float]],
+    fecha_inicio: date,
+    fecha_fin: date,
+    productos: Optional[List[Dict]] = None,
+    codigo_parcela: str = None,
+    rangos: Optional[List[Tuple[date, date]]] = None
+) -> Dict:
+    """
+    Arma el cuerpo de una tarea point de AppEEARS en el centroide de la parcela.
+
+    Args:
+        parcela_id: ID de la parcela
+        vertices: Lista de coordenadas [[lat1, lon1], [lat2, lon2], ...]
+        fecha_inicio: Fecha de inicio del periodo
+        fecha_fin: Fecha de fin del periodo
+        productos: Lista de productos a extraer (default: MODIS NDVI/EVI)
+        codigo_parcela: Código de la parcela para el nombre de la tarea
+        rangos: Sub-rangos a pedir en lugar del periodo completo (fechas que faltan)
+
+    Returns:
+        Diccionario listo para POST /task
+    """
+    # Crear nombre descriptivo con código de parcela si está disponible
+    if codigo_parcela:
+        task_name = f'parcela_{codigo_parcela}_id{parcela_id}_{int(time.time())}'
+    else:
+        task_name = f'parcela_id{parcela_id}_{int(time.time())}'
+
+    return construir_tarea_ndvi_lote(
+        [{'parcela_id': parcela_id, 'vertices': vertices}],
+        fecha_inicio,
+        fecha_fin,
+        productos=productos,
+        task_name=task_name,
+        rangos=rangos
+    )
+
 
 class NASAAppEEARSService:
     """
@@ -20,6 +337,20 @@ class NASAAppEEARSService:
 
     BASE_URL = "https://appeears.earthdatacloud.nasa.gov/api"
 
+    # Sesión HTTP compartida por todas las instancias (reutiliza conexiones)
+    _session: Optional[requests.Session] = None
+    _session_lock = threading.Lock()
+
+    @classmethod
+    def _obtener_session(cls) -> requests.Session:
+        with cls._session_lock:
+            if cls._session is None:
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=16)
+                session.mount("https://", adapter)
+                cls._session = session
+            return cls._session
+
     def __init__(self, username: str, token: str = None, password: str = None):
         """
         Inicializa el servicio con credenciales de NASA EarthData
@@ -32,10 +363,13 @@ class NASAAppEEARSService:
         self.username = username
         self.token = None  # Siempre iniciar sin token
         self.password = password
+        self.session = self._obtener_session()
 
-        # Siempre autenticar con password para obtener token de AppEEARS
+        # Con password se usa el token en caché del usuario o se obtiene uno nuevo
         if self.password:
-            self._authenticate()
+            self.token = token_en_cache(username)
+            if not self.token:
+                self._authenticate()
         elif token:
             # Solo usar token si se proporciona explícitamente y no hay password
             self.token = token
@@ -45,20 +379,26 @@ class NASAAppEEARSService:
     def _authenticate(self) -> None:
         """Autentica y obtiene token de acceso usando password"""
         try:
-            response = requests.post(
+            response = self.session.post(
                 f"{self.BASE_URL}/login",
                 auth=(self.username, self.password)
             )
             response.raise_for_status()
-            self.token = response.json()['token']
+            self.token = guardar_token(self.username, response.json())
             logger.info("Autenticación exitosa con NASA AppEEARS")
         except requests.exceptions.RequestException as e:
             logger.error(f"Error de autenticación: {e}")
             raise Exception(f"No se pudo autenticar con NASA EarthData: {e}")
 
     def _get_headers(self) -> Dict[str, str]:
-        """Retorna headers de autenticación"""
-        if not self.token:
+        """Retorna headers de autenticación (renueva el token si está por vencer)"""
+        if self.password:
+            token = token_en_cache(self.username)
+            if token is None:
+                self._authenticate()
+            else:
+                self.token = token
+        elif not self.token:
             self._authenticate()
         return {'Authorization': f'Bearer {self.token}'}
 
@@ -85,58 +425,13 @@ class NASAAppEEARSService:
             task_id: ID de la tarea creada
         """
 
-        if productos is None:
-            productos = [
-                {
-                    'product': 'MOD13Q1.061',  # MODIS Terra Vegetation Indices 16-Day
-                    'layer': '_250m_16_days_NDVI'
-                },
-                {
-                    'product': 'MOD13Q1.061',
-                    'layer': '_250m_16_days_EVI'
-                }
-            ]
-
-        # Convertir vértices a formato GeoJSON (longitud, latitud)
-        # AppEEARS espera [lon, lat] no [lat, lon]
-        geojson_coords = [[v[1], v[0]] for v in vertices]
-        # Cerrar el polígono (primer punto = último punto)
-        geojson_coords.append(geojson_coords[0])
-
-        # Calcular punto central del polígono para Point Sample
-        centro_lat = sum(v[0] for v in vertices) / len(vertices)
-        centro_lon = sum(v[1] for v in vertices) / len(vertices)
-
-        # Crear nombre descriptivo con código de parcela si está disponible
-        if codigo_parcela:
-            task_name = f'parcela_{codigo_parcela}_id{parcela_id}_{int(time.time())}'
-        else:
-            task_name = f'parcela_id{parcela_id}_{int(time.time())}'
-
-        task = {
-            'task_type': 'point',  # Cambio a point sample para áreas pequeñas
-            'task_name': task_name,
-            'params': {
-                'dates': [
-                    {
-                        'startDate': fecha_inicio.strftime('%m-%d-%Y'),
-                        'endDate': fecha_fin.strftime('%m-%d-%Y')
-                    }
-                ],
-                'layers': productos,
-                'coordinates': [
-                    {
-                        'id': f'parcela_{parcela_id}',
-                        'latitude': centro_lat,
-                        'longitude': centro_lon,
-                        'category': 'parcela'
-                    }
-                ]
-            }
-        }
+        task = construir_tarea_ndvi(
+            parcela_id, vertices, fecha_inicio, fecha_fin,
+            productos=productos, codigo_parcela=codigo_parcela
+        )
 
         try:
-            response = requests.post(
+            response = self.session.post(
                 f"{self.BASE_URL}/task",
                 json=task,
                 headers=self._get_headers()
@@ -149,6 +444,44 @@ class NASAAppEEARSService:
             logger.error(f"Error al crear tarea: {e}")
             raise Exception(f"Error al crear tarea en AppEEARS: {e}")
 
+    def crear_tarea_ndvi_lote(
+        self,
+        parcelas: List[Dict],
+        fecha_inicio: date,
+        fecha_fin: date,
+        productos: Optional[List[Dict]] = None,
+        tipo_tarea: str = 'point'
+    ) -> List[Tuple[str, List[int]]]:
+        """
+        Crea tareas point o area con muchas parcelas por tarea.
+
+        Args:
+            parcelas: Lista de {'parcela_id': int, 'vertices': [[lat, lon], ...]}
+            fecha_inicio: Fecha de inicio del periodo
+            fecha_fin: Fecha de fin del periodo
+            productos: Lista de productos a extraer (default según el tipo de tarea)
+            tipo_tarea: 'point' (centroide) o 'area' (polígono)
+
+        Returns:
+            Lista de (task_id, IDs de parcela en el orden de la tarea)
+        """
+        tareas = []
+        for task, parcela_ids in construir_tareas_lote(parcelas, fecha_inicio, fecha_fin, productos, tipo_tarea):
+            try:
+                response = self.session.post(
+                    f"{self.BASE_URL}/task",
+                    json=task,
+                    headers=self._get_headers()
+                )
+                response.raise_for_status()
+            except requests.exceptions.RequestException as e:
+                logger.error(f"Error al crear tarea en lote: {e}")
+                raise Exception(f"Error al crear tarea en AppEEARS: {e}")
+            task_id = response.json()['task_id']
+            logger.info(f"Tarea {tipo_tarea} en lote creada: {task_id} ({len(parcela_ids)} parcelas)")
+            tareas.append((task_id, parcela_ids))
+        return tareas
+
     def verificar_estado_tarea(self, task_id: str) -> Dict:
         """
         Verifica el estado de una tarea
@@ -160,7 +493,7 @@ class NASAAppEEARSService:
             Dict con estado de la tarea
         """
         try:
-            response = requests.get(
+            response = self.session.get(
                 f"{self.BASE_URL}/task/{task_id}",
                 headers=self._get_headers()
             )
@@ -170,6 +503,27 @@ class NASAAppEEARSService:
             logger.error(f"Error al verificar estado: {e}")
             raise Exception(f"Error al verificar estado de tarea: {e}")
 
+    def listar_tareas(self) -> List[Dict]:
+        """
+        Lista las tareas del usuario con su estado (GET /task)
+
+        Una sola solicitud informa el estado de todas las tareas, sin
+        importar cuántas estén pendientes.
+
+        Returns:
+            Lista de tareas ({'task_id', 'status', ...})
+        """
+        try:
+            response = self.session.get(
+                f"{self.BASE_URL}/task",
+                headers=self._get_headers()
+            )
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Error al listar tareas: {e}")
+            raise Exception(f"Error al listar tareas: {e}")
+
     def esperar_completacion(
         self,
         task_id: str,
@@ -216,7 +570,7 @@ class NASAAppEEARSService:
             Dict con información de archivos disponibles
         """
         try:
-            response = requests.get(
+            response = self.session.get(
                 f"{self.BASE_URL}/bundle/{task_id}",
                 headers=self._get_headers()
             )
@@ -228,7 +582,11 @@ class NASAAppEEARSService:
 
     def descargar_archivo(self, task_id: str, file_id: str, destino: str) -> bool:
         """
-        Descarga un archivo de resultados
+        Descarga un archivo de resultados, reanudando si se corta
+
+        Escribe en `destino + '.part'` en bloques de 1 MiB. Si ya existe una
+        parte de un intento anterior, pide solo el resto con un encabezado
+        Range; al terminar la renombra a `destino`.
 
         Args:
             task_id: ID de la tarea
@@ -238,24 +596,45 @@ class NASAAppEEARSService:
         Returns:
             True si descargó exitosamente
         """
-        try:
-            response = requests.get(
-                f"{self.BASE_URL}/bundle/{task_id}/{file_id}",
-                headers=self._get_headers(),
-                stream=True
-            )
+        parcial = destino + '.part'
+        for intento in range(1, REINTENTOS_DESCARGA + 1):
+            try:
+                self._descargar_parcial(task_id, file_id, parcial)
+                os.replace(parcial, destino)
+                logger.info(f"Archivo descargado: {destino}")
+                return True
+            except (requests.exceptions.RequestException, OSError) as e:
+                logger.warning(f"Descarga de {file_id} interrumpida (intento {intento}/{REINTENTOS_DESCARGA}): {e}")
+                if intento < REINTENTOS_DESCARGA:
+                    time.sleep(min(2 ** intento, 30))
+
+        logger.error(f"Error al descargar archivo {file_id} de la tarea {task_id}")
+        return False
+
+    def _descargar_parcial(self, task_id: str, file_id: str, parcial: str) -> None:
+        """Completa `parcial` desde donde quedó (Range) o desde cero si el servidor no lo admite"""
+        inicio = os.path.getsize(parcial) if os.path.exists(parcial) else 0
+        headers = self._get_headers()
+        if inicio:
+            headers['Range'] = f"bytes={inicio}-"
+
+        with self.session.get(
+            f"{self.BASE_URL}/bundle/{task_id}/{file_id}",
+            headers=headers,
+            stream=True,
+            timeout=(10, 60)
+        ) as response:
+            if inicio and response.status_code == 416:
+                # La parte ya estaba completa
+                return
             response.raise_for_status()
 
-            with open(destino, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
+            # 206: el servidor respetó el Range; 200: manda el archivo entero
+            modo = 'ab' if inicio and response.status_code == 206 else 'wb'
+            with open(parcial, modo, buffering=TAMANO_BLOQUE_DESCARGA) as f:
+                for chunk in response.iter_content(chunk_size=TAMANO_BLOQUE_DESCARGA):
                     f.write(chunk)
 
-            logger.info(f"Archivo descargado: {destino}")
-            return True
-        except Exception as e:
-            logger.error(f"Error al descargar archivo: {e}")
-            return False
-
     def calcular_indices_promedio(
         self,
         parcela_id: int,
@@ -265,7 +644,7 @@ class NASAAppEEARSService:
     ) -> Dict:
         """
         Calcula índices de vegetación promedio para una parcela
-        (Versión simplificada - en producción procesaría los GeoTIFFs)
+        con una tarea area y estadísticas zonales sobre sus GeoTIFF
 
         Args:
             parcela_id: ID de la parcela
@@ -276,10 +655,15 @@ class NASAAppEEARSService:
         Returns:
             Dict con índices calculados
         """
-
-        # Crear tarea
-        task_id = self.crear_tarea_ndvi(
-            parcela_id, vertices, fecha_inicio, fecha_fin
+        # Import local: procesamiento_satelital importa este módulo
+        from src.services.procesamiento_satelital import descargar_series_area
+
+        # Crear tarea con el polígono completo
+        [(task_id, orden)] = self.crear_tarea_ndvi_lote(
+            [{'parcela_id': parcela_id, 'vertices': vertices}],
+            fecha_inicio,
+            fecha_fin,
+            tipo_tarea='area'
         )
 
         # Esperar completación (esto puede tomar 10-30 minutos)
@@ -288,21 +672,17 @@ class NASAAppEEARSService:
         if not completado:
             raise Exception("La tarea no se completó exitosamente")
 
-        # Obtener información de resultados
-        resultados = self.obtener_resultados(task_id)
-
-        # En una implementación completa, aquí:
-        # 1. Descargaríamos los archivos GeoTIFF
-        # 2. Los procesaríamos con rasterio/GDAL
-        # 3. Calcularíamos estadísticas (promedio, min, max, std)
+        # Resumir los píxeles del polígono por fecha (lectura por ventanas)
+        series = descargar_series_area(self, task_id, {parcela_id: vertices}, orden)
+        serie = series.get(id_coordenada(parcela_id))
 
-        # Por ahora retornamos estructura básica
         return {
             'task_id': task_id,
             'status': 'completed',
-            'archivos_disponibles': len(resultados.get('files', [])),
-            'mensaje': 'Tarea completada. Procesamiento de GeoTIFF pendiente.',
-            'resultados_info': resultados
+            'num_imagenes': len(serie) if serie else 0,
+            'ndvi': serie.estadisticas['ndvi'].como_dict() if serie else None,
+            'evi': serie.estadisticas['evi'].como_dict() if serie else None,
+            'serie_temporal': serie.serie() if serie else []
         }
 
     def listar_productos_disponibles(self) -> List[Dict]:
@@ -313,7 +693,7 @@ class NASAAppEEARSService:
             Lista de productos
         """
         try:
-            response = requests.get(
+            response = self.session.get(
                 f"{self.BASE_URL}/product",
                 headers=self._get_headers()
             )
@@ -0,0 +1,421 @@
+"""
+Servicio de Observaciones Satelitales
+Guarda y consulta las series de índices por parcela, producto, capa y fecha
+"""
+
+import math
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import extract, func, select, union, update
+from sqlalchemy.orm import Session
+
+from src.models.compuesto_satelital import CompuestoSatelital
+from src.models.observacion_satelital import ObservacionSatelital
+from src.services.suavizado_series import matriz_desde_puntos, suavizar_matriz
+
+
+PRODUCTO_MOD13Q1 = "MOD13Q1.061"
+
+# Las medias zonales de una tarea area no son el valor del píxel de una tarea
+# point: se guardan como otro producto para que no se pisen en la clave
+PRODUCTO_MOD13Q1_AREA = f"{PRODUCTO_MOD13Q1}/area"
+
+# Índice de la serie temporal → capa MODIS
+CAPAS_MOD13Q1 = {
+    "ndvi": "_250m_16_days_NDVI",
+    "evi": "_250m_16_days_EVI",
+}
+
+PERIODOS_RESUMEN = ("mes", "anio")
+
+# MOD13Q1 publica un compuesto cada 16 días, reiniciando el 1 de enero (días 1, 17, ..., 353)
+DIAS_COMPUESTO_MOD13Q1 = 16
+
+# Los compuestos más recientes que esto todavía pueden no estar publicados en AppEEARS
+LATENCIA_MOD13Q1 = timedelta(days=30)
+
+
+def producto_observaciones(tipo_tarea: str = "point") -> str:
+    """Producto con que se guardan las observaciones de una tarea 'point' o 'area'"""
+    return PRODUCTO_MOD13Q1_AREA if tipo_tarea == "area" else PRODUCTO_MOD13Q1
+
+
+def fechas_compuestos_mod13q1(desde: date, hasta: date) -> List[date]:
+    """Fechas de los compuestos MOD13Q1 entre `desde` y `hasta` (inclusive)"""
+    fechas = []
+    for anio in range(desde.year, hasta.year + 1):
+        inicio_anio = date(anio, 1, 1)
+        for dia in range(0, 366, DIAS_COMPUESTO_MOD13Q1):
+            fecha = inicio_anio + timedelta(days=dia)
+            if fecha.year != anio:
+                break
+            if desde <= fecha <= hasta:
+                fechas.append(fecha)
+    return fechas
+
+
+def filas_desde_serie(
+    parcela_id: int,
+    serie_temporal: Iterable[Dict],
+    calculo_id: Optional[int] = None,
+    producto: str = PRODUCTO_MOD13Q1
+) -> List[Dict]:
+    """
+    Convierte puntos {'fecha', 'ndvi', 'evi', 'calidad'} en filas de observación
+    (con 'ndvi_suavizado' / 'evi_suavizado' si el punto los trae).
+
+    Returns:
+        Lista de diccionarios con las columnas de `observaciones_satelitales`
+    """
+    filas = []
+    for punto in serie_temporal:
+        fecha = punto.get("fecha")
+        if not fecha:
+            continue
+        fecha = date.fromisoformat(fecha) if isinstance(fecha, str) else fecha
+        for indice, capa in CAPAS_MOD13Q1.items():
+            valor = punto.get(indice)
+            if valor is None:
+                continue
+            filas.append({
+                "parcela_id": parcela_id,
+                "producto": producto,
+                "capa": capa,
+                "fecha": fecha,
+                "valor": float(valor),
+                "valor_suavizado": punto.get(f"{indice}_suavizado"),
+                "calidad": punto.get("calidad"),
+                "calculo_id": calculo_id,
+            })
+    return filas
+
+
+class ObservacionesService:
+    """Servicio para las observaciones satelitales normalizadas"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def guardar(self, filas: List[Dict]) -> int:
+        """
+        Inserta o actualiza observaciones (no hace commit).
+
+        En SQLite y PostgreSQL usa INSERT ... ON CONFLICT sobre la clave
+        primaria: una observación de la misma parcela, capa y fecha traída
+        por otro cálculo reemplaza el valor en lugar de duplicarlo.
+
+        Returns:
+            Cantidad de filas enviadas
+        """
+        if not filas:
+            return 0
+
+        dialecto = self.db.get_bind().dialect.name
+        if dialecto == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        elif dialecto == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            for fila in filas:
+                self.db.merge(ObservacionSatelital(**fila))
+            return len(filas)
+
+        tabla = ObservacionSatelital.__table__
+        sentencia = insert(tabla)
+        sentencia = sentencia.on_conflict_do_update(
+            index_elements=[columna.name for columna in tabla.primary_key.columns],
+            set_={
+                "valor": sentencia.excluded.valor,
+                "valor_suavizado": sentencia.excluded.valor_suavizado,
+                "calidad": sentencia.excluded.calidad,
+                "calculo_id": sentencia.excluded.calculo_id,
+                "updated_at": func.now(),
+            }
+        )
+        self.db.execute(sentencia, filas)
+        return len(filas)
+
+    def guardar_serie(
+        self,
+        parcela_id: int,
+        serie_temporal: Iterable[Dict],
+        calculo_id: Optional[int] = None,
+        producto: str = PRODUCTO_MOD13Q1
+    ) -> int:
+        """Guarda los puntos de una serie temporal (no hace commit)"""
+        return self.guardar(filas_desde_serie(parcela_id, serie_temporal, calculo_id, producto))
+
+    def registrar_compuestos(
+        self,
+        parcela_id: int,
+        fechas: Iterable,
+        producto: str = PRODUCTO_MOD13Q1
+    ) -> int:
+        """
+        Registra los compuestos que AppEEARS devolvió para la parcela,
+        incluidos los de NDVI de relleno o NA, que no dejan observación
+        (no hace commit).
+
+        Returns:
+            Cantidad de fechas enviadas
+        """
+        filas = [
+            {
+                "parcela_id": parcela_id,
+                "producto": producto,
+                "fecha": date.fromisoformat(fecha) if isinstance(fecha, str) else fecha,
+            }
+            for fecha in set(fechas)
+        ]
+        if not filas:
+            return 0
+
+        dialecto = self.db.get_bind().dialect.name
+        if dialecto == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        elif dialecto == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            for fila in filas:
+                self.db.merge(CompuestoSatelital(**fila))
+            return len(filas)
+
+        self.db.execute(insert(CompuestoSatelital.__table__).on_conflict_do_nothing(), filas)
+        return len(filas)
+
+    def _consulta(
+        self,
+        parcela_id: int,
+        capas: Optional[List[str]] = None,
+        desde: Optional[date] = None,
+        hasta: Optional[date] = None,
+        producto: str = PRODUCTO_MOD13Q1
+    ):
+        query = self.db.query(ObservacionSatelital).filter(
+            ObservacionSatelital.parcela_id == parcela_id,
+            ObservacionSatelital.producto == producto
+        )
+        if capas:
+            query = query.filter(ObservacionSatelital.capa.in_(capas))
+        if desde:
+            query = query.filter(ObservacionSatelital.fecha >= desde)
+        if hasta:
+            query = query.filter(ObservacionSatelital.fecha <= hasta)
+        return query
+
+    def rangos_faltantes(
+        self,
+        parcela_id: int,
+        desde: date,
+        hasta: date,
+        hoy: Optional[date] = None,
+        producto: str = PRODUCTO_MOD13Q1
+    ) -> List[Tuple[date, date]]:
+        """
+        Sub-rangos del periodo con compuestos que todavía no se recibieron.
+
+        Compara el calendario de compuestos MOD13Q1 con las fechas de NDVI
+        guardadas y los compuestos ya devueltos sin valor utilizable
+        (`compuestos_satelitales`), en una consulta, y agrupa los
+        compuestos faltantes consecutivos. Los compuestos de las últimas
+        semanas, que AppEEARS quizá aún no publica, no cuentan como faltantes.
+
+        Returns:
+            Lista de (inicio, fin); vacía si el periodo está cubierto y
+            [(desde, hasta)] si no hay nada guardado del periodo
+        """
+        limite = min(hasta, (hoy or date.today()) - LATENCIA_MOD13Q1)
+        esperadas = fechas_compuestos_mod13q1(desde, limite)
+        if not esperadas:
+            return []
+
+        observadas = select(ObservacionSatelital.fecha).where(
+            ObservacionSatelital.parcela_id == parcela_id,
+            ObservacionSatelital.producto == producto,
+            ObservacionSatelital.capa == CAPAS_MOD13Q1["ndvi"],
+            ObservacionSatelital.fecha.between(desde, hasta)
+        )
+        recibidas = select(CompuestoSatelital.fecha).where(
+            CompuestoSatelital.parcela_id == parcela_id,
+            CompuestoSatelital.producto == producto,
+            CompuestoSatelital.fecha.between(desde, hasta)
+        )
+        guardadas = set(self.db.execute(union(observadas, recibidas)).scalars())
+        if not guardadas:
+            return [(desde, hasta)]
+
+        rangos: List[Tuple[date, date]] = []
+        anterior = None
+        for i, fecha in enumerate(esperadas):
+            if fecha in guardadas:
+                continue
+            fin = min(fecha + timedelta(days=DIAS_COMPUESTO_MOD13Q1 - 1), hasta)
+            if rangos and anterior == i - 1:
+                rangos[-1] = (rangos[-1][0], fin)
+            else:
+                rangos.append((fecha, fin))
+            anterior = i
+        return rangos
+
+    def listar(
+        self,
+        parcela_id: int,
+        indice: Optional[str] = None,
+        desde: Optional[date] = None,
+        hasta: Optional[date] = None,
+        producto: str = PRODUCTO_MOD13Q1
+    ) -> List[Dict]:
+        """Observaciones de la parcela en el rango, ordenadas por capa y fecha"""
+        capas = [capa_de_indice(indice)] if indice else None
+        observaciones = self._consulta(parcela_id, capas, desde, hasta, producto).order_by(
+            ObservacionSatelital.capa, ObservacionSatelital.fecha
+        ).all()
+        return [
+            {
+                "fecha": o.fecha.isoformat(),
+                "capa": o.capa,
+                "valor": o.valor,
+                "valor_suavizado": o.valor_suavizado,
+                "calidad": o.calidad,
+                "calculo_id": o.calculo_id,
+            }
+            for o in observaciones
+        ]
+
+    def serie(
+        self,
+        parcela_id: int,
+        desde: Optional[date] = None,
+        hasta: Optional[date] = None,
+        producto: str = PRODUCTO_MOD13Q1
+    ) -> List[Dict]:
+        """
+        Serie temporal en el formato de `CalculoSatelital.serie_temporal`.
+
+        Returns:
+            [{"fecha": "2024-01-01", "ndvi": 0.75, "ndvi_suavizado": 0.76, "evi": 0.62, ...}, ...]
+        """
+        indice_de_capa = {capa: indice for indice, capa in CAPAS_MOD13Q1.items()}
+        filas = self._consulta(parcela_id, list(indice_de_capa), desde, hasta, producto).with_entities(
+            ObservacionSatelital.fecha,
+            ObservacionSatelital.capa,
+            ObservacionSatelital.valor,
+            ObservacionSatelital.valor_suavizado,
+            ObservacionSatelital.calidad
+        ).order_by(ObservacionSatelital.fecha).all()
+
+        puntos: Dict[date, Dict] = {}
+        for fecha, capa, valor, suavizado, calidad in filas:
+            punto = puntos.setdefault(fecha, {"fecha": fecha.isoformat(), "calidad": calidad})
+            punto[indice_de_capa[capa]] = valor
+            if suavizado is not None:
+                punto[f"{indice_de_capa[capa]}_suavizado"] = suavizado
+        return list(puntos.values())
+
+    def suavizar(
+        self,
+        parcela_ids: Optional[List[int]] = None,
+        producto: str = PRODUCTO_MOD13Q1
+    ) -> Dict[str, int]:
+        """
+        Recalcula `valor_suavizado` de las parcelas indicadas (default: todas).
+
+        Lee las observaciones con una consulta por capa, suaviza la matriz
+        parcelas × fechas de una vez y actualiza por clave primaria en bloque
+        (no hace commit).
+
+        Returns:
+            {"parcelas": ..., "observaciones": ...}
+        """
+        resultado = {"parcelas": 0, "observaciones": 0}
+        for capa in CAPAS_MOD13Q1.values():
+            query = self.db.query(
+                ObservacionSatelital.parcela_id,
+                ObservacionSatelital.fecha,
+                ObservacionSatelital.valor,
+                ObservacionSatelital.calidad
+            ).filter(
+                ObservacionSatelital.producto == producto,
+                ObservacionSatelital.capa == capa
+            )
+            if parcela_ids:
+                query = query.filter(ObservacionSatelital.parcela_id.in_(parcela_ids))
+
+            series: Dict[int, List[Dict]] = {}
+            for parcela_id, fecha, valor, calidad in query.order_by(
+                ObservacionSatelital.parcela_id, ObservacionSatelital.fecha
+            ):
+                series.setdefault(parcela_id, []).append(
+                    {"fecha": fecha.isoformat(), "valor": valor, "calidad": calidad}
+                )
+            if not series:
+                continue
+
+            claves, fechas, valores, pesos = matriz_desde_puntos(series, "valor")
+            suave = suavizar_matriz(valores, pesos)
+            columna = {fecha: j for j, fecha in enumerate(fechas)}
+
+            cambios = [
+                {
+                    "parcela_id": parcela_id,
+                    "producto": producto,
+                    "capa": capa,
+                    "fecha": date.fromisoformat(punto["fecha"]),
+                    "valor_suavizado": _redondear(suave[i, columna[punto["fecha"]]]),
+                }
+                for i, parcela_id in enumerate(claves)
+                for punto in series[parcela_id]
+            ]
+            # UPDATE por clave primaria en bloque (executemany)
+            self.db.execute(update(ObservacionSatelital), cambios)
+
+            resultado["parcelas"] = max(resultado["parcelas"], len(claves))
+            resultado["observaciones"] += len(cambios)
+        return resultado
+
+    def resumen(
+        self,
+        parcela_id: int,
+        indice: str = "ndvi",
+        periodo: str = "mes",
+        desde: Optional[date] = None,
+        hasta: Optional[date] = None,
+        producto: str = PRODUCTO_MOD13Q1
+    ) -> List[Dict]:
+        """
+        Estadísticas por mes o por año calculadas en SQL.
+
+        Returns:
+            [{"anio": 2025, "mes": 1, "n": 2, "promedio": 0.74, "minimo": ..., "maximo": ...}, ...]
+        """
+        if periodo not in PERIODOS_RESUMEN:
+            raise ValueError(f"Periodo no válido: {periodo}. Use uno de {', '.join(PERIODOS_RESUMEN)}")
+
+        grupos = [extract("year", ObservacionSatelital.fecha).label("anio")]
+        if periodo == "mes":
+            grupos.append(extract("month", ObservacionSatelital.fecha).label("mes"))
+
+        filas = self._consulta(parcela_id, [capa_de_indice(indice)], desde, hasta, producto).with_entities(
+            *grupos,
+            func.count().label("n"),
+            func.avg(ObservacionSatelital.valor).label("promedio"),
+            func.min(ObservacionSatelital.valor).label("minimo"),
+            func.max(ObservacionSatelital.valor).label("maximo")
+        ).group_by(*grupos).order_by(*grupos).all()
+
+        return [dict(fila._mapping) for fila in filas]
+
+
+def _redondear(valor) -> Optional[float]:
+    """NaN (serie sin ningún valor utilizable) → None"""
+    valor = float(valor)
+    return None if math.isnan(valor) else round(valor, 4)
+
+
+def capa_de_indice(indice: str) -> str:
+    """'ndvi' → '_250m_16_days_NDVI'"""
+    capa = CAPAS_MOD13Q1.get(indice.lower())
+    if capa is None:
+        raise ValueError(f"Índice no válido: {indice}. Use uno de {', '.join(CAPAS_MOD13Q1)}")
+    return capa
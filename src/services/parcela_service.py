@@ -10,6 +10,8 @@ from datetime import date
 import random
 
 from src.models.parcela import Parcela
+from src.services.nasa_appeears_service import pixel_de_vertices
+from src.services.pixel_modis import pixel_modis
 from src.utils.coordinate_converter import CoordinateConverter
 from src.utils.validators import validar_parcela, validar_coordenadas
 from src.utils.constants import UTM_ZONE_AMAZONAS
@@ -142,6 +144,8 @@ class ParcelaService:
                 ]
                 self._asignar_vertices(parcela, vertices)
 
+        self._asignar_pixel_modis(parcela)
+
         self.db.add(parcela)
         self.db.commit()
         self.db.refresh(parcela)
@@ -228,6 +232,9 @@ class ParcelaService:
                 parcela.utm_x = utm_x
                 parcela.utm_y = utm_y
 
+        if any(key in kwargs for key in ('latitud', 'longitud')) or any(key.startswith('vertice') for key in kwargs):
+            self._asignar_pixel_modis(parcela)
+
         self.db.commit()
         self.db.refresh(parcela)
 
@@ -263,6 +270,17 @@ class ParcelaService:
         parcela.vertice2_lat, parcela.vertice2_lon = vertices[1]
         parcela.vertice3_lat, parcela.vertice3_lon = vertices[2]
         parcela.vertice4_lat, parcela.vertice4_lon = vertices[3]
+        self._asignar_pixel_modis(parcela)
+
+    def _asignar_pixel_modis(self, parcela: Parcela):
+        """Calcula el píxel MOD13Q1 del centroide de los vértices (o del centro si faltan)"""
+        if all(lat is not None and lon is not None for lat, lon in parcela.vertices):
+            pixel = pixel_de_vertices([list(v) for v in parcela.vertices])
+        elif parcela.latitud is not None and parcela.longitud is not None:
+            pixel = pixel_modis(parcela.latitud, parcela.longitud)
+        else:
+            pixel = None
+        parcela.modis_tile, parcela.modis_linea, parcela.modis_muestra = pixel or (None, None, None)
 
     def establecer_vertices_manualmente(
         self,
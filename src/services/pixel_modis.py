@@ -0,0 +1,95 @@
+"""
+Píxel MODIS de una coordenada
+Tile, línea y muestra de la grilla sinusoidal de MOD13Q1 (250 m) calculados localmente
+"""
+
+import math
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+
+# Esfera de la proyección sinusoidal MODIS (metros)
+RADIO_SINUSOIDAL = 6371007.181
+
+# Lado de un tile: 36 tiles horizontales (h00..h35) y 18 verticales (v00..v17)
+TAMANO_TILE = 1111950.5197665
+TILES_HORIZONTALES = 36
+TILES_VERTICALES = 18
+
+# Píxeles por lado de tile en los productos de 250 m (MOD13Q1)
+PIXELES_POR_TILE_250M = 4800
+TAMANO_PIXEL_250M = TAMANO_TILE / PIXELES_POR_TILE_250M
+
+# Origen de la grilla (esquina superior izquierda de h00v00)
+_X_ORIGEN = -TAMANO_TILE * TILES_HORIZONTALES / 2
+_Y_ORIGEN = TAMANO_TILE * TILES_VERTICALES / 2
+
+
+class PixelModis(NamedTuple):
+    """Píxel de 250 m: tile 'hHHvVV', línea (fila, Line_Y) y muestra (columna, Sample_X)"""
+    tile: str
+    linea: int
+    muestra: int
+
+    @property
+    def clave(self) -> str:
+        """Identificador del píxel ('h11v09_1965_66')"""
+        return f"{self.tile}_{self.linea}_{self.muestra}"
+
+
+def pixel_modis(lat: float, lon: float) -> PixelModis:
+    """
+    Píxel MOD13Q1 que contiene la coordenada.
+
+    Proyecta a la sinusoidal (x = R·λ·cos φ, y = R·φ) y ubica el tile y el
+    píxel desde la esquina superior izquierda de la grilla, igual que las
+    columnas MODIS_Tile, Line_Y y Sample_X del CSV Results de AppEEARS.
+    """
+    phi = math.radians(lat)
+    x = RADIO_SINUSOIDAL * math.radians(lon) * math.cos(phi) - _X_ORIGEN
+    y = _Y_ORIGEN - RADIO_SINUSOIDAL * phi
+
+    h = min(int(x // TAMANO_TILE), TILES_HORIZONTALES - 1)
+    v = min(int(y // TAMANO_TILE), TILES_VERTICALES - 1)
+    muestra = min(int((x - h * TAMANO_TILE) // TAMANO_PIXEL_250M), PIXELES_POR_TILE_250M - 1)
+    linea = min(int((y - v * TAMANO_TILE) // TAMANO_PIXEL_250M), PIXELES_POR_TILE_250M - 1)
+    return PixelModis(f"h{h:02d}v{v:02d}", linea, muestra)
+
+
+def centro_pixel(pixel: PixelModis) -> Tuple[float, float]:
+    """
+    Centro (lat, lon) del píxel.
+
+    Una tarea point en el centro no depende de en qué lado del borde cae
+    cada parcela: AppEEARS devuelve el mismo píxel que se calculó aquí.
+    """
+    h, v = int(pixel.tile[1:3]), int(pixel.tile[4:6])
+    x = _X_ORIGEN + h * TAMANO_TILE + (pixel.muestra + 0.5) * TAMANO_PIXEL_250M
+    y = _Y_ORIGEN - v * TAMANO_TILE - (pixel.linea + 0.5) * TAMANO_PIXEL_250M
+    phi = y / RADIO_SINUSOIDAL
+    return math.degrees(phi), math.degrees(x / (RADIO_SINUSOIDAL * math.cos(phi)))
+
+
+def pixel_desde_csv(tile: Optional[str], linea: Optional[str], muestra: Optional[str]) -> Optional[PixelModis]:
+    """Píxel de las columnas MODIS_Tile, Line_Y y Sample_X del CSV Results (None si faltan)"""
+    if not tile or linea in (None, "", "NA") or muestra in (None, "", "NA"):
+        return None
+    try:
+        return PixelModis(tile.strip().lower(), int(float(linea)), int(float(muestra)))
+    except ValueError:
+        return None
+
+
+def agrupar_por_pixel(claves: Iterable[Tuple[int, Optional[str]]]) -> List[List[int]]:
+    """
+    Agrupa IDs de parcela por píxel, en el orden de la primera aparición.
+
+    Args:
+        claves: Pares (parcela_id, clave del píxel); sin clave, la parcela va sola
+
+    Returns:
+        Lista de grupos; el primer ID de cada grupo representa al píxel
+    """
+    grupos: Dict[object, List[int]] = {}
+    for parcela_id, clave in claves:
+        grupos.setdefault(clave if clave is not None else ("parcela", parcela_id), []).append(parcela_id)
+    return list(grupos.values())
@@ -0,0 +1,348 @@
+"""
+Procesamiento de Resultados Satelitales
+Convierte las series de AppEEARS en estadísticas y estimaciones de biomasa y carbono
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from src.models.calculo_satelital import CalculoSatelital
+from src.models.parcela import Parcela
+from src.services.cache_appeears import get_cache_appeears
+from src.services.calidad_modis import aplicar_calidad_vi, porcentaje_nubosidad
+from src.services.suavizado_series import suavizar_series
+from src.services.csv_appeears import INDICES, SerieIndices, leer_csv_appeears, series_por_parcela
+from src.services.estadisticas_zonales import EstadisticasZonales, describir_archivo
+from src.services.observaciones_service import PRODUCTO_MOD13Q1, ObservacionesService
+from src.services.pixel_modis import pixel_modis
+from src.services.nasa_appeears_service import (
+    DESCARGAS_SIMULTANEAS,
+    NASAAppEEARSService,
+    estimar_biomasa_desde_ndvi,
+    estimar_carbono_desde_biomasa,
+    pixel_de_vertices
+)
+
+logger = logging.getLogger(__name__)
+
+
+def aplicar_serie_temporal(
+    db: Session,
+    calculo: CalculoSatelital,
+    serie: SerieIndices,
+    modelo_estimacion: str,
+    factor_carbono: float,
+    guardar_observaciones: bool = True,
+    producto: str = PRODUCTO_MOD13Q1
+) -> None:
+    """
+    Completa el cálculo con las estadísticas (ya ponderadas por calidad),
+    biomasa y carbono de la serie
+    y guarda sus puntos en `observaciones_satelitales` (no hace commit).
+
+    Args:
+        guardar_observaciones: False si la serie ya viene de `observaciones_satelitales`
+        producto: Producto de las observaciones (`producto_observaciones` del tipo de tarea)
+
+    Raises:
+        ValueError: Si la serie no tiene valores de NDVI
+    """
+    # Los compuestos recibidos cuentan aunque vengan enmascarados: no se vuelven a pedir
+    if guardar_observaciones:
+        ObservacionesService(db).registrar_compuestos(calculo.parcela_id, serie.fechas_recibidas, producto)
+
+    ndvi = serie.estadisticas["ndvi"]
+    evi = serie.estadisticas["evi"]
+    if ndvi.n == 0:
+        raise ValueError("No se encontraron datos válidos de NDVI en el CSV")
+
+    serie_temporal = serie.serie()
+
+    # Estimar biomasa sobre la serie suavizada (sin las caídas por nubes); si
+    # la serie no pasó por el suavizado, sobre la media ponderada por calidad
+    suavizados = [p['ndvi_suavizado'] for p in serie_temporal if p.get('ndvi_suavizado') is not None]
+    ndvi_base = sum(suavizados) / len(suavizados) if suavizados else ndvi.media
+    biomasa_mg = estimar_biomasa_desde_ndvi(ndvi_base, area_ha=0.1)
+    carbono = estimar_carbono_desde_biomasa(biomasa_mg, factor_carbono)
+
+    # Actualizar registro
+    calculo.fuente_datos = 'NASA_MODIS'
+    calculo.producto = producto
+    calculo.ndvi_promedio = ndvi.media
+    calculo.ndvi_min = ndvi.minimo
+    calculo.ndvi_max = ndvi.maximo
+    calculo.ndvi_std = ndvi.desviacion
+    calculo.evi_promedio = evi.media if evi.n else None
+    calculo.evi_min = evi.minimo
+    calculo.evi_max = evi.maximo
+    calculo.biomasa_aerea_estimada = biomasa_mg
+    calculo.biomasa_por_hectarea = biomasa_mg / 0.1
+    calculo.carbono_estimado = carbono
+    calculo.carbono_por_hectarea = carbono / 0.1
+    calculo.modelo_estimacion = modelo_estimacion
+    calculo.factor_carbono = factor_carbono
+    calculo.num_imagenes_usadas = len(serie_temporal)
+    calculo.cobertura_nubosidad_pct = porcentaje_nubosidad(serie_temporal)
+    calculo.calidad_datos = calculo.clasificar_calidad_ndvi()
+    calculo.estado_procesamiento = 'completado'
+
+    # Observaciones por parcela, capa y fecha (la serie ya no se guarda como JSON en el cálculo)
+    if calculo.id is None:
+        db.add(calculo)
+        db.flush()
+    if guardar_observaciones:
+        ObservacionesService(db).guardar_serie(
+            calculo.parcela_id, serie_temporal, calculo_id=calculo.id, producto=producto
+        )
+
+
+def pixeles_de_parcelas(parcelas: List[Parcela]) -> Dict[int, Optional[str]]:
+    """
+    parcela_id → clave del píxel MOD13Q1 de cada parcela.
+
+    Usa el píxel guardado en la parcela; si falta (parcela anterior a la
+    columna), lo calcula desde los vértices como lo hace la tarea point.
+    """
+    pixeles = {}
+    for parcela in parcelas:
+        clave = parcela.clave_pixel_modis
+        if clave is None and all(lat is not None and lon is not None for lat, lon in parcela.vertices):
+            clave = pixel_de_vertices([list(v) for v in parcela.vertices]).clave
+        pixeles[parcela.id] = clave
+    return pixeles
+
+
+def asignar_series(
+    db: Session,
+    series: Dict[str, SerieIndices],
+    compartir_pixel: bool = True
+) -> Tuple[Dict[int, Tuple[SerieIndices, str]], List[str]]:
+    """
+    Reparte entre las parcelas las series de un CSV con muchos puntos.
+
+    Primero por la columna 'ID' ('parcela_4'); los demás puntos, por su
+    píxel MOD13Q1 (columnas MODIS_Tile/Line_Y/Sample_X o, si faltan, sus
+    coordenadas) contra el píxel guardado de cada parcela. Cada serie llega
+    también a las demás parcelas de su píxel. Dos consultas en total.
+
+    Args:
+        compartir_pixel: False para medias zonales (Statistics), que valen
+            solo para su polígono: se asignan únicamente por ID
+
+    Returns:
+        (parcela_id → (serie, 'id' o 'pixel'), identificadores de las series sin parcela)
+    """
+    por_id = series_por_parcela(series)
+    existentes = pixeles_de_parcelas(db.query(Parcela).filter(Parcela.id.in_(list(por_id))).all())
+    asignadas = {parcela_id: (por_id[parcela_id], "id") for parcela_id in existentes}
+
+    # La serie de una parcela identificada por ID vale para todo su píxel
+    por_pixel: Dict[str, SerieIndices] = {}
+    if compartir_pixel:
+        for parcela_id, clave in existentes.items():
+            if clave:
+                por_pixel.setdefault(clave, por_id[parcela_id])
+        for serie in series.values():
+            clave = serie.pixel or (pixel_modis(*serie.coordenadas).clave if serie.coordenadas else None)
+            if clave:
+                por_pixel.setdefault(clave, serie)
+
+    if por_pixel:
+        tiles = {clave.split("_")[0] for clave in por_pixel}
+        candidatas = db.query(Parcela).filter(Parcela.modis_tile.in_(tiles)).all()
+        for parcela_id, clave in pixeles_de_parcelas(candidatas).items():
+            if parcela_id not in asignadas and clave in por_pixel:
+                asignadas[parcela_id] = (por_pixel[clave], "pixel")
+
+    usadas = {id(serie) for serie, _ in asignadas.values()}
+    sin_parcela = [identificador for identificador, serie in series.items() if id(serie) not in usadas]
+    return asignadas, sin_parcela
+
+
+def serie_desde_observaciones(puntos: List[Dict]) -> SerieIndices:
+    """
+    Serie armada con los puntos guardados (`ObservacionesService.serie`).
+
+    Conserva la calidad y el valor suavizado de cada fecha y recalcula
+    las estadísticas ponderadas por calidad.
+    """
+    serie = SerieIndices()
+    for punto in puntos:
+        for indice in INDICES:
+            if punto.get(indice) is not None:
+                serie.agregar(punto["fecha"], indice, punto[indice])
+        guardado = serie.puntos.get(punto["fecha"])
+        if guardado is None:
+            continue
+        guardado["calidad"] = punto.get("calidad") or "buena"
+        for indice in INDICES:
+            if punto.get(f"{indice}_suavizado") is not None:
+                guardado[f"{indice}_suavizado"] = punto[f"{indice}_suavizado"]
+    aplicar_calidad_vi({serie.identificador: serie})
+    return serie
+
+
+def aplicar_observaciones(
+    db: Session,
+    calculo: CalculoSatelital,
+    modelo_estimacion: str,
+    factor_carbono: float,
+    producto: str = PRODUCTO_MOD13Q1
+) -> bool:
+    """
+    Completa el cálculo solo con las observaciones ya guardadas de su
+    parcela, periodo y producto, sin pedir nada a AppEEARS (no hace commit).
+
+    Returns:
+        False si no hay observaciones de NDVI en el periodo
+    """
+    puntos = ObservacionesService(db).serie(calculo.parcela_id, calculo.fecha_inicio, calculo.fecha_fin, producto)
+    serie = serie_desde_observaciones(puntos)
+    if serie.estadisticas["ndvi"].n == 0:
+        return False
+    aplicar_serie_temporal(
+        db, calculo, serie, modelo_estimacion, factor_carbono, guardar_observaciones=False, producto=producto
+    )
+    return True
+
+
+def serie_con_estimaciones(serie_temporal: List[Dict], factor_carbono: float) -> List[Dict]:
+    """Agrega a cada punto con NDVI la biomasa y el carbono estimados (sobre el NDVI suavizado si está)"""
+    for punto in serie_temporal:
+        ndvi = punto.get('ndvi_suavizado', punto.get('ndvi'))
+        if ndvi is not None:
+            biomasa_dia = estimar_biomasa_desde_ndvi(ndvi, area_ha=0.1)
+            carbono_dia = estimar_carbono_desde_biomasa(biomasa_dia, factor_carbono)
+            punto['biomasa'] = round(biomasa_dia, 4)
+            punto['carbono'] = round(carbono_dia, 4)
+    return serie_temporal
+
+
+def _es_csv_mod13q1(archivo: Dict) -> bool:
+    nombre = archivo.get('file_name', '')
+    return nombre.endswith('.csv') and 'MOD13Q1' in nombre
+
+
+def series_en_cache(
+    task_id: str,
+    parcelas: Optional[Dict[int, List[List[float]]]] = None,
+    orden: Optional[List[int]] = None
+) -> Optional[Dict[str, SerieIndices]]:
+    """
+    Series de una tarea leídas solo desde la caché local (sin red).
+
+    Args:
+        parcelas: Para tareas area, parcela_id → vértices de los polígonos a resumir
+        orden: Para tareas area, IDs de parcela en el orden de la tarea
+
+    Returns:
+        None si el bundle o alguno de sus archivos no está en caché
+    """
+    cache = get_cache_appeears()
+    bundle = cache.obtener_bundle(task_id)
+    if bundle is None:
+        return None
+
+    filtro = _es_csv_mod13q1 if parcelas is None else _es_geotiff_mod13q1
+    archivos = []
+    for archivo in filter(filtro, bundle.get('files', [])):
+        ruta = cache.obtener(task_id, archivo.get('file_id'))
+        if ruta is None:
+            return None
+        archivos.append((archivo.get('file_name', ''), ruta))
+
+    if parcelas is None:
+        return _leer_series([ruta for _, ruta in archivos])
+    series = EstadisticasZonales(parcelas, orden).leer(archivos)
+    preparar_series(series)
+    return series
+
+
+def _es_geotiff_mod13q1(archivo: Dict) -> bool:
+    nombre = archivo.get('file_name', '')
+    return 'MOD13Q1' in nombre and describir_archivo(nombre) is not None
+
+
+def _obtener_archivos(nasa_service: NASAAppEEARSService, task_id: str, filtro) -> List[Tuple[str, str]]:
+    """
+    Nombre y ruta local de los archivos del bundle que pasan el filtro.
+
+    El listado del bundle y cada archivo se guardan en la caché local
+    (`APPEEARS_CACHE_DIR`); solo se descarga lo que falta, hasta
+    `DESCARGAS_SIMULTANEAS` archivos a la vez y reanudando las partes cortadas.
+    """
+    cache = get_cache_appeears()
+    bundle = cache.obtener_bundle(task_id)
+    if bundle is None:
+        bundle = nasa_service.obtener_resultados(task_id)
+        cache.guardar_bundle(task_id, bundle)
+
+    archivos = list(filter(filtro, bundle.get('files', [])))
+    if not archivos:
+        return []
+
+    def obtener(archivo: Dict) -> Tuple[str, str]:
+        file_id = archivo.get('file_id')
+        ruta = cache.obtener_o_descargar(
+            task_id,
+            file_id,
+            lambda destino: nasa_service.descargar_archivo(task_id, file_id, destino),
+            sha256=archivo.get('sha256')
+        )
+        return archivo.get('file_name', ''), ruta
+
+    # Los archivos faltantes se descargan en paralelo; se devuelven en el orden del bundle
+    with ThreadPoolExecutor(max_workers=min(DESCARGAS_SIMULTANEAS, len(archivos))) as executor:
+        return list(executor.map(obtener, archivos))
+
+
+def descargar_series_tarea(nasa_service: NASAAppEEARSService, task_id: str) -> Dict[str, SerieIndices]:
+    """
+    Obtiene los CSV de resultados de una tarea point, los lee en streaming y
+    pondera las observaciones por VI_Quality.
+
+    Returns:
+        Diccionario identificador de coordenada ('parcela_4') → SerieIndices
+    """
+    archivos = _obtener_archivos(nasa_service, task_id, _es_csv_mod13q1)
+    return _leer_series([ruta for _, ruta in archivos])
+
+
+def descargar_series_area(
+    nasa_service: NASAAppEEARSService,
+    task_id: str,
+    parcelas: Dict[int, List[List[float]]],
+    orden: List[int]
+) -> Dict[str, SerieIndices]:
+    """
+    Obtiene los GeoTIFF de una tarea area y resume cada polígono por fecha.
+
+    Args:
+        parcelas: parcela_id → vértices [[lat, lon], ...]
+        orden: IDs de parcela en el orden en que se enviaron a la tarea
+
+    Returns:
+        Diccionario identificador de coordenada ('parcela_4') → SerieIndices
+    """
+    archivos = _obtener_archivos(nasa_service, task_id, _es_geotiff_mod13q1)
+    series = EstadisticasZonales(parcelas, orden).leer(archivos)
+    preparar_series(series)
+    return series
+
+
+def _leer_series(rutas: List[str]) -> Dict[str, SerieIndices]:
+    series: Dict[str, SerieIndices] = {}
+    for ruta in rutas:
+        with open(ruta, 'r', encoding='utf-8-sig', newline='') as csvfile:
+            leer_csv_appeears(csvfile, series)
+    preparar_series(series)
+    return series
+
+
+def preparar_series(series: Dict[str, SerieIndices]) -> None:
+    """Clasifica por VI_Quality y suaviza en bloque todas las series leídas"""
+    aplicar_calidad_vi(series)
+    suavizar_series(series)
@@ -0,0 +1,251 @@
+"""
+Sincronización Satelital Programada
+Pide a AppEEARS solo los compuestos MOD13Q1 posteriores a lo ya guardado de cada parcela
+
+Uso (pasada nocturna, con el trabajador de la cola corriendo):
+    python -m src.services.sincronizacion_satelital
+"""
+
+import argparse
+import logging
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from src.models.estado_satelital_parcela import EstadoSatelitalParcela
+from src.models.observacion_satelital import ObservacionSatelital
+from src.models.parcela import Parcela
+from src.models.trabajo_satelital import TrabajoSatelital
+from src.services.csv_appeears import SerieIndices
+from src.services.nasa_appeears_service import MAX_COORDENADAS_POR_TAREA, dividir_en_lotes
+from src.services.observaciones_service import (
+    CAPAS_MOD13Q1,
+    LATENCIA_MOD13Q1,
+    PRODUCTO_MOD13Q1,
+    ObservacionesService,
+    fechas_compuestos_mod13q1,
+)
+from src.services.trabajador_satelital import TIPO_TAREA_APPEEARS, encolar_sincronizacion
+
+logger = logging.getLogger(__name__)
+
+# Historia que se pide la primera vez para una parcela sin observaciones
+DIAS_HISTORIA_INICIAL = 365
+
+
+def _tiene_vertices(parcela: Parcela) -> bool:
+    return all(lat is not None and lon is not None for lat, lon in parcela.vertices)
+
+
+class SincronizacionSatelitalService:
+    """
+    Mantiene al día las observaciones de las parcelas activas.
+
+    La marca de agua de cada parcela (la más reciente entre
+    `estado_satelital_parcela.ultima_fecha_sincronizada` y la última
+    observación NDVI guardada) define desde cuándo pedir. Una parcela se sincroniza solo si ya debería estar
+    publicado un compuesto posterior a su marca; las parcelas con la misma
+    marca van juntas en tareas point de hasta MAX_COORDENADAS_POR_TAREA.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _parcelas_activas(self, parcela_ids: Optional[List[int]]) -> List[Parcela]:
+        query = self.db.query(Parcela).filter(Parcela.estado == "activa")
+        if parcela_ids:
+            query = query.filter(Parcela.id.in_(parcela_ids))
+        return query.order_by(Parcela.id).all()
+
+    def _ultimas_observaciones(self, parcela_ids: List[int]) -> Dict[int, date]:
+        """parcela_id → fecha de la última observación NDVI guardada, en una consulta"""
+        query = self.db.query(
+            ObservacionSatelital.parcela_id,
+            func.max(ObservacionSatelital.fecha)
+        ).filter(
+            ObservacionSatelital.producto == PRODUCTO_MOD13Q1,
+            ObservacionSatelital.capa == CAPAS_MOD13Q1["ndvi"],
+            ObservacionSatelital.parcela_id.in_(parcela_ids)
+        ).group_by(ObservacionSatelital.parcela_id)
+        return dict(query.all())
+
+    def _estados(self, parcela_ids: List[int]) -> Dict[int, EstadoSatelitalParcela]:
+        return {
+            estado.parcela_id: estado
+            for estado in self.db.query(EstadoSatelitalParcela).filter(
+                EstadoSatelitalParcela.parcela_id.in_(parcela_ids)
+            )
+        }
+
+    def _en_curso(self) -> Set[int]:
+        """Parcelas con una sincronización encolada que todavía no terminó"""
+        trabajos = self.db.query(TrabajoSatelital.parametros).filter(
+            TrabajoSatelital.tipo == TIPO_TAREA_APPEEARS,
+            TrabajoSatelital.estado.in_(["pendiente", "en_curso"])
+        )
+        return {
+            parcela_id
+            for (parametros,) in trabajos
+            if parametros.get("sincronizacion")
+            for parcela_id in parametros.get("parcelas", [])
+        }
+
+    def marcas(self, parcelas: List[Parcela], hoy: date) -> Dict[int, Dict]:
+        """
+        Marca de agua de cada parcela y desde cuándo pedir.
+
+        Returns:
+            parcela_id → {"ultima_fecha_sincronizada", "sincronizado_en", "desde", "pendiente"}
+        """
+        ids = [p.id for p in parcelas]
+        estados = self._estados(ids)
+        ultimas = self._ultimas_observaciones(ids)
+        limite = hoy - LATENCIA_MOD13Q1
+
+        marcas = {}
+        for parcela in parcelas:
+            estado = estados.get(parcela.id)
+            # Lo subido a mano (CSV) o traído por un cálculo también cuenta como sincronizado
+            candidatas = [estado.ultima_fecha_sincronizada if estado else None, ultimas.get(parcela.id)]
+            ultima = max((f for f in candidatas if f is not None), default=None)
+            desde = ultima + timedelta(days=1) if ultima else hoy - timedelta(days=DIAS_HISTORIA_INICIAL)
+            marcas[parcela.id] = {
+                "ultima_fecha_sincronizada": ultima,
+                "sincronizado_en": estado.sincronizado_en if estado else None,
+                "desde": desde,
+                # Ya debería estar publicado al menos un compuesto posterior a la marca
+                "pendiente": bool(fechas_compuestos_mod13q1(desde, limite)),
+            }
+        return marcas
+
+    def programar(self, parcela_ids: Optional[List[int]] = None, hoy: Optional[date] = None) -> Dict:
+        """
+        Encola las sincronizaciones de las parcelas activas con compuestos
+        nuevos (hace commit, un trabajo por lote).
+
+        Args:
+            parcela_ids: Parcelas a considerar (default: todas las activas)
+            hoy: Fecha de referencia (default: hoy)
+
+        Returns:
+            {"parcelas_pendientes", "parcelas_al_dia", "parcelas_en_curso",
+             "parcelas_sin_vertices", "trabajos": [{"trabajo_id", "desde", "parcelas"}]}
+        """
+        hoy = hoy or date.today()
+        parcelas = self._parcelas_activas(parcela_ids)
+        sin_vertices = [p.id for p in parcelas if not _tiene_vertices(p)]
+        parcelas = [p for p in parcelas if _tiene_vertices(p)]
+
+        marcas = self.marcas(parcelas, hoy)
+        en_curso = self._en_curso()
+
+        # Agrupar por fecha de inicio: cada tarea pide exactamente lo que le falta a sus parcelas
+        por_desde: Dict[date, List[int]] = {}
+        for parcela in parcelas:
+            marca = marcas[parcela.id]
+            if marca["pendiente"] and parcela.id not in en_curso:
+                por_desde.setdefault(marca["desde"], []).append(parcela.id)
+
+        trabajos = []
+        for desde in sorted(por_desde):
+            for lote in dividir_en_lotes(por_desde[desde], MAX_COORDENADAS_POR_TAREA):
+                trabajo = encolar_sincronizacion(self.db, lote, desde, hoy)
+                trabajos.append({"trabajo_id": trabajo.id, "desde": desde, "parcelas": len(lote)})
+
+        pendientes = sum(len(ids) for ids in por_desde.values())
+        return {
+            "parcelas_pendientes": pendientes,
+            "parcelas_al_dia": sum(1 for marca in marcas.values() if not marca["pendiente"]),
+            "parcelas_en_curso": sum(1 for p in parcelas if marcas[p.id]["pendiente"] and p.id in en_curso),
+            "parcelas_sin_vertices": sin_vertices,
+            "trabajos": trabajos,
+        }
+
+    def registrar(self, series: Dict[int, SerieIndices], parcela_ids: List[int]) -> Dict[int, Optional[date]]:
+        """
+        Agrega las observaciones descargadas y avanza la marca de agua de
+        cada parcela hasta el último compuesto recibido, con o sin NDVI
+        utilizable (no hace commit).
+
+        La serie de cada parcela se vuelve a suavizar entera: los compuestos
+        nuevos cambian el suavizado de los últimos ya guardados.
+
+        Returns:
+            parcela_id → nueva marca de agua (None si la tarea no trajo datos)
+        """
+        observaciones = ObservacionesService(self.db)
+        recibidas: Dict[int, Optional[date]] = {}
+        con_datos = []
+        for parcela_id in parcela_ids:
+            serie = series.get(parcela_id)
+            if serie is not None and any(p.get("ndvi") is not None for p in serie.serie()):
+                observaciones.guardar_serie(parcela_id, serie.serie())
+                con_datos.append(parcela_id)
+            # Un compuesto enmascarado también avanza la marca: pedirlo de nuevo traería lo mismo
+            fechas = serie.fechas_recibidas if serie is not None else set()
+            observaciones.registrar_compuestos(parcela_id, fechas)
+            recibidas[parcela_id] = date.fromisoformat(max(fechas)) if fechas else None
+        if con_datos:
+            observaciones.suavizar(con_datos)
+
+        estados = self._estados(parcela_ids)
+        for parcela_id, ultima in recibidas.items():
+            estado = estados.get(parcela_id)
+            if estado is None:
+                estado = EstadoSatelitalParcela(parcela_id=parcela_id, observaciones_evaluadas=0)
+                self.db.add(estado)
+            if ultima and (estado.ultima_fecha_sincronizada is None or ultima > estado.ultima_fecha_sincronizada):
+                estado.ultima_fecha_sincronizada = ultima
+            estado.sincronizado_en = func.now()
+        # La sesión no hace autoflush: la detección de cambios consulta estas filas a continuación
+        self.db.flush()
+        return recibidas
+
+    def listar(self, parcela_id: Optional[int] = None, hoy: Optional[date] = None) -> List[Dict]:
+        """Marca de agua de la sincronización de cada parcela activa"""
+        hoy = hoy or date.today()
+        parcelas = self._parcelas_activas([parcela_id] if parcela_id else None)
+        marcas = self.marcas(parcelas, hoy)
+        return [
+            {
+                "parcela_id": parcela.id,
+                "codigo": parcela.codigo,
+                "ultima_fecha_sincronizada": marcas[parcela.id]["ultima_fecha_sincronizada"],
+                "sincronizado_en": marcas[parcela.id]["sincronizado_en"],
+                "proxima_desde": marcas[parcela.id]["desde"],
+                "pendiente": marcas[parcela.id]["pendiente"],
+            }
+            for parcela in parcelas
+        ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Encola la sincronización de las parcelas con compuestos MOD13Q1 nuevos")
+    parser.add_argument("--parcela", type=int, action="append", help="Solo estas parcelas (repetible)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    # Importación diferida: registra todos los modelos antes de consultar
+    from config.database import SessionLocal
+    import src.models  # noqa: F401
+
+    db = SessionLocal()
+    try:
+        resultado = SincronizacionSatelitalService(db).programar(args.parcela)
+    finally:
+        db.close()
+
+    logger.info(
+        f"Sincronización: {resultado['parcelas_pendientes']} parcelas encoladas en "
+        f"{len(resultado['trabajos'])} trabajos, {resultado['parcelas_al_dia']} al día, "
+        f"{resultado['parcelas_en_curso']} ya en curso"
+    )
+    if resultado["parcelas_sin_vertices"]:
+        logger.warning(f"Parcelas activas sin vértices: {resultado['parcelas_sin_vertices']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Carga columnar de árboles para cálculos
+Obtiene solo las columnas necesarias en una consulta y las entrega como arreglos NumPy
+"""
+
+from typing import Sequence, Union
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from src.models.arbol import Arbol
+from src.models.especie import Especie
+
+
+class SnapshotArboles:
+    """
+    Vista columnar e inmutable de los árboles de una o varias parcelas.
+
+    Cada atributo es un arreglo contiguo con un elemento por árbol. Los
+    valores ausentes se representan con NaN (y -1 en `subparcela_id`).
+    """
+
+    COLUMNAS = ("parcela_id", "subparcela_id", "dap", "altura", "densidad_madera", "factor_carbono")
+
+    def __init__(
+        self,
+        parcela_id: np.ndarray,
+        subparcela_id: np.ndarray,
+        dap: np.ndarray,
+        altura: np.ndarray,
+        densidad_madera: np.ndarray,
+        factor_carbono: np.ndarray
+    ):
+        self.parcela_id = parcela_id
+        self.subparcela_id = subparcela_id
+        self.dap = dap
+        self.altura = altura
+        self.densidad_madera = densidad_madera
+        self.factor_carbono = factor_carbono
+
+    def __len__(self) -> int:
+        return self.dap.shape[0]
+
+    def __repr__(self):
+        return f"<SnapshotArboles(num_arboles={len(self)})>"
+
+    @classmethod
+    def desde_filas(cls, filas: Sequence[tuple]) -> "SnapshotArboles":
+        """
+        Construye el snapshot a partir de filas (parcela_id, subparcela_id,
+        dap, altura, densidad_madera, factor_carbono).
+        """
+        if not filas:
+            matriz = np.empty((0, len(cls.COLUMNAS)))
+        else:
+            # dtype=float convierte los None en NaN
+            matriz = np.array(filas, dtype=float)
+
+        subparcela = matriz[:, 1]
+        return cls(
+            parcela_id=np.ascontiguousarray(matriz[:, 0], dtype=np.int64),
+            subparcela_id=np.ascontiguousarray(np.where(np.isnan(subparcela), -1, subparcela), dtype=np.int64),
+            dap=np.ascontiguousarray(matriz[:, 2]),
+            altura=np.ascontiguousarray(matriz[:, 3]),
+            densidad_madera=np.ascontiguousarray(matriz[:, 4]),
+            factor_carbono=np.ascontiguousarray(matriz[:, 5])
+        )
+
+
+def consulta_snapshot_arboles(parcela_ids: Union[int, Sequence[int], None] = None):
+    """
+    Construye la consulta Core (sin ORM) del snapshot de árboles.
+
+    Args:
+        parcela_ids: ID de parcela, lista de IDs o None para todo el proyecto
+
+    Returns:
+        Sentencia SELECT con las columnas de `SnapshotArboles.COLUMNAS`
+    """
+    stmt = (
+        select(
+            Arbol.parcela_id,
+            Arbol.subparcela_id,
+            Arbol.dap,
+            Arbol.altura,
+            Especie.densidad_madera,
+            Especie.factor_carbono
+        )
+        .select_from(Arbol)
+        .outerjoin(Especie, Arbol.especie_id == Especie.id)
+    )
+
+    if isinstance(parcela_ids, int):
+        stmt = stmt.where(Arbol.parcela_id == parcela_ids)
+    elif parcela_ids is not None:
+        stmt = stmt.where(Arbol.parcela_id.in_(list(parcela_ids)))
+
+    return stmt.order_by(Arbol.parcela_id, Arbol.id)
+
+
+def cargar_snapshot_arboles(
+    db: Session,
+    parcela_ids: Union[int, Sequence[int], None] = None
+) -> SnapshotArboles:
+    """
+    Carga los datos de árboles necesarios para el cálculo en una sola consulta.
+
+    Evita cargar objetos Arbol completos y el acceso perezoso a `arbol.especie`
+    por cada árbol (consultas N+1).
+
+    Args:
+        db: Sesión de base de datos
+        parcela_ids: ID de parcela, lista de IDs o None para todo el proyecto
+
+    Returns:
+        SnapshotArboles con arreglos listos para `BiomasaCalculator.calcular_biomasa_lote`
+    """
+    filas = db.execute(consulta_snapshot_arboles(parcela_ids)).all()
+    return SnapshotArboles.desde_filas(filas)
@@ -0,0 +1,65 @@
+"""
+Solicitudes Satelitales en Curso
+Una sola tarea remota por parcela, periodo, producto y modelo mientras la primera no termina
+"""
+
+import hashlib
+from datetime import date
+from typing import Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from src.models.calculo_satelital import CalculoSatelital
+from src.services.observaciones_service import PRODUCTO_MOD13Q1
+
+
+def clave_solicitud(
+    parcela_id: int,
+    fecha_inicio: date,
+    fecha_fin: date,
+    modelo_estimacion: str,
+    tipo_tarea: str = "point",
+    producto: str = PRODUCTO_MOD13Q1
+) -> str:
+    """
+    Clave SHA-256 de una solicitud (parcela, periodo, producto y modelo).
+
+    El tipo de tarea es parte del producto: point y area dan resultados distintos.
+    """
+    partes = (parcela_id, fecha_inicio.isoformat(), fecha_fin.isoformat(), producto, tipo_tarea, modelo_estimacion)
+    return hashlib.sha256(repr(partes).encode("utf-8")).hexdigest()
+
+
+def buscar_en_curso(db: Session, clave: str) -> Optional[CalculoSatelital]:
+    """Cálculo de la misma solicitud que todavía no terminó, si existe"""
+    return db.query(CalculoSatelital).filter(CalculoSatelital.solicitud_en_curso == clave).first()
+
+
+def registrar_solicitud(db: Session, calculo: CalculoSatelital, clave: str) -> Tuple[CalculoSatelital, bool]:
+    """
+    Guarda el cálculo como la solicitud en curso de su clave (hace commit).
+
+    La unicidad de `solicitud_en_curso` decide entre solicitudes simultáneas,
+    en el mismo proceso o en otros: la primera en guardarse crea la tarea
+    remota y las demás se unen a ella.
+
+    Returns:
+        (cálculo, creado): el cálculo nuevo o el que ya estaba en curso
+    """
+    for _ in range(2):
+        calculo.solicitud_en_curso = clave
+        db.add(calculo)
+        try:
+            db.commit()
+        except IntegrityError:
+            # Otra solicitud idéntica se guardó primero
+            db.rollback()
+            existente = buscar_en_curso(db, clave)
+            if existente is not None:
+                return existente, False
+            # La otra terminó entre el conflicto y la consulta: la clave ya está libre
+            continue
+        db.refresh(calculo)
+        return calculo, True
+    raise ValueError("No se pudo registrar la solicitud satelital")
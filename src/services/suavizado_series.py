@@ -0,0 +1,154 @@
+"""
+Suavizado de Series Satelitales
+Savitzky-Golay con pesos de calidad y relleno de huecos sobre la matriz parcelas × fechas
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy.signal import savgol_filter
+
+from src.services.calidad_modis import PESO_POR_CALIDAD
+from src.services.csv_appeears import INDICES, RANGO_VALIDO
+
+# Ventana de 7 compuestos de 16 días (~3,5 meses) y polinomio de grado 2
+VENTANA_SG = 7
+ORDEN_SG = 2
+
+# Pasadas de ajuste hacia la envolvente superior (nubes y aerosoles bajan el NDVI)
+ITERACIONES_SG = 2
+
+
+def rellenar_huecos(valores: np.ndarray, validos: np.ndarray) -> np.ndarray:
+    """
+    Interpolación lineal a lo largo de cada fila, sin bucles por fila.
+
+    Los extremos toman el valor válido más cercano; las filas sin ningún
+    valor válido quedan en NaN.
+    """
+    filas, columnas = valores.shape
+    posiciones = np.arange(columnas)
+
+    # Índice del último válido a la izquierda y del próximo a la derecha de cada celda
+    anterior = np.maximum.accumulate(np.where(validos, posiciones, -1), axis=1)
+    siguiente = np.minimum.accumulate(np.where(validos, posiciones, columnas)[:, ::-1], axis=1)[:, ::-1]
+
+    sin_anterior = anterior < 0
+    sin_siguiente = siguiente >= columnas
+    anterior = np.where(sin_anterior, siguiente, anterior)
+    siguiente = np.where(sin_siguiente, anterior, siguiente)
+
+    vacias = ~validos.any(axis=1)
+    anterior[vacias] = 0
+    siguiente[vacias] = 0
+
+    fila = np.arange(filas)[:, None]
+    izquierda = valores[fila, anterior]
+    derecha = valores[fila, siguiente]
+    tramo = np.where(siguiente > anterior, siguiente - anterior, 1)
+    fraccion = (posiciones - anterior) / tramo
+
+    rellenos = izquierda + (derecha - izquierda) * fraccion
+    rellenos[vacias] = np.nan
+    return np.where(validos, valores, rellenos)
+
+
+def suavizar_matriz(
+    valores: np.ndarray,
+    pesos: np.ndarray,
+    ventana: int = VENTANA_SG,
+    orden: int = ORDEN_SG,
+    iteraciones: int = ITERACIONES_SG
+) -> np.ndarray:
+    """
+    Suaviza y rellena una matriz parcelas × fechas en bloque.
+
+    1. Las celdas sin valor o con peso 0 (nubosidad, agua) se rellenan
+       por interpolación lineal.
+    2. Savitzky-Golay a lo largo del eje de fechas para todas las filas.
+    3. En cada iteración los valores de peso menor que 1 se acercan a la
+       curva suavizada cuando quedan por debajo (envolvente superior) y
+       se vuelve a filtrar.
+
+    Args:
+        valores: Matriz (parcelas, fechas) con NaN donde no hay observación
+        pesos: Matriz del mismo tamaño con pesos de calidad entre 0 y 1
+
+    Returns:
+        Matriz suavizada (NaN solo en filas sin ningún valor válido)
+    """
+    valores = np.asarray(valores, dtype=float)
+    pesos = np.nan_to_num(np.asarray(pesos, dtype=float))
+    validos = ~np.isnan(valores) & (pesos > 0)
+
+    serie = rellenar_huecos(valores, validos)
+
+    # La ventana debe ser impar, mayor que el orden y no más larga que la serie
+    ventana = min(ventana, serie.shape[1] - (1 - serie.shape[1] % 2))
+    if ventana <= orden:
+        return np.clip(serie, *RANGO_VALIDO)
+
+    sin_datos = np.isnan(serie).all(axis=1)
+    base = np.where(sin_datos[:, None], 0.0, serie)
+    suave = savgol_filter(base, ventana, orden, axis=1, mode="interp")
+
+    for _ in range(iteraciones):
+        envolvente = np.maximum(base, suave)
+        ajustada = np.where(validos, pesos * base + (1 - pesos) * envolvente, suave)
+        suave = savgol_filter(ajustada, ventana, orden, axis=1, mode="interp")
+
+    suave = np.clip(suave, *RANGO_VALIDO)
+    suave[sin_datos] = np.nan
+    return suave
+
+
+def matriz_desde_puntos(
+    series: Dict[object, Sequence[Dict]],
+    indice: str
+) -> Tuple[List[object], List[str], np.ndarray, np.ndarray]:
+    """
+    Arma la matriz de un índice a partir de series de puntos {'fecha', indice, 'calidad'}.
+
+    Las columnas son la unión de fechas de todas las series (los compuestos
+    MODIS de 16 días coinciden entre parcelas).
+
+    Returns:
+        (claves de fila, fechas ISO de columna, valores, pesos)
+    """
+    claves = list(series)
+    fechas = sorted({str(punto["fecha"]) for puntos in series.values() for punto in puntos})
+    columna = {fecha: j for j, fecha in enumerate(fechas)}
+
+    valores = np.full((len(claves), len(fechas)), np.nan)
+    pesos = np.zeros((len(claves), len(fechas)))
+    for i, clave in enumerate(claves):
+        for punto in series[clave]:
+            valor = punto.get(indice)
+            if valor is None:
+                continue
+            j = columna[str(punto["fecha"])]
+            valores[i, j] = valor
+            pesos[i, j] = PESO_POR_CALIDAD.get(punto.get("calidad"), 1.0)
+    return claves, fechas, valores, pesos
+
+
+def suavizar_series(series: Dict, indices: Optional[Sequence[str]] = None) -> None:
+    """
+    Agrega '<indice>_suavizado' a cada punto de las series leídas de AppEEARS.
+
+    Todas las series (SerieIndices por identificador) se suavizan en una
+    sola matriz por índice.
+    """
+    puntos = {clave: serie.serie() for clave, serie in series.items() if len(serie)}
+    if not puntos:
+        return
+
+    for indice in indices or INDICES:
+        claves, fechas, valores, pesos = matriz_desde_puntos(puntos, indice)
+        suave = suavizar_matriz(valores, pesos)
+        for i, clave in enumerate(claves):
+            if np.isnan(suave[i]).all():
+                continue
+            fila = dict(zip(fechas, suave[i].tolist()))
+            for punto in puntos[clave]:
+                punto[f"{indice}_suavizado"] = round(fila[punto["fecha"]], 4)
@@ -0,0 +1,392 @@
+"""
+Trabajador de la Cola Satelital
+Procesa los trabajos de `trabajos_satelitales` fuera del proceso de la API
+
+Uso:
+    python -m src.services.trabajador_satelital --hilos 2
+"""
+
+import argparse
+import logging
+import os
+import random
+import signal
+import socket
+import threading
+from contextlib import contextmanager
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from config.database import SessionLocal
+from config.settings import get_settings
+from src.models.calculo_satelital import CalculoSatelital
+from src.models.parcela import Parcela
+from src.models.trabajo_satelital import TrabajoSatelital
+from src.services.cola_satelital import (
+    ColaSatelitalService,
+    INTERVALO_LATIDO,
+    ahora_utc,
+    como_utc,
+)
+from src.services.nasa_appeears_async import FACTOR_BACKOFF, INTERVALO_INICIAL, INTERVALO_MAXIMO
+from src.services.csv_appeears import repartir_por_pixel, series_por_parcela
+from src.services.deteccion_cambios import DeteccionCambiosService
+from src.services.nasa_appeears_service import NASAAppEEARSService
+from src.services.observaciones_service import ObservacionesService, producto_observaciones
+from src.services.procesamiento_satelital import (
+    aplicar_observaciones,
+    aplicar_serie_temporal,
+    descargar_series_area,
+    descargar_series_tarea,
+    pixeles_de_parcelas,
+)
+
+logger = logging.getLogger(__name__)
+
+TIPO_TAREA_APPEEARS = "tarea_appeears"
+
+# Tiempo máximo desde que se encoló el trabajo hasta que AppEEARS termina la tarea
+TIEMPO_MAXIMO_TAREA = timedelta(hours=6)
+
+
+def encolar_tarea_appeears(
+    db: Session,
+    calculos: Dict[int, int],
+    fecha_inicio: date,
+    fecha_fin: date,
+    modelo_estimacion: str,
+    factor_carbono: float,
+    nasa_task_id: Optional[str] = None,
+    tipo_tarea: str = "point",
+    orden: Optional[List[int]] = None,
+    completar_con_observaciones: bool = False
+) -> TrabajoSatelital:
+    """
+    Encola el seguimiento de una tarea point o area de AppEEARS.
+
+    Args:
+        calculos: parcela_id → calculo_id de los cálculos que llena la tarea
+        nasa_task_id: Tarea ya creada; si falta, el trabajador la crea
+        tipo_tarea: 'point' (CSV) o 'area' (GeoTIFF con estadísticas zonales)
+        orden: IDs de parcela en el orden de una tarea area ya creada
+            (AppEEARS nombra los GeoTIFF por posición: aid0001, aid0002...)
+        completar_con_observaciones: La tarea solo pide las fechas que faltaban;
+            al terminar, los cálculos se completan con todo lo guardado del periodo
+    """
+    parametros = {
+        "calculos": {str(parcela_id): calculo_id for parcela_id, calculo_id in calculos.items()},
+        "fecha_inicio": fecha_inicio.isoformat(),
+        "fecha_fin": fecha_fin.isoformat(),
+        "modelo_estimacion": modelo_estimacion,
+        "factor_carbono": factor_carbono,
+        "tipo_tarea": tipo_tarea,
+    }
+    if orden is not None:
+        parametros["orden"] = list(orden)
+    if completar_con_observaciones:
+        parametros["completar_con_observaciones"] = True
+    return ColaSatelitalService(db).encolar(TIPO_TAREA_APPEEARS, parametros, nasa_task_id=nasa_task_id)
+
+
+def encolar_sincronizacion(
+    db: Session,
+    parcela_ids: List[int],
+    fecha_inicio: date,
+    fecha_fin: date
+) -> TrabajoSatelital:
+    """
+    Encola una tarea point que solo agrega observaciones de las parcelas,
+    sin cálculos asociados (ver `sincronizacion_satelital.py`).
+    """
+    parametros = {
+        "calculos": {},
+        "parcelas": list(parcela_ids),
+        "fecha_inicio": fecha_inicio.isoformat(),
+        "fecha_fin": fecha_fin.isoformat(),
+        "tipo_tarea": "point",
+        "sincronizacion": True,
+    }
+    return ColaSatelitalService(db).encolar(TIPO_TAREA_APPEEARS, parametros)
+
+
+def parametros_de_tarea(db: Session, nasa_task_id: str) -> Optional[Dict]:
+    """Parámetros del último trabajo que siguió la tarea de AppEEARS (tipo y orden de parcelas)"""
+    trabajo = (
+        db.query(TrabajoSatelital)
+        .filter(TrabajoSatelital.nasa_task_id == nasa_task_id)
+        .order_by(TrabajoSatelital.id.desc())
+        .first()
+    )
+    return trabajo.parametros if trabajo else None
+
+
+def _calculos_del_trabajo(db: Session, trabajo: TrabajoSatelital):
+    calculo_ids = list(trabajo.parametros["calculos"].values())
+    return db.query(CalculoSatelital).filter(CalculoSatelital.id.in_(calculo_ids)).all()
+
+
+def marcar_calculos_error(db: Session, trabajo: TrabajoSatelital, mensaje: str) -> None:
+    """Marca como error los cálculos del trabajo que no llegaron a completarse (hace commit)"""
+    for calculo in _calculos_del_trabajo(db, trabajo):
+        if calculo.estado_procesamiento != "completado":
+            calculo.estado_procesamiento = "error"
+            calculo.error_mensaje = mensaje
+    db.commit()
+
+
+class TrabajadorSatelital:
+    """
+    Toma trabajos de la cola y los avanza un paso por vez.
+
+    Ningún paso espera a AppEEARS: si la tarea sigue en proceso, el trabajo
+    vuelve a la cola con una espera creciente y el trabajador sigue con
+    otro. Mientras un paso corre, un hilo aparte renueva el latido.
+    """
+
+    def __init__(self, nombre: Optional[str] = None):
+        self.nombre = nombre or f"{socket.gethostname()}:{os.getpid()}"
+        self._nasa: Optional[NASAAppEEARSService] = None
+
+    def _servicio_nasa(self) -> NASAAppEEARSService:
+        """Servicio AppEEARS del trabajador (token en caché compartido)"""
+        if self._nasa is None:
+            settings = get_settings()
+            if not settings.NASA_EARTHDATA_USERNAME or not settings.NASA_EARTHDATA_PASSWORD:
+                raise ValueError("NASA_EARTHDATA_USERNAME y NASA_EARTHDATA_PASSWORD deben estar configurados")
+            self._nasa = NASAAppEEARSService(
+                settings.NASA_EARTHDATA_USERNAME,
+                password=settings.NASA_EARTHDATA_PASSWORD
+            )
+        return self._nasa
+
+    @contextmanager
+    def _latidos(self, trabajo_id: int):
+        """Renueva el latido del trabajo en segundo plano mientras dura el bloque"""
+        detener = threading.Event()
+
+        def latir():
+            db = SessionLocal()
+            try:
+                while not detener.wait(INTERVALO_LATIDO):
+                    if not ColaSatelitalService(db).latir(trabajo_id, self.nombre):
+                        logger.warning(f"Trabajo {trabajo_id}: ya no pertenece a {self.nombre}")
+                        return
+            finally:
+                db.close()
+
+        hilo = threading.Thread(target=latir, name=f"latido-{trabajo_id}", daemon=True)
+        hilo.start()
+        try:
+            yield
+        finally:
+            detener.set()
+            hilo.join()
+
+    def ejecutar_uno(self) -> bool:
+        """
+        Toma y avanza un trabajo.
+
+        Returns:
+            False si no había trabajos disponibles
+        """
+        db = SessionLocal()
+        try:
+            cola = ColaSatelitalService(db)
+            trabajo = cola.reclamar(self.nombre, tipos=list(MANEJADORES))
+            if trabajo is None:
+                return False
+
+            with self._latidos(trabajo.id):
+                try:
+                    MANEJADORES[trabajo.tipo](self, db, cola, trabajo)
+                except Exception as e:
+                    logger.exception(f"Trabajo {trabajo.id} falló")
+                    db.rollback()
+                    if cola.fallar(trabajo, str(e)):
+                        marcar_calculos_error(db, trabajo, str(e))
+            return True
+        finally:
+            db.close()
+
+    def ejecutar(self, detener: threading.Event, espera_vacia: float = 5.0) -> None:
+        """Procesa trabajos hasta que se active `detener`"""
+        logger.info(f"Trabajador {self.nombre} iniciado")
+        while not detener.is_set():
+            try:
+                if not self.ejecutar_uno():
+                    detener.wait(espera_vacia)
+            except Exception:
+                # Error de la propia cola (por ejemplo, base de datos caída)
+                logger.exception("Error al tomar trabajo de la cola")
+                detener.wait(espera_vacia)
+        logger.info(f"Trabajador {self.nombre} detenido")
+
+    def procesar_tarea_appeears(self, db: Session, cola: ColaSatelitalService, trabajo: TrabajoSatelital) -> None:
+        """
+        Un paso del seguimiento de una tarea point o area de AppEEARS:
+        crear la tarea, consultar su estado o repartir los resultados
+        (entre los cálculos o, en una sincronización, entre las observaciones).
+        """
+        nasa = self._servicio_nasa()
+        parametros = trabajo.parametros
+        tipo_tarea = parametros.get("tipo_tarea", "point")
+
+        # Paso 1: crear la tarea (solo si se encoló sin ella)
+        if not trabajo.nasa_task_id:
+            calculos = _calculos_del_trabajo(db, trabajo)
+            parcela_ids = parametros.get("parcelas") or [c.parcela_id for c in calculos]
+            parcelas = db.query(Parcela).filter(Parcela.id.in_(parcela_ids)).all()
+            tareas = nasa.crear_tarea_ndvi_lote(
+                [{"parcela_id": p.id, "vertices": [list(v) for v in p.vertices]} for p in parcelas],
+                date.fromisoformat(parametros["fecha_inicio"]),
+                date.fromisoformat(parametros["fecha_fin"]),
+                tipo_tarea=tipo_tarea
+            )
+            # Quien encola agrupa hasta MAX_COORDENADAS_POR_TAREA (o MAX_POLIGONOS_POR_TAREA) parcelas por trabajo
+            trabajo.nasa_task_id, orden = tareas[0]
+            # JSON se reasigna entero para que SQLAlchemy detecte el cambio
+            trabajo.parametros = {**parametros, "orden": orden}
+            for calculo in calculos:
+                calculo.nasa_task_id = trabajo.nasa_task_id
+                calculo.estado_procesamiento = "procesando"
+            cola.reprogramar(trabajo, INTERVALO_INICIAL)
+            return
+
+        # Paso 2: consultar el estado (una consulta por paso, sin dormir). Si el
+        # monitor ya vio la tarea terminada en el listado, no hace falta consultar
+        estado = {"status": "done"}
+        if trabajo.estado_nasa != "done":
+            estado = nasa.verificar_estado_tarea(trabajo.nasa_task_id)
+            trabajo.estado_nasa = estado.get("status")
+            trabajo.consultas = (trabajo.consultas or 0) + 1
+
+        if trabajo.estado_nasa == "error":
+            mensaje = f"La tarea falló en AppEEARS: {estado.get('message', 'Sin mensaje')}"
+            cola.fallar(trabajo, mensaje, definitivo=True)
+            marcar_calculos_error(db, trabajo, mensaje)
+            return
+
+        if trabajo.estado_nasa != "done":
+            if ahora_utc() - como_utc(trabajo.created_at) > TIEMPO_MAXIMO_TAREA:
+                mensaje = "La tarea no se completó en el tiempo esperado"
+                cola.fallar(trabajo, mensaje, definitivo=True)
+                marcar_calculos_error(db, trabajo, mensaje)
+                return
+            intervalo = min(INTERVALO_INICIAL * FACTOR_BACKOFF ** (trabajo.consultas - 1), INTERVALO_MAXIMO)
+            cola.reprogramar(trabajo, intervalo * random.uniform(0.9, 1.1))
+            return
+
+        # Paso 3: descargar los resultados una vez y repartirlos por parcela
+        # (columna 'ID' y píxel del CSV o polígono 'aidNNNN' de los GeoTIFF)
+        calculos = _calculos_del_trabajo(db, trabajo)
+        parcela_ids = parametros.get("parcelas") or [c.parcela_id for c in calculos]
+        parcelas = db.query(Parcela).filter(Parcela.id.in_(parcela_ids)).all()
+        if tipo_tarea == "area":
+            series = series_por_parcela(descargar_series_area(
+                nasa,
+                trabajo.nasa_task_id,
+                {p.id: [list(v) for v in p.vertices] for p in parcelas},
+                parametros.get("orden") or [p.id for p in parcelas]
+            ))
+        else:
+            series = repartir_por_pixel(
+                series_por_parcela(descargar_series_tarea(nasa, trabajo.nasa_task_id)),
+                pixeles_de_parcelas(parcelas)
+            )
+
+        # Sincronización programada: solo agregar observaciones y avanzar la marca de agua
+        if parametros.get("sincronizacion"):
+            # Importación diferida: la sincronización encola con las funciones de este módulo
+            from src.services.sincronizacion_satelital import SincronizacionSatelitalService
+
+            SincronizacionSatelitalService(db).registrar(series, parametros["parcelas"])
+            DeteccionCambiosService(db).evaluar(parametros["parcelas"])
+            cola.completar(trabajo)
+            return
+
+        completar = parametros.get("completar_con_observaciones", False)
+        producto = producto_observaciones(tipo_tarea)
+        for calculo in calculos:
+            serie = series.get(calculo.parcela_id)
+            if serie is not None and serie.estadisticas["ndvi"].n > 0:
+                aplicar_serie_temporal(
+                    db,
+                    calculo,
+                    serie,
+                    parametros["modelo_estimacion"],
+                    parametros["factor_carbono"],
+                    producto=producto
+                )
+                continue
+            if serie is not None:
+                # Solo compuestos enmascarados: registrarlos para no volver a pedirlos
+                ObservacionesService(db).registrar_compuestos(calculo.parcela_id, serie.fechas_recibidas, producto)
+            if not completar:
+                calculo.estado_procesamiento = "error"
+                calculo.error_mensaje = "Los resultados de la tarea no traen datos para esta parcela"
+
+        # La tarea trajo solo las fechas que faltaban: suavizar la serie ya
+        # unida y recalcular cada cálculo con todo su periodo
+        if completar:
+            ObservacionesService(db).suavizar([c.parcela_id for c in calculos], producto)
+            for calculo in calculos:
+                if not aplicar_observaciones(
+                    db, calculo, parametros["modelo_estimacion"], parametros["factor_carbono"], producto
+                ):
+                    calculo.estado_procesamiento = "error"
+                    calculo.error_mensaje = "No hay observaciones de NDVI para el periodo"
+
+        # Compuestos nuevos: reevaluar la detección de cambios de estas parcelas
+        DeteccionCambiosService(db).evaluar([calculo.parcela_id for calculo in calculos], producto=producto)
+
+        cola.completar(trabajo)
+
+
+# Tipo de trabajo → método que ejecuta un paso
+MANEJADORES = {
+    TIPO_TAREA_APPEEARS: TrabajadorSatelital.procesar_tarea_appeears,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Trabajador de la cola de procesamiento satelital")
+    parser.add_argument("--hilos", type=int, default=1, help="Trabajadores en este proceso")
+    parser.add_argument("--espera", type=float, default=5.0, help="Segundos de espera con la cola vacía")
+    parser.add_argument(
+        "--sin-monitor",
+        action="store_true",
+        help="No seguir las tareas con el monitor (cada trabajo consulta su tarea)"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(threadName)s %(levelname)s %(message)s")
+
+    detener = threading.Event()
+    for senal in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(senal, lambda *_: detener.set())
+
+    base = f"{socket.gethostname()}:{os.getpid()}"
+    hilos = [
+        threading.Thread(
+            target=TrabajadorSatelital(f"{base}:{i}").ejecutar,
+            args=(detener, args.espera),
+            name=f"trabajador-{i}"
+        )
+        for i in range(args.hilos)
+    ]
+    if not args.sin_monitor:
+        # Importación diferida: el monitor usa las funciones de este módulo
+        from src.services.monitor_appeears import MonitorTareasAppEEARS
+
+        monitor = MonitorTareasAppEEARS(TrabajadorSatelital(f"{base}:monitor")._servicio_nasa)
+        hilos.append(threading.Thread(target=monitor.ejecutar, args=(detener,), name="monitor-appeears"))
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,9 @@ FACTOR_CARBONO = 0.47  # Factor estándar de conversión biomasa → carbono
 FACTOR_CARBONO_MIN = 0.45
 FACTOR_CARBONO_MAX = 0.50
 
+# Biomasa subterránea (raíces) como fracción de la aérea - IPCC bosques tropicales
+FACTOR_RAICES = 0.25
+
 # Parcelas
 AREA_PARCELA_HA = 0.1  # Hectáreas
 AREA_PARCELA_M2 = 1000  # Metros cuadrados
@@ -52,6 +55,16 @@ DENSIDAD_MADERA_MEDIA = 0.60
 DENSIDAD_MADERA_ALTA = 0.80
 DENSIDAD_MADERA_PROMEDIO = 0.60  # Valor por defecto para especies desconocidas
 
+# Incertidumbre (simulación Monte Carlo)
+N_SIMULACIONES_DEFECTO = 1000
+NIVEL_CONFIANZA_DEFECTO = 0.95
+ERROR_DAP_PENDIENTE = 0.0062  # Chave et al. 2004: σ_DAP = 0.0062 × DAP + 0.0904 (cm)
+ERROR_DAP_INTERCEPTO = 0.0904
+ERROR_ALTURA_RELATIVO = 0.10  # σ relativo de la altura medida en campo
+ERROR_ALTURA_ESTIMADA_RSE = 0.243  # RSE (escala log) de la relación DAP-Altura de Chave 2014
+ERROR_DENSIDAD_RELATIVO = 0.10  # σ relativo de la densidad de especie conocida
+ERROR_DENSIDAD_DESCONOCIDA_RELATIVO = 0.25  # σ relativo cuando se usa la densidad promedio
+
 # Estados de Parcela
 ESTADOS_PARCELA = ["activa", "completada", "inactiva", "en_proceso"]
 
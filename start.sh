@@ -22,6 +22,11 @@ echo "📡 Iniciando API Backend (FastAPI) en http://localhost:8000..."
 uvicorn src.api.main:app --reload &
 API_PID=$!
 
+# Levantar trabajador de la cola satelital en segundo plano
+echo "🛰️  Iniciando trabajador de procesamiento satelital..."
+python3 -m src.services.trabajador_satelital &
+WORKER_PID=$!
+
 # Esperar a que la API inicie
 echo "⏳ Esperando a que la API inicie..."
 sleep 3
@@ -37,5 +42,5 @@ npm run dev
 # Si se detiene el Frontend (Ctrl+C), matar también la API
 echo ""
 echo "🛑 Deteniendo servicios..."
-kill $API_PID
+kill $API_PID $WORKER_PID
 echo "✅ Servicios detenidos"